@@ -0,0 +1,214 @@
+"""
+Measure how long a request waits for a usable database connection when many
+requests run at once, for each way settings.py can manage connections.
+
+Usage (from the project root):
+    python benchmarks/connection_benchmark.py
+    python benchmarks/connection_benchmark.py --threads 1 8 32 --requests 2000
+    python benchmarks/connection_benchmark.py --connect-delay 30
+    DATABASE_URL=postgres://localhost/portfolio \\
+        python benchmarks/connection_benchmark.py --min-size 2 --max-size 4
+
+Every simulated request takes a connection, runs SELECT 1 and gives the
+connection back; the time until SELECT 1 returned is what is reported.
+  connect     a new connection for every request (conn_max_age=0, no pool)
+  persistent  every thread keeps its own connection (the default,
+              conn_max_age=300) - the first request of each thread connects
+  pool        --min-size..--max-size connections shared by all threads and
+              opened before the run, as warm_up_database() does with DB_POOL.
+              psycopg_pool.ConnectionPool when DATABASE_URL is Postgres and
+              psycopg[pool] is installed, otherwise a small stand-in pool
+              below (idle connections in a queue, grows up to --max-size,
+              then waits for one to be given back)
+
+Without DATABASE_URL a throwaway SQLite file is used. SQLite "connects" in
+microseconds, so pass --connect-delay to add the milliseconds a new
+connection to a remote Postgres spends on TCP + TLS + authentication (a few
+round trips: 20-50 ms to a Neon region nearby, much more after it scaled to
+zero). The delay is added to every new connection, pooled or not.
+"""
+import argparse
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+parser.add_argument('--requests', type=int, default=1000,
+                    help='requests per strategy and thread count')
+parser.add_argument('--connect-delay', type=float, default=0,
+                    help='milliseconds added to every new connection')
+parser.add_argument('--min-size', type=int, default=2)
+parser.add_argument('--max-size', type=int, default=4)
+args = parser.parse_args()
+
+if not os.environ.get('DATABASE_URL'):
+    db_path = os.path.join(tempfile.mkdtemp(), 'connection_benchmark.sqlite3')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+os.environ['DB_POOL'] = ''  # the pool is built below, not by Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+
+class Connector:
+    """Opens raw DB-API connections with the settings of DATABASES['default']
+    and counts them"""
+
+    def __init__(self):
+        self.params = connection.get_connection_params()
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.opened += 1
+        time.sleep(args.connect_delay / 1000)
+        return connection.Database.connect(**self.params)
+
+
+def select_1(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1')
+    cursor.fetchone()
+    cursor.close()
+
+
+class StandInPool:
+    """Just enough of psycopg_pool.ConnectionPool for this benchmark"""
+
+    def __init__(self, connect, min_size, max_size):
+        self.connect = connect
+        self.max_size = max_size
+        self.idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        for _ in range(min_size):
+            self.idle.put(connect())
+        self.size = min_size
+
+    def getconn(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self.size < self.max_size
+            if grow:
+                self.size += 1
+        return self.connect() if grow else self.idle.get()
+
+    def putconn(self, conn):
+        self.idle.put(conn)
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+def make_pool(connector):
+    if ConnectionPool is not None and connection.vendor == 'postgresql':
+        def configure(conn):
+            with connector._lock:
+                connector.opened += 1
+            time.sleep(args.connect_delay / 1000)
+
+        pool = ConnectionPool(kwargs=connector.params, configure=configure,
+                              min_size=args.min_size, max_size=args.max_size,
+                              open=False)
+        pool.open(wait=True)
+        return 'psycopg_pool', pool
+    return 'stand-in', StandInPool(connector, args.min_size, args.max_size)
+
+
+def run(threads, request):
+    """Latencies (ms) of args.requests calls of request() on threads"""
+    def timed(_):
+        started = time.perf_counter()
+        request()
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(timed, range(args.requests)))
+
+
+def connect_strategy(connector):
+    def request():
+        conn = connector()
+        select_1(conn)
+        conn.close()
+    return request, lambda: None
+
+
+def persistent_strategy(connector):
+    local = threading.local()
+    opened = []
+
+    def request():
+        if not hasattr(local, 'conn'):
+            local.conn = connector()
+            opened.append(local.conn)
+        select_1(local.conn)
+
+    def close():
+        for conn in opened:
+            conn.close()
+    return request, close
+
+
+def main():
+    print(f'database: {connection.vendor}, connect delay: '
+          f'{args.connect_delay:g} ms, pool: {args.min_size}..'
+          f'{args.max_size} connections')
+    print(f'{"strategy":<24}{"threads":>8}{"p50 ms":>9}{"p95 ms":>9}'
+          f'{"max ms":>9}{"connects":>10}')
+    for threads in args.threads:
+        strategies = [('connect', connect_strategy),
+                      ('persistent', persistent_strategy)]
+        for name, strategy in strategies:
+            connector = Connector()
+            request, close = strategy(connector)
+            report(name, threads, run(threads, request), connector.opened)
+            close()
+
+        connector = Connector()
+        kind, pool = make_pool(connector)
+        warm = connector.opened  # opened before the run (warm-up)
+
+        def pooled():
+            conn = pool.getconn()
+            try:
+                select_1(conn)
+            finally:
+                pool.putconn(conn)
+        latencies = run(threads, pooled)
+        report(f'pool ({kind})', threads, latencies,
+               f'{warm}+{connector.opened - warm}')
+        pool.close()
+
+
+def report(name, threads, latencies, connects):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f'{name:<24}{threads:>8}{statistics.median(latencies):>9.2f}'
+          f'{p95:>9.2f}{latencies[-1]:>9.2f}{connects:>10}')
+
+
+if __name__ == '__main__':
+    main()
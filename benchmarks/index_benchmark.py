@@ -0,0 +1,159 @@
+"""
+Compare query plans and timings of the hot blog/comment/social queries with
+and without the indexes declared in the models' Meta.indexes (added by
+migration 0004_query_indexes).
+
+Usage (from the project root):
+    python benchmarks/index_benchmark.py                 # 100k posts, SQLite
+    python benchmarks/index_benchmark.py --posts 20000 --repeat 50
+    DATABASE_URL=postgres://... python benchmarks/index_benchmark.py
+
+Without DATABASE_URL a throwaway SQLite file is used. With DATABASE_URL the
+script seeds THAT database, so only point it at a scratch database.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--posts', type=int, default=100_000)
+parser.add_argument('--repeat', type=int, default=20)
+args = parser.parse_args()
+
+if not os.environ.get('DATABASE_URL'):
+    db_path = os.path.join(tempfile.mkdtemp(), 'index_benchmark.sqlite3')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models.functions import Lower  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from portfolio.models import BlogPost, Comment, SocialPost  # noqa: E402
+
+INDEXED_MODELS = [BlogPost, Comment, SocialPost]
+CATEGORIES = ['Django', 'Python', 'React', 'DevOps', 'Databases']
+PLATFORMS = [value for value, _ in SocialPost.PLATFORM_CHOICES]
+BATCH = 5000
+
+
+def seed(posts):
+    now = timezone.now()
+    created_at = BlogPost._meta.get_field('created_at')
+    created_at.auto_now_add = False  # let the seed choose the timestamps
+    try:
+        for start in range(0, posts, BATCH):
+            BlogPost.objects.bulk_create([
+                BlogPost(
+                    title=f'Post {i}', slug=f'post-{i}', excerpt='Excerpt',
+                    content='Content ' * 50, tags='python,django',
+                    category=CATEGORIES[i % len(CATEGORIES)],
+                    published=i % 10 != 0,  # 10% drafts
+                    featured=i % 50 == 0,
+                    created_at=now - timedelta(minutes=i),
+                )
+                for i in range(start, min(start + BATCH, posts))
+            ])
+    finally:
+        created_at.auto_now_add = True
+
+    post_ids = list(BlogPost.objects.values_list('pk', flat=True))
+    for start in range(0, len(post_ids), BATCH):
+        Comment.objects.bulk_create([
+            Comment(post_id=pk, name='Reader', email='r@example.com',
+                    comment='Nice post', approved=n % 3 != 0)
+            for pk in post_ids[start:start + BATCH]
+            for n in range(3)
+        ])
+
+    for start in range(0, posts, BATCH):
+        SocialPost.objects.bulk_create([
+            SocialPost(
+                platform=PLATFORMS[i % len(PLATFORMS)], content='Post',
+                url=f'https://example.com/{i}',
+                posted_at=now - timedelta(minutes=i),
+            )
+            for i in range(start, min(start + BATCH, posts))
+        ])
+
+
+def queries():
+    some_post = BlogPost.objects.order_by('pk')[len(CATEGORIES)]
+    published = BlogPost.objects.filter(published=True)
+    return {
+        'blog list': published.order_by('-created_at', '-id')[:21],
+        'blog featured': published.filter(
+            featured=True).order_by('-created_at', '-id')[:21],
+        'blog category': published.alias(
+            category_lower=Lower('category')).filter(
+            category_lower='django').order_by('-created_at')[:21],
+        'approved comments': Comment.objects.filter(
+            post=some_post, approved=True),
+        'social feed': SocialPost.objects.order_by('-posted_at', '-id')[:21],
+        'social platform': SocialPost.objects.filter(
+            platform='github').order_by('-posted_at')[:21],
+    }
+
+
+def set_indexes(enabled):
+    # Drop/create the Meta.indexes directly so the rest of the schema (and any
+    # later migrations) are left alone
+    with connection.schema_editor() as editor:
+        for model in INDEXED_MODELS:
+            for index in model._meta.indexes:
+                if enabled:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+
+
+def measure(label):
+    print(f'\n=== {label} ===')
+    results = {}
+    for name, queryset in queries().items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            list(queryset.all())  # .all() -> fresh queryset, no result cache
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(timings)
+        print(f'\n-- {name}: median {results[name]:.3f} ms')
+        print(queryset.explain())
+    return results
+
+
+def main():
+    call_command('migrate', verbosity=0)
+    if not BlogPost.objects.exists():
+        print(f'Seeding {args.posts} posts, {args.posts * 3} comments and '
+              f'{args.posts} social posts...')
+        seed(args.posts)
+
+    set_indexes(False)
+    try:
+        before = measure('without indexes')
+    finally:
+        set_indexes(True)
+    after = measure('with indexes')
+
+    print('\n=== summary (median ms) ===')
+    print(f'{"query":<20}{"before":>10}{"after":>10}{"speedup":>10}')
+    for name in before:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f'{name:<20}{before[name]:>10.3f}{after[name]:>10.3f}'
+              f'{speedup:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
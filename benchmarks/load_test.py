@@ -0,0 +1,174 @@
+"""
+Load-test the sync (/api/...) and async (/api/async/...) read endpoints side
+by side and report p50/p99 latency and requests per second.
+
+Usage (from the project root):
+    python benchmarks/load_test.py                        # in-process ASGI
+    python benchmarks/load_test.py --concurrency 1 10 50 --requests 1000
+    python benchmarks/load_test.py --url http://127.0.0.1:8000  # real server
+
+By default requests go straight to the ASGI application in this process
+(portfolio_backend.asgi), so there's no network or server in the numbers, only
+Django's ASGI handler: sync views run in its thread pool, async views on the
+event loop. With --url the same requests are sent over HTTP to a running
+server (e.g. `uvicorn portfolio_backend.asgi:application --workers 1`)
+pointed at the same database.
+
+Without DATABASE_URL a throwaway SQLite file is seeded. The response cache is
+switched off (RESPONSE_CACHE_TIMEOUT=0) unless --cache is given, so every
+request reaches the database.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+parser.add_argument('--requests', type=int, default=500,
+                    help='requests per endpoint and concurrency level')
+parser.add_argument('--url', help='base URL of a running server')
+parser.add_argument('--cache', action='store_true',
+                    help='keep the response cache on')
+args = parser.parse_args()
+
+if not os.environ.get('DATABASE_URL'):
+    db_path = os.path.join(tempfile.mkdtemp(), 'load_test.sqlite3')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+if not args.cache:
+    os.environ['RESPONSE_CACHE_TIMEOUT'] = '0'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from portfolio.models import BlogPost, Project, SocialPost  # noqa: E402
+
+PATHS = ['projects/', 'blog/', 'blog/post-1/', 'social/', 'social/?limit=50']
+PLATFORMS = [value for value, _ in SocialPost.PLATFORM_CHOICES]
+
+
+def seed():
+    now = timezone.now()
+    Project.objects.bulk_create([
+        Project(title=f'Project {i}', description='Description',
+                technologies='Django, React') for i in range(50)])
+    BlogPost.objects.bulk_create([
+        BlogPost(title=f'Post {i}', slug=f'post-{i}', excerpt='Excerpt',
+                 content='Content ' * 200, category='Django', published=True)
+        for i in range(200)])
+    SocialPost.objects.bulk_create([
+        SocialPost(platform=PLATFORMS[i % len(PLATFORMS)], content='Post',
+                   url=f'https://example.com/{i}',
+                   posted_at=now - timedelta(minutes=i))
+        for i in range(1000)])
+
+
+class ASGIClient:
+    """Minimal in-process ASGI client: one GET, returns (status, body)."""
+
+    def __init__(self):
+        from portfolio_backend.asgi import application
+        self.application = application
+
+    async def get(self, url):
+        path, _, query = url.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'},
+            'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+        }
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        response = {'body': b''}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Future()  # no disconnect; cancelled by Django
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'] += message.get('body', b'')
+
+        await self.application(scope, receive, send)
+        return response['status'], response['body']
+
+
+class HTTPClient:
+    """Same interface over real HTTP, using a thread per in-flight request."""
+
+    def __init__(self, base_url, threads):
+        self.base_url = base_url.rstrip('/')
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def _get(self, url):
+        with urllib.request.urlopen(self.base_url + url) as response:
+            return response.status, response.read()
+
+    async def get(self, url):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._get, url)
+
+
+async def run(client, url, concurrency, total):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            status, _ = await client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert status == 200, (url, status)
+
+    await client.get(url)  # warm up (imports, first connection)
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    percentiles = statistics.quantiles(latencies, n=100)
+    return percentiles[49], percentiles[98], total / elapsed
+
+
+async def load_test(client):
+    print(f'{"endpoint":<22}{"mode":<7}{"conc":>6}{"p50 ms":>10}'
+          f'{"p99 ms":>10}{"req/s":>10}')
+    for path in PATHS:
+        for concurrency in args.concurrency:
+            for mode, prefix in (('sync', '/api/'), ('async', '/api/async/')):
+                p50, p99, rps = await run(client, prefix + path, concurrency,
+                                          args.requests)
+                print(f'{path:<22}{mode:<7}{concurrency:>6}{p50:>10.2f}'
+                      f'{p99:>10.2f}{rps:>10.1f}')
+
+
+def main():
+    if args.url:
+        client = HTTPClient(args.url, max(args.concurrency))
+    else:
+        # Seeding is synchronous ORM work, so it happens before the event loop
+        call_command('migrate', verbosity=0)
+        if not BlogPost.objects.exists():
+            seed()
+        client = ASGIClient()
+    asyncio.run(load_test(client))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Compare the DRF serializers with the .values() based fast serializers
+(portfolio/fast_serializers.py) on 10, 1k and 50k rows.
+
+Usage (from the project root):
+    python benchmarks/serializer_benchmark.py
+    python benchmarks/serializer_benchmark.py --rows 10 1000 50000 --repeat 5
+    DATABASE_URL=postgres://... python benchmarks/serializer_benchmark.py
+
+Both paths include the database query (model instances vs .values() dicts),
+since skipping model instantiation is a large part of the win.
+Without DATABASE_URL a throwaway SQLite file is used. With DATABASE_URL the
+script seeds THAT database, so only point it at a scratch database.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--rows', type=int, nargs='+', default=[10, 1000, 50_000])
+parser.add_argument('--repeat', type=int, default=5)
+args = parser.parse_args()
+
+if not os.environ.get('DATABASE_URL'):
+    db_path = os.path.join(tempfile.mkdtemp(), 'serializer_benchmark.sqlite3')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from portfolio.fast_serializers import (  # noqa: E402
+    BlogPostListFastSerializer, ProjectFastSerializer, ServiceFastSerializer,
+    SocialPostFastSerializer)
+from portfolio.models import (BlogPost, Project, Service,  # noqa: E402
+                              SocialPost, Tag, Technology)
+
+PLATFORMS = [value for value, _ in SocialPost.PLATFORM_CHOICES]
+BATCH = 5000
+
+
+def seed(rows):
+    now = timezone.now()
+    technologies = Technology.from_string('Django, React, PostgreSQL')
+    tags = Tag.from_string('python, django, orm')
+    for start in range(0, rows, BATCH):
+        stop = min(start + BATCH, rows)
+        SocialPost.objects.bulk_create([
+            SocialPost(platform=PLATFORMS[i % len(PLATFORMS)],
+                       content='Post ' * 20, url=f'https://example.com/{i}',
+                       likes=i, posted_at=now - timedelta(minutes=i))
+            for i in range(start, stop)])
+        Service.objects.bulk_create([
+            Service(title=f'Service {i}', description='Description',
+                    features='Design\nBuild\nDeploy', order=i)
+            for i in range(start, stop)])
+        projects = Project.objects.bulk_create([
+            Project(title=f'Project {i}', description='Description',
+                    image=f'projects/{i}.jpg',
+                    technologies='Django, React, PostgreSQL')
+            for i in range(start, stop)])
+        Project.technology_list.through.objects.bulk_create([
+            Project.technology_list.through(project=project, technology=tech)
+            for project in projects for tech in technologies])
+        posts = BlogPost.objects.bulk_create([
+            BlogPost(title=f'Post {i}', slug=f'post-{i}', excerpt='Excerpt',
+                     content='Content', tags='python, django, orm',
+                     category='Django', published=True)
+            for i in range(start, stop)])
+        BlogPost.tag_list.through.objects.bulk_create([
+            BlogPost.tag_list.through(blogpost=post, tag=tag)
+            for post in posts for tag in tags])
+
+
+def cases():
+    # name -> (fast serializer, queryset the view would use)
+    return {
+        'social': (SocialPostFastSerializer, SocialPost.objects.all()),
+        'services': (ServiceFastSerializer, Service.objects.all()),
+        'projects': (ProjectFastSerializer,
+                     Project.objects.prefetch_related('technology_list')),
+        'blog': (BlogPostListFastSerializer,
+                 BlogPost.objects.prefetch_related('tag_list')),
+    }
+
+
+def median_ms(function):
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    call_command('migrate', verbosity=0)
+    largest = max(args.rows)
+    if SocialPost.objects.count() < largest:
+        print(f'Seeding {largest} rows per model...')
+        seed(largest)
+
+    request = Request(APIRequestFactory().get('/', HTTP_HOST='localhost'))
+    context = {'request': request}
+    print(f'{"endpoint":<10}{"rows":>8}{"drf ms":>12}{"fast ms":>12}'
+          f'{"speedup":>10}')
+    for name, (fast_class, queryset) in cases().items():
+        drf_class = fast_class.serializer_class
+        for rows in args.rows:
+            page = queryset.order_by('-id')
+
+            def drf():
+                return drf_class(page[:rows], many=True, context=context).data
+
+            def fast():
+                serializer = fast_class(context=context)
+                return serializer.serialize(
+                    page.prefetch_related(None).values(
+                        *serializer.columns)[:rows])
+
+            assert [dict(row) for row in drf()] == fast(), name
+            drf_ms, fast_ms = median_ms(drf), median_ms(fast)
+            print(f'{name:<10}{rows:>8}{drf_ms:>12.2f}{fast_ms:>12.2f}'
+                  f'{drf_ms / fast_ms:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure what the POST flood protection (portfolio/throttling.py) adds to a
+request: TokenBucketThrottle.allow_request() and the duplicate check, per
+call, next to DRF's built-in AnonRateThrottle for comparison.
+
+Usage (from the project root):
+    python benchmarks/throttle_benchmark.py
+    python benchmarks/throttle_benchmark.py --calls 100000 --clients 1 1000
+    CACHE_LOCATION=/tmp/throttle-cache python benchmarks/throttle_benchmark.py
+
+--clients is the number of distinct IP/email pairs the calls are spread over
+(1: one client hammering the endpoint). The token bucket checks two keys (IP
+and email) per call, AnonRateThrottle one. The cache is whatever the settings
+configure: locmem by default, the file cache with CACHE_LOCATION. No
+database is needed.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument('--calls', type=int, default=20_000)
+parser.add_argument('--clients', type=int, nargs='+', default=[1, 100, 10_000])
+args = parser.parse_args()
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from rest_framework.throttling import AnonRateThrottle  # noqa: E402
+from portfolio.throttling import TokenBucketThrottle, is_duplicate  # noqa: E402
+
+
+class View:
+    throttle_scope = 'contact'
+
+
+def make_requests(clients):
+    factory = APIRequestFactory()
+    requests = []
+    for index in range(clients):
+        request = Request(factory.post(
+            '/api/contact/', {'email': f'visitor{index}@example.com'},
+            format='json',
+            REMOTE_ADDR=f'10.{index // 65536}.{index // 256 % 256}.'
+                        f'{index % 256}'), parsers=[JSONParser()])
+        request.data  # parse up front, as the view has by then
+        requests.append(request)
+    return requests
+
+
+def per_call_us(check, requests):
+    cache.clear()
+    start = time.perf_counter()
+    for call in range(args.calls):
+        check(requests[call % len(requests)], call)
+    return (time.perf_counter() - start) / args.calls * 1e6
+
+
+def token_bucket(request, call):
+    TokenBucketThrottle().allow_request(request, View)
+
+
+class AnonThrottle(AnonRateThrottle):
+    rate = '5/hour'
+
+
+def anon(request, call):
+    AnonThrottle().allow_request(request, View)
+
+
+def duplicate(request, call):
+    is_duplicate('contact', f'Message number {call}')
+
+
+def main():
+    print(f'{"check":<24}{"clients":>9}{"us/call":>10}')
+    for clients in args.clients:
+        requests = make_requests(clients)
+        for name, check in (('TokenBucketThrottle', token_bucket),
+                            ('AnonRateThrottle (DRF)', anon),
+                            ('is_duplicate', duplicate)):
+            print(f'{name:<24}{clients:>9}'
+                  f'{per_call_us(check, requests):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (Project, Skill, Contact, BlogPost,
-                     SocialPost, Service, Comment)
+                     SocialPost, Service, Comment, Tag, Technology)
 
 # register your models here
 
@@ -27,8 +27,8 @@ class ContactAdmin(admin.ModelAdmin):
 
 @admin.register(BlogPost)
 class BlogPostAdmin(admin.ModelAdmin):
-    list_display = ['title', 'category', 'author',
-                    'published', 'featured', 'views', 'created_at']
+    list_display = ['title', 'category', 'author', 'published', 'featured',
+                    'views', 'approved_comment_count', 'created_at']
     list_filter = ['published', 'featured', 'category', 'created_at']
     search_fields = ['title', 'content', 'tags']
     prepopulated_fields = {'slug': ('title',)}
@@ -40,6 +40,21 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ['name', 'post', 'approved', 'created_at']
     list_filter = ['approved', 'created_at']
     list_editable = ['approved']
+    # The post column shows post.title: join it instead of a query per row
+    list_select_related = ['post']
+    actions = ['approve_comments', 'reject_comments']
+
+    # Both actions write one UPDATE per batch (CommentQuerySet.moderate), not
+    # a save() per row like list_editable
+    @admin.action(description="Approve selected comments")
+    def approve_comments(self, request, queryset):
+        changed = queryset.moderate(approved=True)
+        self.message_user(request, f"{changed} comments approved.")
+
+    @admin.action(description="Reject (hide) selected comments")
+    def reject_comments(self, request, queryset):
+        changed = queryset.moderate(approved=False)
+        self.message_user(request, f"{changed} comments rejected.")
 
 
 @admin.register(Service)
@@ -55,3 +70,9 @@ class SocialPostAdmin(admin.ModelAdmin):
                     'likes', 'comments', 'shares', 'fetched_at']
     list_filter = ['platform', 'posted_at']
     ordering = ['-posted_at']
+
+
+@admin.register(Tag, Technology)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug']
+    search_fields = ['name']
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class PortfolioConfig(AppConfig):
     name = 'portfolio'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the receivers)
+        from .metrics import instrument_serializers
+        instrument_serializers()  # serializer time for Server-Timing
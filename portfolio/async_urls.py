@@ -0,0 +1,24 @@
+# portfolio/async_urls.py
+# Async (ASGI) versions of the read endpoints, mounted at /api/async/ next to
+# the regular ones - see async_views.py
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('projects/', async_views.ProjectList.as_view(),
+         name='async-project-list'),
+    path('projects/<int:pk>/', async_views.ProjectDetail.as_view(),
+         name='async-project-detail'),
+    path('skills/', async_views.SkillList.as_view(), name='async-skill-list'),
+    path('blog/', async_views.BlogPostList.as_view(), name='async-blog-list'),
+    path('blog/export/', async_views.BlogPostExport.as_view(),
+         name='async-blog-export'),
+    path('blog/<slug:slug>/', async_views.BlogPostDetail.as_view(),
+         name='async-blog-detail'),
+    path('services/', async_views.ServiceList.as_view(),
+         name='async-service-list'),
+    path('social/', async_views.SocialPostList.as_view(),
+         name='async-social-list'),
+    path('social/export/', async_views.SocialPostExport.as_view(),
+         name='async-social-export'),
+]
@@ -0,0 +1,179 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from . import views
+from .cache import aresponse_cache_key
+from .fast_serializers import (BlogPostDetailFastSerializer,
+                               ProjectFastSerializer)
+from .renderers import astream_json_array, dumps
+from .view_counter import view_counts
+
+# Async versions of the read-only endpoints, served under /api/async/.
+#
+# The DRF views in views.py are synchronous: under an ASGI server (uvicorn)
+# each request holds a thread-pool slot while it waits on the database.
+# These views use Django's async ORM (aiterator(), aget(), async for) instead,
+# so the event loop can serve other requests during the wait. They are
+# mounted under their own prefix so both versions can be load-tested side by
+# side (benchmarks/load_test.py) and return the same JSON.
+#
+# To stay identical, the async views borrow everything except the I/O from
+# the matching sync view: get_queryset() (filters), the paginator (a cursor
+# page is cut by DRF's own paginate_queryset(), through sync_to_async), the
+# fast serializer and cache_models. They use the response cache (through the
+# async cache API, so a file cache doesn't block the event loop) but skip the
+# ETag/304 handling of ConditionalGetMixin.
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), status=status,
+                        content_type='application/json')
+
+
+class AsyncAPIView(View):
+    # Sync DRF view to borrow get_queryset(), pagination etc. from
+    view_class = None
+
+    def sync_view(self, request):
+        # Only used for its (lazy) querysets and settings - it never runs
+        return self.view_class(request=request, args=self.args,
+                               kwargs=self.kwargs, format_kwarg=None)
+
+    async def get(self, request, *args, **kwargs):
+        # DRF Request for query_params (used by get_queryset and paginators)
+        request = Request(request)
+        view = self.sync_view(request)
+        cache_models = getattr(view, 'cache_models', None)
+        key = cache_models and await aresponse_cache_key(request,
+                                                         cache_models)
+        data = await cache.aget(key) if key else None
+        if data is not None:
+            return json_response(data)
+
+        try:
+            data = await self.get_data(request, view)
+        except ValidationError as exc:
+            return json_response(exc.detail, status=400)
+        if data is None:
+            # Same body as DRF's 404 for get_object()
+            return json_response({'detail': (
+                f'No {view.get_queryset().model._meta.object_name} matches '
+                f'the given query.')}, status=404)
+
+        if key:
+            await cache.aset(key, data,
+                             getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        return json_response(data)
+
+    async def get_data(self, request, view):
+        raise NotImplementedError
+
+
+class AsyncListView(AsyncAPIView):
+    async def get_data(self, request, view):
+        fast = view.fast_serializer_class(
+            context=view.get_serializer_context())
+        queryset = view.get_queryset().prefetch_related(None)
+        paginator = view.pagination_class() if view.pagination_class \
+            else None
+        if paginator:
+            # The cursor is built from the ordering columns of the rows
+            fast._add_columns([f.lstrip('-') for f in paginator.ordering])
+            rows = await paginator.apaginate_queryset(
+                queryset.values(*fast.columns), request)
+            return paginator.get_paginated_data(await fast.aserialize(rows))
+        return await fast.aserialize(queryset.values(*fast.columns))
+
+
+class AsyncDetailView(AsyncAPIView):
+    fast_serializer_class = None
+
+    async def get_data(self, request, view):
+        fast = self.fast_serializer_class(
+            context=view.get_serializer_context())
+        lookup = view.lookup_url_kwarg or view.lookup_field
+        queryset = view.get_queryset().prefetch_related(None).filter(
+            **{view.lookup_field: self.kwargs[lookup]})
+        try:
+            row = await queryset.values(*fast.columns).aget()
+        except queryset.model.DoesNotExist:
+            return None
+        return (await fast.aserialize([row]))[0]
+
+
+class AsyncExportView(AsyncAPIView):
+    """The StreamingExportMixin views, fed by aiterator(). Under ASGI the
+    StreamingHttpResponse consumes the async generator directly."""
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(request)
+        view = self.sync_view(request)
+        fast = view.fast_serializer_class(
+            context=view.get_serializer_context())
+        chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+        queryset = view.get_queryset().prefetch_related(None).order_by(
+            *view.export_ordering).values(*fast.columns)
+
+        async def chunks():
+            chunk = []
+            async for row in queryset.aiterator(chunk_size=chunk_size):
+                chunk.append(row)
+                if len(chunk) == chunk_size:
+                    yield await fast.aserialize(chunk)
+                    chunk = []
+            if chunk:
+                yield await fast.aserialize(chunk)
+
+        return StreamingHttpResponse(astream_json_array(chunks()),
+                                     content_type='application/json')
+
+
+class ProjectList(AsyncListView):
+    view_class = views.ProjectListView
+
+
+class ProjectDetail(AsyncDetailView):
+    view_class = views.ProjectDetailView
+    fast_serializer_class = ProjectFastSerializer
+
+
+class SkillList(AsyncListView):
+    view_class = views.SkillListView
+
+
+class BlogPostList(AsyncListView):
+    view_class = views.BlogPostListView
+
+
+class BlogPostDetail(AsyncDetailView):
+    view_class = views.BlogPostDetailView
+    fast_serializer_class = BlogPostDetailFastSerializer
+
+    async def get_data(self, request, view):
+        data = await super().get_data(request, view)
+        if data is not None:
+            # Same buffered view count as the sync view; increment() may
+            # flush to the database, so it runs in a thread
+            data['views'] += await sync_to_async(view_counts.increment)(
+                data['id'])
+        return data
+
+
+class BlogPostExport(AsyncExportView):
+    view_class = views.BlogPostExportView
+
+
+class ServiceList(AsyncListView):
+    view_class = views.ServiceListView
+
+
+class SocialPostList(AsyncListView):
+    view_class = views.SocialPostListView
+
+
+class SocialPostExport(AsyncExportView):
+    view_class = views.SocialPostExportView
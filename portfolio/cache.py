@@ -0,0 +1,104 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+# Versioned response cache for the read-only endpoints.
+#
+# Every model the API exposes has a "version" stored in the cache. A cached
+# response key includes the versions of the models it was built from, so when
+# an admin saves or deletes a row, bump_version() changes the version and all
+# responses built from that model are simply never looked up again (they expire
+# on their own). No key scanning or wildcard delete is needed, which is why this
+# works the same with the locmem and file cache backends.
+#
+# Versions are timestamps rather than counters so a version key that got
+# evicted can never come back with a value an old response was cached under.
+
+VERSION_KEY = 'portfolio:version:{}'
+RESPONSE_KEY = 'portfolio:response:{}'
+
+
+def _version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def bump_version(model):
+    """Invalidate every cached response that depends on this model."""
+    key = _version_key(model)
+    cache.set(key, time.time_ns(), None)
+    # Bump again once the transaction commits: a request that ran between the
+    # first bump and the commit could have cached the old rows under the new
+    # version (runs immediately when there is no transaction)
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+def get_versions(models):
+    """Current version of each model, fetched in one cache round trip."""
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(models):
+    """get_versions() for async views (the cache calls don't block the
+    event loop)"""
+    keys = [_version_key(model) for model in models]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, time.time_ns(), None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def _response_key(request, versions):
+    # Sort the query parameters so ?a=1&b=2 and ?b=2&a=1 share an entry
+    params = sorted(
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+    )
+    raw = '|'.join([
+        request.path,
+        urlencode(params),
+        *[str(version) for version in versions],
+    ])
+    return RESPONSE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def response_cache_key(request, models):
+    return _response_key(request, get_versions(models))
+
+
+async def aresponse_cache_key(request, models):
+    return _response_key(request, await aget_versions(models))
+
+
+class CachedResponseMixin:
+    """Cache the serialized data of GET responses.
+
+    Set cache_models to every model the response is built from. The data is
+    cached before rendering, so JSON/browsable API content negotiation still
+    works on cache hits."""
+    cache_models = ()
+
+    def get(self, request, *args, **kwargs):
+        key = response_cache_key(request, self.cache_models)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        # Streamed exports are never cached (that would load them in memory)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, response.data,
+                      getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        return response
@@ -0,0 +1,115 @@
+import hashlib
+from calendar import timegm
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from .cache import get_versions, response_cache_key
+
+# Conditional GET (ETag / Last-Modified) for the read-only views.
+#
+# Before doing any real work the view runs ONE aggregate query over the rows
+# it would return, e.g.
+#   SELECT MAX(updated_at), COUNT(id) FROM portfolio_project
+# and hashes the result into an ETag. If the client sends a matching
+# If-None-Match (or an If-Modified-Since that is not older than MAX(...)) it
+# gets an empty 304 straight away - the full queryset is never loaded and the
+# serializer never runs.
+#
+# COUNT is part of the ETag so deleting a row changes it even though the
+# newest timestamp stays the same. Models without a timestamp (Skill, Service)
+# use the cache versions from cache.py instead, which costs no query at all.
+#
+# Last-Modified is only sent by detail views without validator_aggregates:
+# there MAX(...) is the row's own timestamp and moves with every change. On a
+# list, deleting a row doesn't move MAX(...), and counters updated with
+# .update() (approved_comment_count, buffered views) don't touch updated_at,
+# so a client sending only If-Modified-Since would get a 304 for stale data.
+# Those views answer If-None-Match only.
+# Views that use the response cache also cache the aggregate result under the
+# same versioned key, so it is only recomputed after an edit.
+
+
+class ConditionalGetMixin:
+    # Timestamp column in the ETag (and Last-Modified, see above),
+    # None -> version based ETag
+    last_modified_field = None
+    # Extra aggregates that should change the ETag, e.g. {'views': Sum('views')}
+    validator_aggregates = {}
+
+    def _lookup_url_kwarg(self):
+        # Set on detail views (RetrieveAPIView) only
+        lookup_field = getattr(self, 'lookup_field', None)
+        kwarg = getattr(self, 'lookup_url_kwarg', None) or lookup_field
+        return kwarg if kwarg in self.kwargs else None
+
+    def sends_last_modified(self):
+        # MAX(last_modified_field) covers every change only for one row
+        # whose other validators are all in that row's timestamp
+        return bool(self.last_modified_field and self._lookup_url_kwarg()
+                    and not self.validator_aggregates)
+
+    def get_validator_queryset(self):
+        queryset = self.get_queryset()
+        kwarg = self._lookup_url_kwarg()
+        if kwarg:
+            # Detail view: narrow the aggregate down to the requested row
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[kwarg]})
+        return queryset
+
+    def get_validator_values(self):
+        if self.last_modified_field is None:
+            return {'versions': get_versions(self.cache_models)}
+
+        # Views using the response cache keep the aggregate next to the cached
+        # data (same versioned key), so cache hits and 304s run no query
+        cache_models = getattr(self, 'cache_models', None)
+        key = cache_models and \
+            response_cache_key(self.request, cache_models) + ':validators'
+        values = cache.get(key) if key else None
+        if values is None:
+            values = self.get_validator_queryset().aggregate(
+                last_modified=Max(self.last_modified_field),
+                count=Count('pk'),
+                **self.validator_aggregates,
+            )
+            if key:
+                cache.set(key, values,
+                          getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        return values
+
+    def get(self, request, *args, **kwargs):
+        self.validator_values = values = self.get_validator_values()
+        if values.get('count') == 0 and self._lookup_url_kwarg():
+            # Unknown object: let the normal view return its 404
+            return super().get(request, *args, **kwargs)
+
+        raw = repr((request.get_full_path(),
+                    request.META.get('HTTP_ACCEPT', ''),
+                    sorted(values.items())))
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        last_modified = values.get('last_modified')
+        last_modified = last_modified and self.sends_last_modified() and \
+            timegm(last_modified.utctimetuple())
+
+        # Blank response carrying the validators, so a 304 includes them too
+        validators = HttpResponse()
+        validators['ETag'] = etag
+        if last_modified:
+            validators['Last-Modified'] = http_date(last_modified)
+
+        conditional = get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=validators)
+        if conditional is not validators:
+            return conditional  # 304 Not Modified / 412 Precondition Failed
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
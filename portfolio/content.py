@@ -0,0 +1,249 @@
+import html
+import math
+import re
+from django.utils.html import strip_tags
+from django.utils.text import slugify
+
+# Blog post content pipeline: BlogPost.content (markdown) -> stored HTML.
+#
+# BlogPost.save() runs render_content() and keeps the results next to the
+# raw text, so the API serves ready-made HTML and nobody renders markdown
+# per view:
+#   content_html  sanitized HTML
+#   toc           [{"level": 2, "text": "Setup", "id": "setup"}, ...]
+#                 (every heading, in order; the id is the heading's anchor)
+#   word_count    words of the rendered text
+#   reading_time  minutes at WORDS_PER_MINUTE, at least 1
+#
+# The renderer covers the markdown a blog post needs: # headings, paragraphs,
+# **bold**, *italic*, `code`, ``` fenced code blocks, [links](url),
+# ![images](url), - / 1. lists (nested by indenting), > quotes and ---.
+#
+# Sanitizing: every piece of the source text is HTML-escaped before markup is
+# added, so raw HTML in a post shows up as text and the only tags in the
+# output are the ones generated here. Link and image URLs must be relative
+# or http(s)/mailto (no javascript: etc.).
+# That is also why this isn't Python-Markdown + an HTML sanitizer (nh3):
+# Markdown passes raw HTML through, so it needs the sanitizer behind it,
+# while here there is no HTML from the author to clean. And the output is
+# stored, so a library upgrade that changes it would have to bump
+# RENDERER_VERSION too.
+#
+# RENDERER_VERSION is stored with every post (content_renderer_version).
+# Bump it whenever the output of render_content() changes, then run
+# `manage.py render_blog_posts` to re-render the posts made by older versions.
+
+RENDERER_VERSION = 2
+WORDS_PER_MINUTE = 200
+# BlogPost fields filled by render_content()
+RENDERED_FIELDS = ['content_html', 'toc', 'word_count', 'reading_time',
+                   'content_renderer_version']
+
+SAFE_SCHEMES = {'http', 'https', 'mailto'}
+
+FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})\s*([\w+-]*)')
+HEADING = re.compile(r'^ {0,3}(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+RULE = re.compile(r'^ {0,3}([-*_])(?:\s*\1){2,}\s*$')
+QUOTE = re.compile(r'^ {0,3}>\s?')
+LIST_ITEM = re.compile(r'^( *)([-*+]|\d{1,9}[.)])\s+(.*)$')
+
+CODE_SPAN = re.compile(r'(`+)(.+?)\1')
+IMAGE = re.compile(r'!\[([^\]]*)\]\(([^)\s]+)\)')
+LINK = re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)')
+STRONG = re.compile(r'(\*\*|__)(?=\S)(.+?)(?<=\S)\1')
+EMPHASIS = re.compile(r'(?<![\w*])([*_])(?=\S)(.+?)(?<=\S)\1(?![\w*])')
+PLACEHOLDER = re.compile('\x00(\\d+)\x00')
+WORD = re.compile(r"\w+(?:['’-]\w+)*")
+
+
+def safe_url(url):
+    """The (already escaped) URL when it is safe to link to, else None"""
+    # Browsers ignore whitespace and control characters inside a scheme
+    # ("java\tscript:"), so check the URL without them
+    plain = re.sub(r'[\x00-\x20]', '', html.unescape(url))
+    scheme = re.match(r'([a-zA-Z][a-zA-Z0-9+.-]*):', plain)
+    if scheme and scheme.group(1).lower() not in SAFE_SCHEMES:
+        return None
+    return url
+
+
+class Renderer:
+    def __init__(self):
+        self.toc = []
+        self._ids = set()
+
+    def render(self, text):
+        text = text.replace('\r\n', '\n').replace('\x00', '')
+        return '\n'.join(self.blocks(text.split('\n')))
+
+    # -- blocks ------------------------------------------------------------
+
+    def blocks(self, lines):
+        out = []
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            if not line.strip():
+                i += 1
+            elif FENCE.match(line):
+                i = self.code_block(lines, i, out)
+            elif HEADING.match(line):
+                out.append(self.heading(HEADING.match(line)))
+                i += 1
+            elif RULE.match(line):
+                out.append('<hr>')
+                i += 1
+            elif QUOTE.match(line):
+                i = self.quote(lines, i, out)
+            elif LIST_ITEM.match(line):
+                i = self.list(lines, i, out)
+            else:
+                i = self.paragraph(lines, i, out)
+        return out
+
+    def starts_block(self, line):
+        return bool(FENCE.match(line) or HEADING.match(line)
+                    or RULE.match(line) or QUOTE.match(line)
+                    or LIST_ITEM.match(line))
+
+    def code_block(self, lines, i, out):
+        fence, language = FENCE.match(lines[i]).groups()
+        code = []
+        i += 1
+        while i < len(lines) and not lines[i].strip().startswith(fence):
+            code.append(lines[i])
+            i += 1
+        css_class = f' class="language-{language}"' if language else ''
+        out.append(f'<pre><code{css_class}>'
+                   f'{html.escape(chr(10).join(code))}</code></pre>')
+        return i + 1  # past the closing fence
+
+    def heading(self, match):
+        level = len(match.group(1))
+        inner = self.inline(match.group(2))
+        text = html.unescape(strip_tags(inner))
+        anchor = base = slugify(text) or 'section'
+        number = 1
+        while anchor in self._ids:
+            number += 1
+            anchor = f'{base}-{number}'
+        self._ids.add(anchor)
+        self.toc.append({'level': level, 'text': text, 'id': anchor})
+        return f'<h{level} id="{anchor}">{inner}</h{level}>'
+
+    def quote(self, lines, i, out):
+        quoted = []
+        while i < len(lines) and QUOTE.match(lines[i]):
+            quoted.append(QUOTE.sub('', lines[i], count=1))
+            i += 1
+        out.append('<blockquote>\n' + '\n'.join(self.blocks(quoted))
+                   + '\n</blockquote>')
+        return i
+
+    def list(self, lines, i, out):
+        first = LIST_ITEM.match(lines[i])
+        indent = len(first.group(1))
+        ordered = first.group(2)[0].isdigit()
+        items = []  # lines of each item, the nested ones dedented
+        while i < len(lines):
+            line = lines[i]
+            item = LIST_ITEM.match(line)
+            if item and len(item.group(1)) <= indent \
+                    and item.group(2)[0].isdigit() == ordered:
+                items.append([item.group(3)])
+            elif item and len(item.group(1)) <= indent:
+                break  # a different kind of list starts
+            elif not line.strip():
+                # a blank line only continues the list if more of it follows
+                following = lines[i + 1] if i + 1 < len(lines) else ''
+                if not (following.startswith(' ' * (indent + 2))
+                        or (LIST_ITEM.match(following)
+                            and len(LIST_ITEM.match(following).group(1))
+                            <= indent)):
+                    break
+                items[-1].append('')
+            elif line.startswith(' ' * (indent + 2)):
+                items[-1].append(line[indent + 2:])  # nested content
+            elif self.starts_block(line):
+                break
+            else:
+                items[-1].append(line.strip())  # lazy continuation
+            i += 1
+
+        tag = 'ol' if ordered else 'ul'
+        start = int(first.group(2)[:-1]) if ordered else 1
+        attrs = f' start="{start}"' if start != 1 else ''
+        rendered = []
+        for item in items:
+            blocks = self.blocks(item)
+            # a plain one-paragraph item goes without the <p>
+            if len(blocks) == 1 and blocks[0].startswith('<p>'):
+                blocks = [blocks[0][3:-4]]
+            rendered.append('<li>' + '\n'.join(blocks) + '</li>')
+        out.append(f'<{tag}{attrs}>\n' + '\n'.join(rendered) + f'\n</{tag}>')
+        return i
+
+    def paragraph(self, lines, i, out):
+        text = [lines[i].strip()]
+        i += 1
+        while i < len(lines) and lines[i].strip() \
+                and not self.starts_block(lines[i]):
+            text.append(lines[i].strip())
+            i += 1
+        out.append(f'<p>{self.inline(chr(10).join(text))}</p>')
+        return i
+
+    # -- inline ------------------------------------------------------------
+
+    def inline(self, text):
+        # Code spans are taken out first so nothing inside them is parsed.
+        # Generated <img> tags and <a> start tags are taken out too, so the
+        # ** / _ passes can't touch a URL or alt text.
+        spans = []
+
+        def hold(markup):
+            spans.append(markup)
+            return f'\x00{len(spans) - 1}\x00'
+
+        def code_span(match):
+            return hold(f'<code>{html.escape(match.group(2).strip())}</code>')
+
+        text = html.escape(CODE_SPAN.sub(code_span, text))
+
+        def image(match):
+            src = safe_url(match.group(2))
+            if src is None:
+                return match.group(1)
+            return hold(
+                f'<img src="{src}" alt="{match.group(1)}" loading="lazy">')
+
+        def link(match):
+            href = safe_url(match.group(2))
+            if href is None:
+                return match.group(1)
+            return hold(f'<a href="{href}">') + f'{match.group(1)}</a>'
+
+        def restore(match):
+            # a URL can contain a code span placeholder itself
+            return PLACEHOLDER.sub(restore, spans[int(match.group(1))])
+
+        text = IMAGE.sub(image, text)
+        text = LINK.sub(link, text)
+        text = STRONG.sub(r'<strong>\2</strong>', text)
+        text = EMPHASIS.sub(r'<em>\2</em>', text)
+        text = text.replace('\n', ' ')
+        return PLACEHOLDER.sub(restore, text)
+
+
+def render_content(text):
+    """{field: value} for RENDERED_FIELDS, rendered from markdown text"""
+    renderer = Renderer()
+    content_html = renderer.render(text)
+    words = len(WORD.findall(html.unescape(strip_tags(content_html))))
+    return {
+        'content_html': content_html,
+        'toc': renderer.toc,
+        'word_count': words,
+        'reading_time': max(1, math.ceil(words / WORDS_PER_MINUTE)),
+        'content_renderer_version': RENDERER_VERSION,
+    }
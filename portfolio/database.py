@@ -0,0 +1,115 @@
+import logging
+import time
+import weakref
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Database warm-up when a worker process boots.
+#
+# Neon scales an idle database to zero. The first connection after that has to
+# wait for the compute to start, on top of the TCP + TLS + authentication
+# round trips every new connection pays. Without a warm-up the first requests
+# a fresh gunicorn worker handles pay all of it.
+#
+# warm_up_database() runs from wsgi.py, once per gunicorn worker process,
+# before the worker takes requests (not from asgi.py: uvicorn loads the
+# application inside its event loop, where sync database calls aren't allowed):
+#   - with DB_POOL (settings.py): opens the psycopg pool and waits until its
+#     min_size connections are connected (at most DB_POOL_TIMEOUT seconds;
+#     if they aren't ready by then the pool keeps connecting in the background)
+#   - without: opens this thread's persistent connection. Request threads of
+#     a threaded worker still open their own, but the server is awake.
+# Either way it runs SELECT 1, which also wakes a suspended Neon compute.
+#
+# A failed warm-up is logged and the worker starts anyway: its requests then
+# connect as usual.
+#
+# Don't combine it with `gunicorn --preload`: the application would be loaded
+# (and the connections opened) in the master process, and the forked workers
+# would share those sockets.
+#
+# Settings (all optional):
+# DB_WARM_UP = True
+#
+# Statement timeout for web requests.
+#
+# One slow query shouldn't keep a worker busy for minutes: with
+# DB_STATEMENT_TIMEOUT (ms, settings.py) Postgres cancels any statement that
+# runs longer. It is only for the web server: wsgi.py and asgi.py call
+# use_statement_timeout(), which sets statement_timeout on every new
+# connection. manage.py / django-admin commands (migrate, render_blog_posts,
+# build_related_posts, ...), the tests and scripts that only import the
+# settings never call it, so they run without a limit.
+#
+# It is set once per database connection: with DB_POOL a connection that
+# comes back from the pool already has it. It is skipped when
+#   - DB_STATEMENT_TIMEOUT is 0
+#   - the database isn't Postgres
+#   - DATABASE_URL already sets it (?options=-c statement_timeout=...)
+#   - the host is a Neon PgBouncer (-pooler) host: in transaction mode a SET
+#     would stay on a server connection other clients get next. Set it on
+#     the role there instead: ALTER ROLE ... SET statement_timeout = 5000
+#     (which the commands get too - run them against the direct host then)
+#
+# Settings (all optional):
+# DB_STATEMENT_TIMEOUT = 0
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up_database(alias='default'):
+    """Connect now instead of on the first request. Returns the seconds it
+    took, or None when there was nothing to do or it failed."""
+    if not getattr(settings, 'DB_WARM_UP', True):
+        return None
+    connection = connections[alias]
+    if not connection.settings_dict.get('ENGINE'):
+        return None  # no database configured
+    started = time.perf_counter()
+    try:
+        pool = getattr(connection, 'pool', None)  # Postgres with DB_POOL
+        if pool is not None:
+            pool.open(wait=True, timeout=pool.timeout)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if pool is not None:
+            connection.close()  # hands the connection back to the pool
+    except Exception:
+        logger.warning("Database warm-up failed", exc_info=True)
+        return None
+    seconds = time.perf_counter() - started
+    logger.info("Database warm-up took %.0f ms", seconds * 1000)
+    return seconds
+
+
+# The raw connections that already have the timeout
+_timeout_set = weakref.WeakSet()
+
+
+def _needs_statement_timeout(connection):
+    settings_dict = connection.settings_dict
+    return (connection.vendor == 'postgresql'
+            and 'statement_timeout' not in
+            settings_dict.get('OPTIONS', {}).get('options', '')
+            and '-pooler.' not in (settings_dict.get('HOST') or ''))
+
+
+def set_statement_timeout(sender, connection, **kwargs):
+    """connection_created receiver, see use_statement_timeout()"""
+    timeout = getattr(settings, 'DB_STATEMENT_TIMEOUT', 0)
+    if (not timeout or not _needs_statement_timeout(connection)
+            or connection.connection in _timeout_set):
+        return
+    with connection.cursor() as cursor:
+        # set_config() instead of SET: SET takes no query parameters
+        cursor.execute("SELECT set_config('statement_timeout', %s, false)",
+                       [str(timeout)])
+    _timeout_set.add(connection.connection)
+
+
+def use_statement_timeout():
+    """Apply DB_STATEMENT_TIMEOUT to the connections this process opens from
+    now on (the web entry points call it, commands don't)"""
+    connection_created.connect(set_statement_timeout,
+                               dispatch_uid='portfolio_statement_timeout')
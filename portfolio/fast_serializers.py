@@ -0,0 +1,294 @@
+from django.conf import settings
+from itertools import islice
+from django.core.exceptions import ImproperlyConfigured
+from django.http import StreamingHttpResponse
+from rest_framework import fields as drf_fields
+from rest_framework.relations import (ManyRelatedField,
+                                      PrimaryKeyRelatedField,
+                                      SlugRelatedField)
+from rest_framework.response import Response
+from .images import srcset
+from .metrics import timed
+from .related import related_post_pair, related_posts_query
+from .renderers import stream_json_array
+from .models import Comment, SocialPost
+from .serializers import (ProjectSerializer, SkillSerializer,
+                          BlogPostListSerializer, BlogPostDetailSerializer,
+                          CommentSerializer, ServiceSerializer,
+                          SocialPostSerializer)
+
+# Fast read-only serialization for the big list endpoints.
+#
+# A DRF ModelSerializer does a lot of work per row: build a model instance,
+# look every field up through get_attribute(), call to_representation() and
+# SerializerMethodFields one by one. For read-only lists we can instead pull
+# plain tuples with .values() and turn them into dicts with a list of
+# "mappers" worked out once per request:
+#   - plain columns (ints, strings, booleans) are copied as they are
+#   - anything else (datetimes, images) goes through the DRF field's own
+#     to_representation(), so the formatting is exactly the same
+#   - many-to-many name lists (technology_list, tag_list) are loaded for the
+#     whole page with one query on the M2M join table
+#   - computed fields (platform_display, features_list, ...) get a small
+#     function in `computed`
+# The output keys and their order come from the DRF serializer itself, so
+# the JSON matches what the DRF serializer returns byte for byte.
+#
+# Views opt in with FastListMixin + fast_serializer_class. Set
+# FAST_LIST_SERIALIZERS = False to go back to the plain DRF serializers.
+
+# DRF fields whose to_representation() is a no-op for the value the database
+# driver already returns (int for IntegerField, str for CharField, ...)
+PASSTHROUGH_FIELDS = (
+    drf_fields.IntegerField, drf_fields.BooleanField, drf_fields.CharField,
+    drf_fields.ChoiceField, PrimaryKeyRelatedField,
+)
+
+
+def _related(name):
+    return lambda row, self: self.related[name].get(row['id'], [])
+
+
+class FastListSerializer:
+    # The DRF serializer this one must stay identical to
+    serializer_class = None
+    # output field -> (extra .values() columns it needs, function(row, self))
+    computed = {}
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.columns = []
+        self.mappers = []  # (output name, column, convert or None, computed)
+        self.many_fields = []  # (output name, M2M model field, slug field)
+        self.related = {}  # output name -> {row id: [values]}, see prefetch()
+        fields = self.serializer_class(context=self.context).fields
+        self.model = self.serializer_class.Meta.model
+        # field name or attname -> column, e.g. 'post' -> 'post_id'
+        columns = {}
+        for model_field in self.model._meta.concrete_fields:
+            columns[model_field.name] = columns[model_field.attname] = \
+                model_field.attname
+        columns['pk'] = self.model._meta.pk.attname
+
+        for name, field in fields.items():
+            if name in self.computed:
+                needed, function = self.computed[name]
+                self._add_columns(needed)
+                self.mappers.append((name, None, None, function))
+                continue
+            if isinstance(field, ManyRelatedField) and isinstance(
+                    field.child_relation, SlugRelatedField):
+                self._add_columns(['id'])
+                self.many_fields.append((
+                    name, self.model._meta.get_field(field.source),
+                    field.child_relation.slug_field))
+                self.mappers.append((name, None, None, _related(name)))
+                continue
+            if field.source not in columns:
+                raise ImproperlyConfigured(
+                    f"{type(self).__name__}: no column for '{name}', add it "
+                    f"to computed")
+            column = columns[field.source]
+            self._add_columns([column])
+            if isinstance(field, drf_fields.FileField):
+                convert = self._file_url(self.model._meta.get_field(column))
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                convert = None
+            else:
+                convert = field.to_representation
+            self.mappers.append((name, column, convert, None))
+
+    def _file_url(self, model_field):
+        # .values() gives the stored file name instead of a FieldFile; build
+        # the same (absolute) URL DRF's FileField/ImageField would
+        storage, request = model_field.storage, self.context.get('request')
+
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+        return convert
+
+    def _add_columns(self, columns):
+        for column in columns:
+            if column not in self.columns:
+                self.columns.append(column)
+
+    def related_queries(self, ids):
+        """[(output name, queryset, function(item) -> (row id, value))]
+
+        Each query loads one related field for every row on the page. The
+        M2M name lists are ordered like prefetch_related() would (the related
+        model's Meta.ordering)."""
+        queries = []
+        for name, m2m, slug_field in self.many_fields:
+            source = m2m.m2m_field_name()  # e.g. 'project'
+            target = m2m.m2m_reverse_field_name()  # e.g. 'technology'
+            ordering = [f'{target}__{field}'
+                        for field in m2m.related_model._meta.ordering]
+            links = (m2m.remote_field.through.objects
+                     .filter(**{f'{source}_id__in': ids})
+                     .order_by(*ordering)
+                     .values_list(f'{source}_id', f'{target}__{slug_field}'))
+            queries.append((name, links, tuple))
+        return queries
+
+    def _store(self, name, pairs):
+        values = self.related[name] = {}
+        for row_id, value in pairs:
+            values.setdefault(row_id, []).append(value)
+
+    def prefetch(self, rows):
+        ids = [row['id'] for row in rows]
+        for name, queryset, to_pair in self.related_queries(ids):
+            self._store(name, map(to_pair, queryset))
+
+    async def aprefetch(self, rows):
+        # Same queries through the async ORM (async views, async_views.py)
+        ids = [row['id'] for row in rows]
+        for name, queryset, to_pair in self.related_queries(ids):
+            self._store(name, [to_pair(item) async for item in queryset])
+
+    def to_representation(self, row):
+        item = {}
+        for name, column, convert, function in self.mappers:
+            if function is not None:
+                item[name] = function(row, self)
+            else:
+                value = row[column]
+                # DRF returns None for empty values without converting
+                item[name] = value if value is None or convert is None \
+                    else convert(value)
+        return item
+
+    def serialize(self, rows):
+        with timed('serialize'):  # Server-Timing, see metrics.py
+            rows = list(rows)
+            self.prefetch(rows)
+            return [self.to_representation(row) for row in rows]
+
+    async def aserialize(self, rows):
+        with timed('serialize'):
+            if not isinstance(rows, list):
+                rows = [row async for row in rows]
+            await self.aprefetch(rows)
+            return [self.to_representation(row) for row in rows]
+
+
+class SkillFastSerializer(FastListSerializer):
+    serializer_class = SkillSerializer
+
+
+class ServiceFastSerializer(FastListSerializer):
+    serializer_class = ServiceSerializer
+    computed = {
+        # same as Service.get_features_list()
+        'features_list': (['features'], lambda row, _: [
+            f.strip() for f in row['features'].split('\n') if f.strip()]),
+    }
+
+
+PLATFORM_DISPLAY = dict(SocialPost.PLATFORM_CHOICES)
+
+
+class SocialPostFastSerializer(FastListSerializer):
+    serializer_class = SocialPostSerializer
+    computed = {
+        # same as get_platform_display(), without building the dict per row
+        'platform_display': (['platform'], lambda row, _: PLATFORM_DISPLAY.get(
+            row['platform'], row['platform'])),
+    }
+
+
+class ProjectFastSerializer(FastListSerializer):
+    serializer_class = ProjectSerializer
+    computed = {
+        'image_srcset': (['image_variants'], lambda row, self: srcset(
+            row['image_variants'], self.context.get('request'))),
+    }
+
+
+class BlogPostListFastSerializer(FastListSerializer):
+    serializer_class = BlogPostListSerializer
+    computed = {
+        'featured_image_srcset': (
+            ['featured_image_variants'], lambda row, self: srcset(
+                row['featured_image_variants'], self.context.get('request'))),
+    }
+
+
+class CommentFastSerializer(FastListSerializer):
+    serializer_class = CommentSerializer
+
+
+class BlogPostDetailFastSerializer(BlogPostListFastSerializer):
+    serializer_class = BlogPostDetailSerializer
+    computed = {
+        **BlogPostListFastSerializer.computed,
+        'comments': (['id'], _related('comments')),
+        'related_posts': (['id'], _related('related_posts')),
+    }
+
+    def related_queries(self, ids):
+        # Approved comments of the posts, like get_comments() (newest first)
+        comments = CommentFastSerializer()
+        rows = Comment.objects.filter(post_id__in=ids, approved=True).values(
+            *comments.columns)
+        return super().related_queries(ids) + [
+            ('comments', rows,
+             lambda row: (row['post_id'], comments.to_representation(row))),
+            ('related_posts', related_posts_query(ids), related_post_pair),
+        ]
+
+
+class FastListMixin:
+    """list() through a FastListSerializer instead of the DRF serializer.
+
+    serializer_class is still used for everything else (browsable API forms,
+    schema), and must be the serializer_class of fast_serializer_class."""
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'FAST_LIST_SERIALIZERS', True):
+            return super().list(request, *args, **kwargs)
+
+        fast = self.fast_serializer_class(
+            context=self.get_serializer_context())
+        # The cursor paginator reads its ordering fields from the rows
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        fast._add_columns([field.lstrip('-') for field in ordering])
+        # prefetch_related() is replaced by FastListSerializer.prefetch()
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(
+            None).values(*fast.columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(queryset))
+
+
+class StreamingExportMixin(FastListMixin):
+    """Stream every row as one JSON array instead of a paginated page.
+
+    Rows are read with .iterator(chunk_size=EXPORT_CHUNK_SIZE), serialized
+    and encoded one chunk at a time, so memory use stays flat however many
+    rows there are. Use with pagination_class = None."""
+    export_ordering = ()
+
+    def list(self, request, *args, **kwargs):
+        fast = self.fast_serializer_class(
+            context=self.get_serializer_context())
+        chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(
+            None).order_by(*self.export_ordering).values(*fast.columns)
+        rows = queryset.iterator(chunk_size=chunk_size)
+
+        def chunks():
+            while chunk := list(islice(rows, chunk_size)):
+                yield fast.serialize(chunk)
+
+        return StreamingHttpResponse(stream_json_array(chunks()),
+                                     content_type='application/json')
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.urls import resolve, reverse
+from rest_framework.exceptions import APIException
+
+# Data for the landing page in one request: /api/home/
+#
+# The frontend used to call six endpoints on a cold page load. /api/home/
+# returns the same six payloads in one JSON object:
+#   {"projects": <GET /api/projects/>, "skills": <GET /api/skills/>, ...}
+# Each section is built by calling the existing view with a small internal
+# GET request, so it is exactly what the standalone endpoint returns (same
+# filters, pagination links, and it fills that endpoint's response cache too).
+#
+# The sections don't depend on each other, so they run at the same time on a
+# small thread pool (each thread has its own database connection). The whole
+# bundle is cached as one unit by HomeView (see views.py).
+#
+# If any section doesn't answer 200 the whole bundle fails with a 500
+# (SectionFailed), so a half-broken bundle is never cached.
+#
+# Settings (all optional):
+# HOME_BUNDLE_WORKERS = 4  (1: build the sections one after another, inline)
+# HOME_SOCIAL_LIMIT = 6    (default for ?social_limit=)
+
+# section -> (URL name of the standalone endpoint, query string)
+SECTIONS = {
+    'projects': ('project-list', ''),
+    'skills': ('skill-list', ''),
+    'services': ('service-list', ''),
+    'featured_posts': ('blog-list', 'featured=1'),
+    'categories': ('blog-categories', ''),
+    'social': ('social-list', 'limit={limit}'),
+}
+# Validators of the outer request must not turn a section into a 304
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+                       'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE')
+
+_executor = None
+
+
+class SectionFailed(APIException):
+    default_detail = 'A section of the home page could not be built.'
+    default_code = 'section_failed'
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'HOME_BUNDLE_WORKERS', 4),
+            thread_name_prefix='home-bundle')
+    return _executor
+
+
+def _sub_request(request, path, query_string):
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {key: value for key, value in request.META.items()
+                if key not in CONDITIONAL_HEADERS}
+    sub.META.update(PATH_INFO=path, QUERY_STRING=query_string,
+                    REQUEST_METHOD='GET')
+    sub.GET = QueryDict(query_string)
+    return sub
+
+
+def build_section(name, request, query_string):
+    path = reverse(SECTIONS[name][0])
+    match = resolve(path)
+    response = match.func(_sub_request(request, path, query_string),
+                          *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise SectionFailed(f'The {name} section of the home page failed '
+                            f'with status {response.status_code}.')
+    return response.data
+
+
+def build_section_in_thread(*args):
+    try:
+        return build_section(*args)
+    finally:
+        # Like the end of a normal request: drop the connection if it is
+        # broken or older than CONN_MAX_AGE, otherwise keep it for reuse
+        close_old_connections()
+
+
+def build_home_bundle(request, social_limit):
+    """{section name: data of that endpoint} for the landing page"""
+    jobs = {name: (name, request, query.format(limit=social_limit))
+            for name, (_, query) in SECTIONS.items()}
+    if getattr(settings, 'HOME_BUNDLE_WORKERS', 4) <= 1:
+        return {name: build_section(*job) for name, job in jobs.items()}
+
+    executor = _get_executor()
+    futures = {name: executor.submit(build_section_in_thread, *job)
+               for name, job in jobs.items()}
+    return {name: future.result() for name, future in futures.items()}
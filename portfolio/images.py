@@ -0,0 +1,246 @@
+import base64
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+from PIL import Image, ImageOps
+from .cache import bump_version
+
+# Responsive image derivatives for Project.image and BlogPost.featured_image.
+#
+# The originals are huge (3840x2400 JPEGs), so after an upload we write
+# resized copies next to the original:
+#   projects/photo.jpg -> projects/photo-480w.webp, projects/photo-480w.avif,
+#                         projects/photo-480w.jpg, projects/photo-960w.webp ...
+# and remember them in a JSON field on the row (<image field>_variants):
+#   {"source": "projects/photo.jpg",
+#    "webp": {"480": "projects/photo-480w.webp", ...}, "jpeg": {...}}
+# The serializers turn that into absolute URLs (a srcset-style map).
+#
+# The same job also stores metadata the frontend needs before the image
+# arrives: <field>_width, <field>_height (to reserve layout space),
+# <field>_color (dominant colour, "#rrggbb") and <field>_placeholder (a ~16px
+# wide blurred preview as a base64 data: URI, a few hundred bytes).
+#
+# Resizing takes seconds for big photos, so it runs on a small thread pool
+# after the transaction commits - the admin save returns straight away.
+# Pillow releases the GIL while resizing/encoding, so threads are enough.
+#
+# Settings (all optional):
+# IMAGE_VARIANT_WIDTHS = (480, 960, 1600)
+# IMAGE_VARIANT_WORKERS = 2
+# IMAGE_VARIANTS_ASYNC = True  (False: generate inline, used by the tests)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (480, 960, 1600)
+PLACEHOLDER_WIDTH = 16
+METADATA = ('width', 'height', 'color', 'placeholder')
+EMPTY_METADATA = {'width': None, 'height': None, 'color': '', 'placeholder': ''}
+# format key -> (Pillow format, file extension, save options)
+FORMATS = {
+    'avif': ('AVIF', 'avif', {'quality': 60}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True,
+                             'progressive': True}),
+}
+
+_executor = None
+
+
+def variants_field_name(image_field_name):
+    return f'{image_field_name}_variants'
+
+
+def metadata_field_names(image_field_name):
+    return {key: f'{image_field_name}_{key}' for key in METADATA}
+
+
+def available_formats():
+    # AVIF needs a Pillow build with libavif; skip what this build can't write
+    Image.init()
+    return [key for key, (pil_format, _, _) in FORMATS.items()
+            if pil_format in Image.SAVE]
+
+
+def _widths_for(original_width):
+    widths = sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', DEFAULT_WIDTHS))
+    # Never upscale; a small image gets one variant at its own width
+    return [w for w in widths if w < original_width] or [original_width]
+
+
+def open_image(field_file):
+    with field_file.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    return image
+
+
+def dominant_color(image):
+    # Reduce to 5 colours on a small copy and take the most common one
+    small = image.convert('RGB')
+    small.thumbnail((64, 64))
+    palette_image = small.quantize(colors=5)
+    _, index = max(palette_image.getcolors())
+    r, g, b = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def placeholder_data_uri(image):
+    small = image.copy()
+    small.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4))
+    buffer = BytesIO()
+    if 'WEBP' in Image.SAVE:
+        small.save(buffer, 'WEBP', quality=40)
+        mime = 'image/webp'
+    else:
+        small.convert('RGB').save(buffer, 'JPEG', quality=40)
+        mime = 'image/jpeg'
+    return f'data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode()}'
+
+
+def image_metadata(image):
+    """{'width', 'height', 'color', 'placeholder'} for an opened image"""
+    return {
+        'width': image.width,
+        'height': image.height,
+        'color': dominant_color(image),
+        'placeholder': placeholder_data_uri(image),
+    }
+
+
+def metadata_values(image_field_name, metadata):
+    """Model field values (e.g. image_width=...) for image_metadata()"""
+    names = metadata_field_names(image_field_name)
+    metadata = metadata or EMPTY_METADATA  # None: the image was removed
+    return {names[key]: metadata[key] for key in METADATA}
+
+
+def generate_variants(field_file, original=None):
+    """Write every width/format variant of an image next to it and return
+    the variants dict stored on the model."""
+    storage = field_file.storage
+    root, _ = os.path.splitext(field_file.name)
+    variants = {'source': field_file.name}
+    if original is None:
+        original = open_image(field_file)
+
+    for width in _widths_for(original.width):
+        height = round(original.height * width / original.width)
+        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        for key in available_formats():
+            pil_format, extension, options = FORMATS[key]
+            image = resized
+            if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')  # JPEG has no alpha channel
+            buffer = BytesIO()
+            image.save(buffer, pil_format, **options)
+
+            name = f'{root}-{width}w.{extension}'
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(name, ContentFile(buffer.getvalue()))
+            variants.setdefault(key, {})[str(width)] = name
+    return variants
+
+
+def delete_variants(storage, variants):
+    for key in FORMATS:
+        for name in (variants or {}).get(key, {}).values():
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def needs_variants(instance, image_field_name):
+    field_file = getattr(instance, image_field_name)
+    variants = getattr(instance, variants_field_name(image_field_name)) or {}
+    return variants.get('source') != (field_file.name or None)
+
+
+def build_variants(model_label, pk, image_field_name):
+    """Generate (or clear) the variants of one row. Runs on the pool."""
+    model = apps.get_model(model_label)
+    variants_field = variants_field_name(image_field_name)
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is None or not needs_variants(instance, image_field_name):
+            return
+        field_file = getattr(instance, image_field_name)
+        old_variants = getattr(instance, variants_field)
+        variants, metadata = {}, None
+        if field_file:
+            original = open_image(field_file)
+            metadata = image_metadata(original)
+            variants = generate_variants(field_file, original)
+        delete_variants(field_file.storage, old_variants)
+
+        # Only store the result if nobody uploaded another image meanwhile.
+        # .update() skips save(), so the response cache is bumped by hand and
+        # updated_at is set here - it changes the ETag / Last-Modified, so
+        # clients holding the response without the variants get the new one
+        if field_file.name:
+            same_image = Q(**{image_field_name: field_file.name})
+        else:
+            same_image = Q(**{image_field_name: ''}) | \
+                Q(**{f'{image_field_name}__isnull': True})
+        model.objects.filter(same_image, pk=pk).update(
+            **{variants_field: variants},
+            **metadata_values(image_field_name, metadata),
+            updated_at=Now())
+        bump_version(model)
+    except Exception:
+        logger.exception("Could not build image variants for %s %s",
+                         model_label, pk)
+
+
+def build_variants_in_thread(*args):
+    try:
+        build_variants(*args)
+    finally:
+        connection.close()  # each pool thread has its own DB connection
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+            thread_name_prefix='image-variants')
+    return _executor
+
+
+def schedule_variants(instance, image_field_name):
+    """Queue variant generation for after the current transaction commits."""
+    if not needs_variants(instance, image_field_name):
+        return
+    args = (instance._meta.label, instance.pk, image_field_name)
+
+    def submit():
+        if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+            _get_executor().submit(build_variants_in_thread, *args)
+        else:
+            build_variants(*args)
+
+    transaction.on_commit(submit)
+
+
+def srcset(variants, request=None):
+    """{'webp': {'480': 'projects/a-480w.webp'}} -> same shape with URLs"""
+    result = {}
+    for key in FORMATS:
+        names = (variants or {}).get(key)
+        if not names:
+            continue
+        result[key] = {}
+        for width, name in names.items():
+            url = default_storage.url(name)
+            result[key][width] = request.build_absolute_uri(url) \
+                if request else url
+    return result
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from portfolio.cache import bump_version
+from portfolio.images import image_metadata, metadata_values, open_image
+from portfolio.models import BlogPost, Project
+
+IMAGE_FIELDS = [(Project, 'image'), (BlogPost, 'featured_image')]
+
+
+class Command(BaseCommand):
+    help = ("Fill in width/height/colour/placeholder for images uploaded "
+            "before the metadata fields existed")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        for model, field_name in IMAGE_FIELDS:
+            # The new metadata is part of the response: moving updated_at
+            # also changes the ETag/Last-Modified, so clients don't keep
+            # their copy without it
+            fields = list(metadata_values(field_name, None)) + ['updated_at']
+            rows = (model.objects
+                    .exclude(**{field_name: ''})
+                    .exclude(**{f'{field_name}__isnull': True})
+                    .filter(**{f'{field_name}_width__isnull': True})
+                    .only('pk', field_name, *fields))
+
+            # iterator() streams rows from the database instead of loading
+            # the whole table; each chunk is written with one bulk_update
+            done, chunk = 0, []
+            for instance in rows.iterator(chunk_size=chunk_size):
+                try:
+                    image = open_image(getattr(instance, field_name))
+                except (OSError, ValueError) as error:
+                    self.stderr.write(f"{model.__name__} {instance.pk}: {error}")
+                    continue
+                values = metadata_values(field_name, image_metadata(image))
+                for name, value in values.items():
+                    setattr(instance, name, value)
+                instance.updated_at = timezone.now()
+                chunk.append(instance)
+                if len(chunk) >= chunk_size:
+                    done += model.objects.bulk_update(chunk, fields)
+                    chunk = []
+            if chunk:
+                done += model.objects.bulk_update(chunk, fields)
+            if done:
+                bump_version(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: filled metadata for {done} images"))
@@ -0,0 +1,15 @@
+import time
+from django.core.management.base import BaseCommand
+from portfolio import related
+
+
+class Command(BaseCommand):
+    help = "Recompute the related posts of every published blog post"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = related.rebuild_related_posts()
+        method = 'NumPy' if related.numpy is not None else 'pure Python'
+        self.stdout.write(self.style.SUCCESS(
+            f"Related posts of {count} posts rebuilt with {method} in "
+            f"{time.perf_counter() - started:.2f}s"))
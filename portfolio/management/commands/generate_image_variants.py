@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from portfolio.images import (build_variants, build_variants_in_thread,
+                              needs_variants)
+from portfolio.models import BlogPost, Project
+
+IMAGE_FIELDS = [(Project, 'image'), (BlogPost, 'featured_image')]
+
+
+class Command(BaseCommand):
+    help = "Build missing responsive image variants for existing media"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Rebuild variants that already exist (e.g. new widths)")
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model, field_name in IMAGE_FIELDS:
+            variants_field = f'{field_name}_variants'
+            rows = (model.objects.exclude(**{field_name: ''})
+                    .exclude(**{f'{field_name}__isnull': True})
+                    .only('pk', field_name, variants_field))
+            if options['force']:
+                rows.update(**{variants_field: {}})
+            for instance in rows.iterator(chunk_size=500):
+                if needs_variants(instance, field_name):
+                    jobs.append((model._meta.label, instance.pk, field_name))
+
+        self.stdout.write(f"Building variants for {len(jobs)} images...")
+        if options['workers'] == 1:
+            for job in jobs:
+                build_variants(*job)
+        else:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                list(pool.map(lambda job: build_variants_in_thread(*job),
+                              jobs))
+        self.stdout.write(self.style.SUCCESS("Done"))
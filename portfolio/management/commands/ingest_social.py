@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from portfolio.social import (DEFAULT_BATCH_SIZE, apply_refresh,
+                              changed_posts, clean_post, dedupe, due_posts,
+                              get_fetchers, logger, upsert_posts)
+
+
+class Command(BaseCommand):
+    help = "Fetch the latest social media posts and upsert them into SocialPost"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--platform', action='append', dest='platforms',
+            help="Only this platform (repeatable). Default: all configured")
+        parser.add_argument(
+            '--source-dir',
+            help="Read <platform>.json files from this directory instead of "
+                 "the SOCIAL_FETCHERS backends")
+        parser.add_argument(
+            '--refresh', action='store_true',
+            help="Only refresh likes/comments/shares of the stored posts that "
+                 "are due (newest first), instead of fetching new posts")
+        parser.add_argument('--limit', type=int, default=1000,
+                            help="Most posts refreshed in one --refresh run")
+        parser.add_argument('--batch-size', type=int,
+                            default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=4)
+
+    def fetch(self, platform, fetcher, urls=None):
+        try:
+            raw_posts = fetcher.fetch() if urls is None \
+                else fetcher.refresh(urls)
+            return [clean_post(platform, raw) for raw in raw_posts]
+        except Exception:
+            # One broken platform shouldn't stop the others
+            logger.exception("Fetching %s posts failed", platform)
+            self.stderr.write(f"{platform}: fetch failed, skipped")
+            return []
+
+    def fetch_all(self, jobs, workers):
+        # Fetching is network bound, so every platform runs on its own thread
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(lambda job: self.fetch(*job), jobs)
+            return dedupe([post for result in results for post in result])
+
+    def handle(self, *args, **options):
+        try:
+            fetchers = get_fetchers(options['platforms'],
+                                    options['source_dir'])
+        except ImproperlyConfigured as e:
+            raise CommandError(e)
+        if not fetchers:
+            raise CommandError("No fetchers: set SOCIAL_FETCHERS or pass "
+                               "--source-dir")
+
+        started = time.perf_counter()
+        now = timezone.now()
+        if options['refresh']:
+            count = self.refresh(fetchers, now, options)
+        else:
+            posts = self.fetch_all(fetchers.items(), options['workers'])
+            new, changed = changed_posts(posts)
+            upsert_posts(new + changed, now, options['batch_size'])
+            count = len(posts)
+            self.stdout.write(
+                f"{len(posts)} posts from {len(fetchers)} platforms: "
+                f"{len(new)} new, {len(changed)} updated, "
+                f"{len(posts) - len(new) - len(changed)} unchanged")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.2f}s "
+            f"({count / elapsed if elapsed else 0:.0f} posts/s)"))
+
+    def refresh(self, fetchers, now, options):
+        due = due_posts(list(fetchers), now, options['limit'])
+        urls = {}
+        for post in due:
+            urls.setdefault(post.platform, []).append(post.url)
+        fetched = self.fetch_all(
+            [(platform, fetchers[platform], platform_urls)
+             for platform, platform_urls in urls.items()],
+            options['workers'])
+        changed, unchanged = apply_refresh(
+            due, {post['url']: post for post in fetched}, now,
+            options['batch_size'])
+        self.stdout.write(f"{len(due)} posts due for a refresh: "
+                          f"{len(changed)} changed, {len(unchanged)} unchanged")
+        return len(due)
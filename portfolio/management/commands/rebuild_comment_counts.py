@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from portfolio.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = "Recompute BlogPost.approved_comment_count from the comments table"
+
+    def handle(self, *args, **options):
+        updated = BlogPost.objects.all().refresh_approved_comment_count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt approved comment counts for {updated} posts"))
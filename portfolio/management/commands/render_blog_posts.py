@@ -0,0 +1,54 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from portfolio.cache import bump_version
+from portfolio.content import RENDERED_FIELDS, RENDERER_VERSION, render_content
+from portfolio.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = ("Re-render the stored HTML of blog posts made by an older "
+            "renderer version (see portfolio/content.py)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Re-render every post, not only outdated ones")
+        # Rendering is pure Python (CPU bound), so the pool uses processes
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        posts = BlogPost.objects.all()
+        if not options['all']:
+            posts = posts.exclude(content_renderer_version=RENDERER_VERSION)
+        pks = list(posts.order_by('pk').values_list('pk', flat=True))
+        self.stdout.write(f"Rendering {len(pks)} posts with renderer "
+                          f"version {RENDERER_VERSION}...")
+
+        pool = None
+        if options['workers'] > 1 and len(pks) > 1:
+            pool = ProcessPoolExecutor(max_workers=options['workers'])
+        try:
+            batch_size = options['batch_size']
+            for start in range(0, len(pks), batch_size):
+                batch = list(BlogPost.objects.filter(
+                    pk__in=pks[start:start + batch_size]).only('pk', 'content'))
+                contents = [post.content for post in batch]
+                results = pool.map(render_content, contents, chunksize=8) \
+                    if pool else map(render_content, contents)
+                # New HTML is a new representation: moving updated_at also
+                # changes the ETag/Last-Modified of the detail endpoint
+                now = timezone.now()
+                for post, values in zip(batch, results):
+                    for field, value in values.items():
+                        setattr(post, field, value)
+                    post.updated_at = now
+                BlogPost.objects.bulk_update(
+                    batch, RENDERED_FIELDS + ['updated_at'])
+        finally:
+            if pool:
+                pool.shutdown()
+
+        if pks:
+            bump_version(BlogPost)  # bulk_update sends no post_save signals
+        self.stdout.write(self.style.SUCCESS("Done"))
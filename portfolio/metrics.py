@@ -0,0 +1,275 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+from .query_budget import check_query_budget, query_stack, record_queries
+
+# Per-request performance numbers: where does the time of a request go?
+#
+# PerformanceMiddleware measures every request:
+#   db         time spent in SQL queries (+ how many), through a
+#              connection.execute_wrapper() around the request
+#   serialize  time spent building the response data (DRF serializer .data,
+#              FastListSerializer.serialize) - queries it triggers included
+#   render     time spent turning the data into JSON/HTML
+#   total      the whole request, as seen by the middleware
+# and sends them back in a Server-Timing header, which the browser dev tools
+# show in the Network tab's "Timing" section:
+#   Server-Timing: db;dur=3.1;desc="4 queries", serialize;dur=1.2, ...
+#
+# The header tells how long our queries take, so it is only sent where that
+# is no secret: with DEBUG on, to INTERNAL_IPS, to staff users (logged in to
+# the admin), or to everyone when SERVER_TIMING_PUBLIC is True.
+#
+# The same numbers are added to in-process histograms per view (URL name),
+# served in Prometheus text format at /api/_metrics (staff only). They are
+# per worker process and start again from zero when the process restarts.
+#
+# Not measured: queries run on other threads (the /api/home/ sections, the
+# background writers) and the body of streamed responses, which is produced
+# after the middleware has returned.
+#
+# The query count is also checked against the view's query_budget, see
+# query_budget.py. Requests picked by record_queries() keep the SQL and stack
+# trace of each query for that check's report.
+#
+# The cost per request is a few perf_counter() calls per query plus one
+# short lock to update the histograms.
+#
+# Settings (all optional):
+#   SERVER_TIMING_PUBLIC  send the Server-Timing header to every client
+#                         (default False)
+
+# Histogram buckets, in seconds and in queries per request
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PHASES = ('db', 'serialize', 'render', 'total')
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self, record=False):
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.recorded = [] if record else None  # [(sql, params, stack)]
+        self._depth = 0  # nested serializer .data calls count once
+
+    def add(self, phase, seconds):
+        self.durations[phase] += seconds
+
+    def query_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.durations['db'] += time.perf_counter() - started
+            self.queries += 1
+            if self.recorded is not None:
+                self.recorded.append((sql, params, query_stack()))
+
+    def server_timing(self):
+        parts = []
+        for phase in PHASES:
+            entry = f'{phase};dur={self.durations[phase] * 1000:.2f}'
+            if phase == 'db':
+                entry += f';desc="{self.queries} queries"'
+            parts.append(entry)
+        return ', '.join(parts)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's phase"""
+    timings = _current.get()
+    if timings is None or timings._depth:
+        yield  # not in a request, or already inside a timed block
+        return
+    timings._depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._depth -= 1
+        timings.add(phase, time.perf_counter() - started)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one: +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.durations = {}  # (view, phase) -> Histogram
+            self.queries = {}  # view -> Histogram
+            self.responses = {}  # (view, status) -> count
+
+    def record(self, view, status, timings):
+        with self._lock:
+            for phase, seconds in timings.durations.items():
+                key = (view, phase)
+                if key not in self.durations:
+                    self.durations[key] = Histogram(DURATION_BUCKETS)
+                self.durations[key].observe(seconds)
+            if view not in self.queries:
+                self.queries[view] = Histogram(QUERY_BUCKETS)
+            self.queries[view].observe(timings.queries)
+            key = (view, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP portfolio_requests_total Responses by view and status',
+                '# TYPE portfolio_requests_total counter',
+            ]
+            for (view, status), count in sorted(self.responses.items()):
+                lines.append(f'portfolio_requests_total{{view="{view}",'
+                             f'status="{status}"}} {count}')
+            lines += [
+                '# HELP portfolio_request_duration_seconds Time per request '
+                'phase (db, serialize, render, total)',
+                '# TYPE portfolio_request_duration_seconds histogram',
+            ]
+            for (view, phase), histogram in sorted(self.durations.items()):
+                lines.extend(histogram.lines(
+                    'portfolio_request_duration_seconds',
+                    f'view="{view}",phase="{phase}"'))
+            lines += [
+                '# HELP portfolio_request_queries SQL queries per request',
+                '# TYPE portfolio_request_queries histogram',
+            ]
+            for view, histogram in sorted(self.queries.items()):
+                lines.extend(histogram.lines('portfolio_request_queries',
+                                             f'view="{view}"'))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _timed_data(original):
+    def data(self):
+        with timed('serialize'):
+            return original.fget(self)
+    return property(data)
+
+
+def instrument_serializers():
+    """Time DRF's serializer.data (called once from PortfolioConfig.ready)"""
+    if not getattr(serializers.BaseSerializer.data.fget, '_timed', False):
+        serializers.BaseSerializer.data = _timed_data(
+            serializers.BaseSerializer.data)
+        serializers.BaseSerializer.data.fget._timed = True
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    # Label values come from our own URL names, so they need no escaping
+    return (match.view_name if match else None) or 'unresolved'
+
+
+def _timing_is_public(request):
+    return (settings.DEBUG
+            or getattr(settings, 'SERVER_TIMING_PUBLIC', False)
+            or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS)
+
+
+def _is_staff(user):
+    return bool(user is not None and user.is_staff)
+
+
+class PerformanceMiddleware:
+    """Server-Timing header + histograms for every request (see above)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings(record=record_queries())
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.query_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        # request.user is looked up after the measurement, so its session
+        # and user queries don't count
+        show = (_timing_is_public(request)
+                or _is_staff(getattr(request, 'user', None)))
+        return self.finish(request, response, timings, started, show)
+
+    async def __acall__(self, request):
+        timings = RequestTimings(record=record_queries())
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.query_wrapper))
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        # request.user would query the database synchronously here, which
+        # Django refuses in async code: auser() is the async version
+        show = _timing_is_public(request)
+        if not show and hasattr(request, 'auser'):
+            show = _is_staff(await request.auser())
+        return self.finish(request, response, timings, started, show)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns: time the rendering
+        # with a callback that runs once the content is ready
+        timings = _current.get()
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: timings.add(
+                'render', time.perf_counter() - started))
+        return response
+
+    def finish(self, request, response, timings, started, show):
+        timings.add('total', time.perf_counter() - started)
+        # The histograms are always recorded, the header only if allowed
+        if show:
+            response['Server-Timing'] = timings.server_timing()
+        registry.record(_view_name(request), response.status_code, timings)
+        check_query_budget(request, timings.queries, timings.recorded)
+        return response
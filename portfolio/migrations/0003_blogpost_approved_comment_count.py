@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_approved_comment_count(apps, schema_editor):
+    BlogPost = apps.get_model('portfolio', 'BlogPost')
+    Comment = apps.get_model('portfolio', 'Comment')
+    approved = (Comment.objects
+                .filter(post=OuterRef('pk'), approved=True)
+                .order_by()
+                .values('post')
+                .annotate(total=Count('pk'))
+                .values('total'))
+    BlogPost.objects.update(
+        approved_comment_count=Coalesce(Subquery(approved), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0002_blogpost_service_socialpost_comment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='approved_comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_approved_comment_count,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:10
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0003_blogpost_approved_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('published', True)), fields=['-created_at', '-id'], name='blogpost_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('featured', True), ('published', True)), fields=['-created_at', '-id'], name='blogpost_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(django.db.models.functions.text.Lower('category'), models.OrderBy(models.F('created_at'), descending=True), condition=models.Q(('published', True)), name='blogpost_category_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'approved', '-created_at'], name='comment_post_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='socialpost',
+            index=models.Index(fields=['-posted_at', '-id'], name='socialpost_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='socialpost',
+            index=models.Index(fields=['platform', '-posted_at'], name='socialpost_platform_idx'),
+        ),
+    ]
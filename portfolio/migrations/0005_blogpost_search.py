@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:02
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# The GIN index (PostgreSQL) and the FTS5 table (SQLite) are backend specific,
+# so they are created here with raw SQL instead of being declared on the model.
+FTS_TABLE = 'portfolio_blogpost_fts'
+
+
+def create_search_index(apps, schema_editor):
+    BlogPost = apps.get_model('portfolio', 'BlogPost')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX blogpost_search_vector_idx ON portfolio_blogpost '
+            'USING gin (search_vector)')
+        BlogPost.objects.update(search_vector=(
+            SearchVector('title', weight='A')
+            + SearchVector('excerpt', weight='B')
+            + SearchVector('tags', weight='B')
+            + SearchVector('content', weight='C')))
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            f'title, excerpt, tags, content, tokenize="porter unicode61")')
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, excerpt, tags, content) '
+            f'SELECT id, title, excerpt, tags, content FROM portfolio_blogpost')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS blogpost_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
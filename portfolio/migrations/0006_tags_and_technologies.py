@@ -0,0 +1,93 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:40
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def split_names(value):
+    # Same parsing as portfolio.models.split_names, frozen for the migration
+    names = {}
+    for name in (value or '').split(','):
+        name = name.strip()
+        slug = slugify(name)
+        if slug and slug not in names:
+            names[slug] = name
+    return names
+
+
+def link_names(apps, model_name, tag_model_name, string_field, m2m_field):
+    Model = apps.get_model('portfolio', model_name)
+    TagModel = apps.get_model('portfolio', tag_model_name)
+    rows = list(Model.objects.values_list('pk', string_field))
+    parsed = {pk: split_names(value) for pk, value in rows}
+
+    all_names = {}
+    for names in parsed.values():
+        for slug, name in names.items():
+            all_names.setdefault(slug, name)
+    TagModel.objects.bulk_create(
+        [TagModel(name=name, slug=slug) for slug, name in all_names.items()],
+        ignore_conflicts=True)
+    tag_ids = dict(TagModel.objects.values_list('slug', 'pk'))
+
+    Through = getattr(Model, m2m_field).through
+    owner = f'{model_name.lower()}_id'
+    target = f'{tag_model_name.lower()}_id'
+    Through.objects.bulk_create([
+        Through(**{owner: pk, target: tag_ids[slug]})
+        for pk, names in parsed.items()
+        for slug in names
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+def parse_existing_strings(apps, schema_editor):
+    link_names(apps, 'BlogPost', 'Tag', 'tags', 'tag_list')
+    link_names(apps, 'Project', 'Technology', 'technologies',
+               'technology_list')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0005_blogpost_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Technology',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'technologies',
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='tag_list',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='posts', to='portfolio.tag'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='technology_list',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='projects', to='portfolio.technology'),
+        ),
+        migrations.RunPython(parse_existing_strings,
+                             migrations.RunPython.noop),
+    ]
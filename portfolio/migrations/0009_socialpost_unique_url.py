@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:34
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_urls(apps, schema_editor):
+    # Posts entered twice by hand: keep the most recently fetched copy
+    SocialPost = apps.get_model('portfolio', 'SocialPost')
+    duplicates = (SocialPost.objects.values('url')
+                  .annotate(copies=Count('pk'))
+                  .filter(copies__gt=1))
+    for duplicate in duplicates:
+        rows = SocialPost.objects.filter(url=duplicate['url'])
+        newest = rows.order_by('-fetched_at', '-pk').first()
+        rows.exclude(pk=newest.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0008_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_urls, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='socialpost',
+            name='url',
+            field=models.URLField(unique=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:35
+
+import hashlib
+import json
+from datetime import timezone
+
+from django.db import migrations, models
+
+# Frozen copy of SocialPost.HASHED_FIELDS / compute_content_hash()
+HASHED_FIELDS = ['platform', 'content', 'posted_at', 'likes', 'comments',
+                 'shares', 'image_url']
+
+
+def fill_content_hash(apps, schema_editor):
+    # next_refresh_at stays empty: every post is due for its first refresh
+    SocialPost = apps.get_model('portfolio', 'SocialPost')
+    posts = []
+    for post in SocialPost.objects.only(*HASHED_FIELDS).iterator(
+            chunk_size=1000):
+        values = [getattr(post, field) for field in HASHED_FIELDS]
+        values[2] = values[2].astimezone(timezone.utc).isoformat()
+        raw = json.dumps(values, ensure_ascii=False)
+        post.content_hash = hashlib.sha1(raw.encode()).hexdigest()
+        posts.append(post)
+    SocialPost.objects.bulk_update(posts, ['content_hash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0009_socialpost_unique_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='socialpost',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='socialpost',
+            name='next_refresh_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='socialpost',
+            index=models.Index(fields=['next_refresh_at'], name='socialpost_refresh_idx'),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+def render_existing_posts(apps, schema_editor):
+    # Uses the current renderer rather than a frozen copy: every row records
+    # content_renderer_version, so `manage.py render_blog_posts` re-renders
+    # them whenever the renderer changes later
+    from portfolio.content import RENDERED_FIELDS, render_content
+
+    BlogPost = apps.get_model('portfolio', 'BlogPost')
+    posts = []
+    for post in BlogPost.objects.only('pk', 'content').iterator(
+            chunk_size=200):
+        for field, value in render_content(post.content).items():
+            setattr(post, field, value)
+        posts.append(post)
+    BlogPost.objects.bulk_update(posts, RENDERED_FIELDS, batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0010_socialpost_refresh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_renderer_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='blogpost',
+            name='reading_time',
+            field=models.IntegerField(default=5, editable=False, help_text='Estimated reading time in minutes (from word_count)'),
+        ),
+        migrations.RunPython(render_existing_posts,
+                             migrations.RunPython.noop),
+    ]
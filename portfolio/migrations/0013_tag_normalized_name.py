@@ -0,0 +1,114 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+# Tags and technologies used to be told apart by slugify(name), which maps
+# "C", "C++" and "C#" to the same row and drops names like "日本語". This
+# fills the new normalized column and links every post / project again from
+# its comma-separated string, creating the rows that were merged or dropped.
+# Existing rows keep their slugs, so URLs using them still work.
+
+SLUG_SYMBOLS = {'+': ' plus ', '#': ' sharp '}
+
+
+# Same parsing as portfolio.models, frozen for the migration
+def normalize_name(name):
+    return ' '.join(name.split()).casefold()[:100]
+
+
+def split_names(value):
+    names = {}
+    for name in (value or '').split(','):
+        name = ' '.join(name.split())[:100]
+        key = normalize_name(name)
+        if key and key not in names:
+            names[key] = name
+    return names
+
+
+def name_slug(name):
+    for symbol, word in SLUG_SYMBOLS.items():
+        name = name.replace(symbol, word)
+    return slugify(name, allow_unicode=True)
+
+
+def relink_names(apps, model_name, tag_model_name, string_field, m2m_field):
+    Model = apps.get_model('portfolio', model_name)
+    TagModel = apps.get_model('portfolio', tag_model_name)
+
+    # Existing rows by normalized name. Two old rows can normalize to the
+    # same name ("Straße" and "Strasse" had different slugs): keep the first
+    by_key = {}
+    duplicates = []
+    for tag in TagModel.objects.order_by('pk'):
+        key = normalize_name(tag.name)
+        if not key or key in by_key:
+            duplicates.append(tag.pk)
+            continue
+        tag.normalized = key
+        by_key[key] = tag
+    TagModel.objects.filter(pk__in=duplicates).delete()
+    TagModel.objects.bulk_update(by_key.values(), ['normalized'],
+                                 batch_size=1000)
+    taken = set(TagModel.objects.values_list('slug', flat=True))
+
+    Through = getattr(Model, m2m_field).through
+    owner = f'{model_name.lower()}_id'
+    target = f'{tag_model_name.lower()}_id'
+    links = []
+    for pk, value in Model.objects.values_list('pk', string_field):
+        for key, name in split_names(value).items():
+            tag = by_key.get(key)
+            if tag is None:
+                base = name_slug(name)[:90] or tag_model_name.lower()
+                slug, number = base, 1
+                while slug in taken:
+                    number += 1
+                    slug = f'{base}-{number}'
+                taken.add(slug)
+                tag = by_key[key] = TagModel.objects.create(
+                    name=name, normalized=key, slug=slug)
+            links.append(Through(**{owner: pk, target: tag.pk}))
+    Through.objects.all().delete()
+    Through.objects.bulk_create(links, batch_size=1000)
+
+
+def relink_existing_strings(apps, schema_editor):
+    relink_names(apps, 'BlogPost', 'Tag', 'tags', 'tag_list')
+    relink_names(apps, 'Project', 'Technology', 'technologies',
+                 'technology_list')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0012_related_posts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='normalized',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='technology',
+            name='normalized',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='technology',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, max_length=100, unique=True),
+        ),
+        migrations.RunPython(relink_existing_strings,
+                             migrations.RunPython.noop),
+    ]
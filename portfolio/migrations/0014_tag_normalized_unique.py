@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0013: PostgreSQL can't ALTER a table in the same
+    # transaction that just changed rows referencing it
+
+    dependencies = [
+        ('portfolio', '0013_tag_normalized_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='normalized',
+            field=models.CharField(editable=False, max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='technology',
+            name='normalized',
+            field=models.CharField(editable=False, max_length=100, unique=True),
+        ),
+    ]
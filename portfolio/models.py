@@ -1,16 +1,149 @@
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
 from django.utils.text import slugify
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce, Lower
+from .cache import bump_version
+from .content import RENDERED_FIELDS, render_content
 
 # Create your models here.
 
 
+# Symbols that tell names apart ("C", "C++", "C#") are spelled out in the
+# slug instead of being dropped by slugify()
+SLUG_SYMBOLS = {'+': ' plus ', '#': ' sharp '}
+
+
+def normalize_name(name):
+    """'  Django   REST ' -> 'django rest' (what makes two names the same)"""
+    return ' '.join(name.split()).casefold()[:100]
+
+
+def split_names(value):
+    """Parse a comma-separated string: 'Python, django,python, '
+    -> {'python': 'Python', 'django': 'django'} (normalized -> first
+    spelling)"""
+    names = {}
+    for name in (value or '').split(','):
+        name = ' '.join(name.split())[:100]
+        key = normalize_name(name)
+        if key and key not in names:
+            names[key] = name
+    return names
+
+
+def name_slug(name):
+    """'C++' -> 'c-plus-plus', '日本語' -> '日本語', '!!!' -> ''"""
+    for symbol, word in SLUG_SYMBOLS.items():
+        name = name.replace(symbol, word)
+    return slugify(name, allow_unicode=True)
+
+
+class NamedTag(models.Model):
+    # Shared by Tag and Technology. The normalized name is the identity, so
+    # "Django", "django " and "DJANGO" all end up as the same row, while "C",
+    # "C++" and "C#" are three rows. The slug is only for URLs: unique, with
+    # a number added when two names would get the same one ("NET", ".NET").
+    name = models.CharField(max_length=100)
+    normalized = models.CharField(max_length=100, unique=True, editable=False)
+    slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        # e.g. renamed in the admin: the identity follows the name
+        self.normalized = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_string(cls, value):
+        """Rows for every name in a comma-separated string, created if
+        missing (1 query when they all exist)."""
+        names = split_names(value)
+        if not names:
+            return []
+        rows = list(cls.objects.filter(normalized__in=names))
+        for _ in range(3):  # again if another request took a slug meanwhile
+            found = {row.normalized for row in rows}
+            missing = {key: name for key, name in names.items()
+                       if key not in found}
+            if not missing:
+                break
+            cls.objects.bulk_create(cls._new_rows(missing),
+                                    ignore_conflicts=True)
+            rows = list(cls.objects.filter(normalized__in=names))
+        return rows
+
+    @classmethod
+    def _new_rows(cls, names):
+        # Unsaved rows with free slugs: 'net', then 'net-2', 'net-3', ...
+        # A name with nothing to slugify ('!!!') gets 'tag' / 'technology'
+        bases = {key: name_slug(name)[:90] or cls._meta.model_name
+                 for key, name in names.items()}
+        similar = Q()
+        for base in set(bases.values()):
+            similar |= Q(slug=base) | Q(slug__startswith=f'{base}-')
+        taken = set(cls.objects.filter(similar).values_list('slug', flat=True))
+        rows = []
+        for key, base in bases.items():
+            slug, number = base, 1
+            while slug in taken:
+                number += 1
+                slug = f'{base}-{number}'
+            taken.add(slug)
+            rows.append(cls(name=names[key], normalized=key, slug=slug))
+        return rows
+
+    @classmethod
+    def lookup(cls, value):
+        """Subquery: pk of the row with this name (any spelling) or this
+        slug, so ?tech=C%23 and ?tech=c-sharp both find C#"""
+        normalized = normalize_name(value)
+        return Subquery(
+            cls.objects.filter(Q(normalized=normalized)
+                               | Q(slug=value.strip().lower()))
+            .order_by(Case(When(normalized=normalized, then=0), default=1))
+            .values('pk')[:1])
+
+
+class Tag(NamedTag):
+    pass
+
+
+class Technology(NamedTag):
+    class Meta(NamedTag.Meta):
+        verbose_name_plural = 'technologies'
+
+
 class Project(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     image = models.ImageField(upload_to='projects/', blank=True, null=True)
+    # Resized WebP/AVIF/JPEG copies of image, filled in the background
+    # (see images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Filled with the variants: size, dominant colour and a tiny base64
+    # preview, so the frontend can lay out and paint before the image loads
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
     github_url = models.URLField(blank=True, null=True)
     live_url = models.URLField(blank=True, null=True)
     technologies = models.CharField(max_length=300)
+    # Normalized copy of technologies, rebuilt from the string on save so the
+    # admin keeps editing a plain comma-separated field
+    technology_list = models.ManyToManyField(
+        Technology, related_name='projects', blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     featured = models.BooleanField(default=False)
@@ -21,6 +154,14 @@ class Project(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'technologies' in update_fields:
+                self.technology_list.set(
+                    Technology.from_string(self.technologies))
+
 # This configures metadata (settings) for your model - how Django should handle it.
 # What ordering = ['-created_at'] Does:
 
@@ -50,7 +191,9 @@ class Contact(models.Model):
     email = models.EmailField()
     subject = models.CharField(max_length=300)
     message = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # default instead of auto_now_add: a message queued by the write-behind
+    # queue (write_queue.py) keeps the time it was sent
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['-created_at']
@@ -59,6 +202,20 @@ class Contact(models.Model):
         return f"{self.name} - {self.subject}"
 
 
+class BlogPostQuerySet(models.QuerySet):
+    def refresh_approved_comment_count(self):
+        """Recompute approved_comment_count for every post in this queryset
+        with a single UPDATE ... SET = (SELECT COUNT(*) ...) statement."""
+        approved = (Comment.objects
+                    .filter(post=OuterRef('pk'), approved=True)
+                    .order_by()
+                    .values('post')
+                    .annotate(total=Count('pk'))
+                    .values('total'))
+        return self.update(
+            approved_comment_count=Coalesce(Subquery(approved), 0))
+
+
 class BlogPost(models.Model):
     title = models.CharField(max_length=200)
     # SlugField is a special field type in Django that is used to store URL-friendly versions of text (usually titles).
@@ -70,18 +227,65 @@ class BlogPost(models.Model):
     content = models.TextField()
     featured_image = models.ImageField(
         upload_to='blog/', blank=True, null=True)
+    featured_image_variants = models.JSONField(
+        default=dict, blank=True, editable=False)  # see images.py
+    featured_image_width = models.PositiveIntegerField(
+        null=True, editable=False)
+    featured_image_height = models.PositiveIntegerField(
+        null=True, editable=False)
+    featured_image_color = models.CharField(
+        max_length=7, blank=True, editable=False)
+    featured_image_placeholder = models.TextField(blank=True, editable=False)
     category = models.CharField(max_length=100)
     tags = models.CharField(max_length=200, help_text="Comma-separated tags")
+    # Normalized copy of tags, rebuilt from the string on save
+    tag_list = models.ManyToManyField(
+        Tag, related_name='posts', blank=True, editable=False)
     published = models.BooleanField(default=False)
     featured = models.BooleanField(default=False)
     views = models.IntegerField(default=0)
+    # Denormalized copy of comments.filter(approved=True).count() so the blog
+    # list reads a plain column. Kept in sync by Comment.save(),
+    # CommentQuerySet and the post_delete receiver in signals.py
+    approved_comment_count = models.IntegerField(default=0, editable=False)
+    # Rendered from content by save() (see content.py)
+    content_html = models.TextField(blank=True, editable=False)
+    toc = models.JSONField(default=list, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
     reading_time = models.IntegerField(
-        default=5, help_text="Estimated reading time in minutes")
+        default=5, editable=False,
+        help_text="Estimated reading time in minutes (from word_count)")
+    content_renderer_version = models.PositiveSmallIntegerField(
+        default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Full-text search index, only filled on PostgreSQL (see search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = BlogPostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        # Indexes matching what BlogPostListView actually asks for. The
+        # condition makes them partial indexes (PostgreSQL and SQLite) that
+        # only contain published posts - drafts never show up in the API.
+        indexes = [
+            # ?cursor= pages: published=True ORDER BY created_at, id
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=Q(published=True),
+                name='blogpost_published_idx'),
+            # ?featured=1
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=Q(published=True, featured=True),
+                name='blogpost_featured_idx'),
+            # ?category= compares LOWER(category), see BlogPostListView
+            models.Index(
+                Lower('category'), F('created_at').desc(),
+                condition=Q(published=True),
+                name='blogpost_category_lower_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -97,7 +301,65 @@ class BlogPost(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
-        super().save(*args, **kwargs)  # without this nothing saved to db
+        update_fields = kwargs.get('update_fields')
+        # Pre-render the markdown (HTML, table of contents, reading time)
+        if update_fields is None or 'content' in update_fields:
+            for field, value in render_content(self.content).items():
+                setattr(self, field, value)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(
+                    RENDERED_FIELDS)
+        with transaction.atomic():
+            super().save(*args, **kwargs)  # without this nothing saved to db
+            if update_fields is None or 'tags' in update_fields:
+                self.tag_list.set(Tag.from_string(self.tags))
+
+
+class CommentQuerySet(models.QuerySet):
+    # Queryset .update() and bulk_create() skip Comment.save() and the
+    # post_save signal, so they refresh the counters of every post they
+    # touched and invalidate the response cache themselves.
+
+    def update(self, **kwargs):
+        if 'approved' not in kwargs and 'post' not in kwargs \
+                and 'post_id' not in kwargs:
+            rows = super().update(**kwargs)
+            bump_version(Comment)  # after the UPDATE, like bulk_create()
+            return rows
+
+        with transaction.atomic(using=self.db):
+            post_ids = set(self.values_list('post_id', flat=True))
+            rows = super().update(**kwargs)
+            new_post = kwargs.get('post_id', kwargs.get('post'))
+            if new_post is not None:
+                post_ids.add(getattr(new_post, 'pk', new_post))
+            BlogPost.objects.filter(
+                pk__in=post_ids).refresh_approved_comment_count()
+        bump_version(Comment)
+        return rows
+
+    def moderate(self, approved, batch_size=500):
+        """Approve (or un-approve) these comments with one UPDATE per
+        batch_size rows. Returns the number of comments that changed."""
+        # Only rows whose flag really changes, so the count is meaningful
+        pks = list(self.filter(approved=not approved).values_list(
+            'pk', flat=True))
+        changed = 0
+        for start in range(0, len(pks), batch_size):
+            # update() above keeps the counters and the cache in step
+            changed += self.model.objects.filter(
+                pk__in=pks[start:start + batch_size]).update(approved=approved)
+        return changed
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            post_ids = {obj.post_id for obj in objs if obj.approved}
+            if post_ids:
+                BlogPost.objects.filter(
+                    pk__in=post_ids).refresh_approved_comment_count()
+        bump_version(Comment)
+        return objs
 
 
 class Comment(models.Model):
@@ -107,14 +369,70 @@ class Comment(models.Model):
     email = models.EmailField()
     comment = models.TextField()
     approved = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # not auto_now_add, see Contact.created_at
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # approved comments of a post, newest first (detail page)
+            models.Index(fields=['post', 'approved', '-created_at'],
+                         name='comment_post_approved_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.name} on {self.post.title}"
 
+    # Remember the values loaded from the database so save() can tell whether
+    # the approved flag (or the post) changed and the counter needs updating.
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_values', {})
+        old_post_id = loaded.get('post_id')
+        old_approved = loaded.get('approved', False)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            post_ids = set()
+            if self.approved or old_approved:
+                if self.approved != old_approved or self.post_id != old_post_id:
+                    post_ids = {self.post_id, old_post_id} - {None}
+            if post_ids:
+                BlogPost.objects.filter(
+                    pk__in=post_ids).refresh_approved_comment_count()
+
+        self._loaded_values = {'post_id': self.post_id,
+                               'approved': self.approved}
+
+
+class RelatedPost(models.Model):
+    """One precomputed "related post" of a blog post: rank 0 is the most
+    similar. Rebuilt by related.py, never edited by hand."""
+    post = models.ForeignKey(
+        BlogPost, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(
+        BlogPost, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()  # cosine similarity, 0..1
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['post', 'rank']
+        constraints = [
+            # also the index for "WHERE post_id = ... ORDER BY rank"
+            models.UniqueConstraint(fields=['post', 'rank'],
+                                    name='relatedpost_post_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id} ({self.score:.2f})"
+
 
 class Service(models.Model):
     title = models.CharField(max_length=200)
@@ -153,20 +471,54 @@ class SocialPost(models.Model):
 
     platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
     content = models.TextField()
-    url = models.URLField()
+    # unique: ingestion (social.py) upserts on it
+    url = models.URLField(unique=True)
     posted_at = models.DateTimeField()
     likes = models.IntegerField(default=0)
     comments = models.IntegerField(default=0)
     shares = models.IntegerField(default=0, blank=True)
     image_url = models.URLField(blank=True)
     fetched_at = models.DateTimeField(auto_now=True)
+    # Hash of the fetched values (HASHED_FIELDS), so a refresh can tell
+    # whether anything changed without comparing every column
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
+    # When the engagement refresh should look at this post again (social.py)
+    next_refresh_at = models.DateTimeField(null=True, blank=True,
+                                           editable=False)
+
+    HASHED_FIELDS = ['platform', 'content', 'posted_at', 'likes', 'comments',
+                     'shares', 'image_url']
 
     class Meta:
         ordering = ['-posted_at']
+        indexes = [
+            # the feed, with and without ?platform=
+            models.Index(fields=['-posted_at', '-id'],
+                         name='socialpost_posted_idx'),
+            models.Index(fields=['platform', '-posted_at'],
+                         name='socialpost_platform_idx'),
+            # posts due for an engagement refresh
+            models.Index(fields=['next_refresh_at'],
+                         name='socialpost_refresh_idx'),
+        ]
 
     def __str__(self):
         return f"{self.platform} post - {self.posted_at.strftime('%Y-%m-%d')}"
 
+    def compute_content_hash(self):
+        values = [getattr(self, field) for field in self.HASHED_FIELDS]
+        # the same instant always hashes the same, whatever its timezone
+        values[2] = values[2].astimezone(dt_timezone.utc).isoformat()
+        raw = json.dumps(values, ensure_ascii=False)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
 
 # A ForeignKey creates a many-to-one relationship between two models.
 # In this case:
@@ -0,0 +1,76 @@
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+# Cursor (keyset) pagination for the growing lists (blog, projects, social).
+#
+# Page/offset pagination gets slower the deeper you go (OFFSET 10000 still
+# reads 10000 rows). A cursor remembers the created_at/posted_at of the last
+# row on the page, so the next page is
+#   WHERE created_at < <cursor> ORDER BY created_at DESC, id DESC LIMIT 21
+# which costs the same on page 1 and on page 500. id is the tie-breaker for
+# rows with the same timestamp (DRF handles ties with a small offset).
+#
+# Response: {"next": <url or null>, "previous": <url or null>, "results": [...]}
+#
+# Old clients that send ?limit=N (the social feed did) still get a plain JSON
+# list of the first N rows, now capped at max_page_size.
+
+
+class LatestFirstCursorPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    limit_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return super().paginate_queryset(queryset, request, view)
+        return list(queryset.order_by(*self.ordering)[:self.limit])
+
+    def get_limit(self, request):
+        if self.limit_query_param not in request.query_params:
+            return None
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError(
+                {self.limit_query_param: 'Must be a positive integer.'})
+        return min(limit, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        if self.limit is not None:
+            return data
+        return {'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'results': data}
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for the async views (async_views.py).
+
+        DRF's own cursor code, run in the thread Django uses for sync ORM
+        calls (the async ORM runs its queries there too). The page comes
+        back as a list, so nothing touches the database on the event loop.
+        request is a DRF Request."""
+        return await sync_to_async(self.paginate_queryset)(
+            queryset, request, view)
+
+
+class SocialPostCursorPagination(LatestFirstCursorPagination):
+    ordering = ('-posted_at', '-id')
+
+
+class SearchPagination(PageNumberPagination):
+    # Search results are ordered by rank, not by a column, so they are cut
+    # into numbered pages (?page=2) from the ranked id list
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
@@ -0,0 +1,115 @@
+import logging
+import random
+import traceback
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Query budgets: the most SQL queries one request to a view may run.
+#
+# Every view in views.py declares its budget:
+#     class BlogPostListView(...):
+#         query_budget = 3
+# The budget is a fixed number, it doesn't grow with the number of rows - so a
+# serializer that runs one query per object (an N+1, like the old
+# BlogPostListSerializer.get_comments_count) goes over it as soon as there
+# are a few rows. The async views in async_views.py use the budget of the
+# view they wrap (their view_class).
+#
+# PerformanceMiddleware (metrics.py) already counts the queries of every
+# request; at the end it calls check_query_budget(). What happens when a
+# request goes over its budget depends on QUERY_BUDGET_MODE:
+#   'raise'   QueryBudgetExceeded, listing every query with its SQL and the
+#             lines of our code it came from (default with DEBUG on; the
+#             tests use it too, so an N+1 fails the test suite)
+#   'log'     the same report logged as an error, the response goes out
+#   'sample'  (default in production) QUERY_BUDGET_SAMPLE_RATE of the
+#             requests record their SQL and stack traces, and those of them
+#             that go over are logged as a warning. Recording a stack trace
+#             per query is slow, so the other requests only count.
+#   'off'     no checks
+#
+# The budget is for a cache miss: responses from the response cache or a 304
+# run fewer queries. Queries on other threads (the /api/home/ sections) and
+# in the body of a streamed export (produced after the middleware returned)
+# are not counted.
+#
+# Settings (all optional):
+# QUERY_BUDGET_MODE = 'raise' with DEBUG on, 'sample' otherwise
+# QUERY_BUDGET_SAMPLE_RATE = 0.01
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 0.01
+MODES = ('raise', 'log', 'sample', 'off')
+# Frames of each query's stack trace shown in the report
+STACK_FRAMES = 8
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget_mode():
+    mode = getattr(settings, 'QUERY_BUDGET_MODE', None)
+    if mode is None:
+        mode = 'raise' if settings.DEBUG else 'sample'
+    if mode not in MODES:
+        raise ImproperlyConfigured(
+            f"QUERY_BUDGET_MODE must be one of {MODES}, not {mode!r}")
+    return mode
+
+
+def record_queries():
+    """Should this request keep the SQL and stack of its queries?
+    (decided when the request starts)"""
+    mode = query_budget_mode()
+    if mode == 'sample':
+        return random.random() < getattr(settings, 'QUERY_BUDGET_SAMPLE_RATE',
+                                         DEFAULT_SAMPLE_RATE)
+    return mode != 'off'
+
+
+def query_stack():
+    """Where a query came from: the innermost frames of our own code"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [frame for frame in traceback.extract_stack()[:-1]
+              if frame.filename.startswith(base_dir)
+              and 'site-packages' not in frame.filename
+              and not frame.filename.endswith('metrics.py')]
+    return ''.join(traceback.format_list(frames[-STACK_FRAMES:]))
+
+
+def view_budget(request):
+    """The query_budget of the view that handled the request, or None"""
+    match = getattr(request, 'resolver_match', None)
+    view = getattr(match.func, 'view_class', None) if match else None
+    if view is None:
+        return None
+    budget = getattr(view, 'query_budget', None)
+    if budget is None and isinstance(getattr(view, 'view_class', None), type):
+        budget = getattr(view.view_class, 'query_budget', None)  # async views
+    return budget
+
+
+def report(request, queries, budget, recorded):
+    lines = [f'{request.method} {request.path} ran {queries} queries, '
+             f'its budget is {budget}:']
+    for number, (sql, params, stack) in enumerate(recorded, 1):
+        lines.append(f'{number}. {sql} {params or ""}'.rstrip())
+        lines.append(stack.rstrip())
+    return '\n'.join(lines)
+
+
+def check_query_budget(request, queries, recorded):
+    """Raise or log when the request ran more queries than its view's budget.
+    recorded: [(sql, params, stack)] or None when the SQL wasn't recorded."""
+    budget = view_budget(request)
+    if budget is None or queries <= budget or recorded is None:
+        return
+    mode = query_budget_mode()
+    if mode == 'raise':
+        raise QueryBudgetExceeded(report(request, queries, budget, recorded))
+    if mode == 'log':
+        logger.error(report(request, queries, budget, recorded))
+    elif mode == 'sample':
+        logger.warning(report(request, queries, budget, recorded))
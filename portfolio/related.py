@@ -0,0 +1,267 @@
+import heapq
+import logging
+import math
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from .models import BlogPost, RelatedPost
+
+try:
+    import numpy
+except ImportError:  # optional, the pure-Python path below is used instead
+    numpy = None
+
+# "Related posts" for the blog detail page, precomputed.
+#
+# Every published post becomes a TF-IDF vector over:
+#   - the words of its title and content (common English words dropped),
+#   - word shingles: pairs of neighbouring words ("rest framework"),
+#   - its tags and category, counted several times so they weigh more.
+# Two posts are similar when their vectors point the same way (cosine
+# similarity, 0..1). The RELATED_POSTS_COUNT most similar posts of every post
+# are stored in RelatedPost, so the detail endpoint reads them with one query.
+#
+# Full rebuild (`manage.py build_related_posts`): every post against every
+# other. With NumPy installed this is one matrix product; without it an
+# inverted index (term -> posts) adds up the same scores in pure Python.
+#
+# Incremental update: after a post is saved or deleted, update_related_posts()
+# recomputes only the rows that can change - the post itself, the posts that
+# list it, and the posts it is now more similar to than their weakest stored
+# neighbour. The vectors of the other posts are rebuilt in memory for the
+# scores but their rows are left alone, so their stored scores can drift a
+# little as the vocabulary changes; the nightly rebuild evens that out.
+#
+# Settings (all optional):
+# RELATED_POSTS_COUNT = 4
+# RELATED_POSTS_ASYNC = True  (False: update inline, used by the tests)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNT = 4
+TAG_WEIGHT = 3
+CATEGORY_WEIGHT = 2
+WORD = re.compile(r"[a-z0-9][a-z0-9+#']*")
+STOP_WORDS = frozenset("""
+    about after again all also and any are because been before being both but
+    can could did does doing down during each few for from further had has
+    have having her here hers herself him himself his how into its itself
+    just more most not now off once only other our ours out over own same
+    she should some such than that the their theirs them then there these
+    they this those through too under until very was were what when where
+    which while who whom why will with would you your yours yourself
+""".split())
+
+# What the detail endpoint shows of each related post
+RELATED_FIELDS = ['id', 'title', 'slug', 'excerpt', 'category',
+                  'reading_time', 'created_at']
+
+_executor = None
+
+
+def related_count():
+    return getattr(settings, 'RELATED_POSTS_COUNT', DEFAULT_COUNT)
+
+
+def post_terms(title, category, tags, content):
+    """Counter of the terms of one post"""
+    words = [word for word in WORD.findall(f'{title}\n{content}'.lower())
+             if len(word) > 2 and word not in STOP_WORDS]
+    terms = Counter(words)
+    terms.update(f'{a} {b}' for a, b in zip(words, words[1:]))
+    for tag in filter(None, (tag.strip().lower() for tag in tags.split(','))):
+        terms[f'tag:{tag}'] += TAG_WEIGHT
+    if category:
+        terms[f'category:{category.strip().lower()}'] += CATEGORY_WEIGHT
+    return terms
+
+
+def build_vectors(posts):
+    """[(pk, title, category, tags, content)] -> (pks, vectors); a vector is
+    {term: weight} with length 1"""
+    pks, counts = [], []
+    for pk, *fields in posts:
+        pks.append(pk)
+        counts.append(post_terms(*fields))
+
+    document_frequency = Counter()
+    for terms in counts:
+        document_frequency.update(terms.keys())
+    # Smoothed IDF: terms in every post still count a little
+    idf = {term: math.log((1 + len(counts)) / (1 + df)) + 1
+           for term, df in document_frequency.items()}
+
+    vectors = []
+    for terms in counts:
+        # 1 + log(tf): the 10th "django" adds less than the 2nd
+        vector = {term: (1 + math.log(tf)) * idf[term]
+                  for term, tf in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        vectors.append({term: weight / norm for term, weight in vector.items()}
+                       if norm else {})
+    return pks, vectors
+
+
+def _top(scores, count):
+    # [(index, score)] of the best scores above 0
+    return heapq.nlargest(count, ((index, score) for index, score
+                                  in scores.items() if score > 0),
+                          key=lambda item: (item[1], -item[0]))
+
+
+def neighbours_python(vectors, rows, count):
+    """{row: [(index, score), ...]} for the given row indexes"""
+    postings = {}
+    for index, vector in enumerate(vectors):
+        for term, weight in vector.items():
+            postings.setdefault(term, []).append((index, weight))
+
+    result = {}
+    for row in rows:
+        scores = {}
+        for term, weight in vectors[row].items():
+            for index, other in postings[term]:
+                scores[index] = scores.get(index, 0.0) + weight * other
+        scores.pop(row, None)
+        result[row] = _top(scores, count)
+    return result
+
+
+def neighbours_numpy(vectors, rows, count):
+    """Same as neighbours_python(), as a matrix product"""
+    # Terms of a single post can't make two posts similar, so only terms
+    # shared by 2+ posts become columns (the vectors are already normalized)
+    frequency = Counter(term for vector in vectors for term in vector)
+    columns = {term: column for column, term in enumerate(
+        term for term, df in frequency.items() if df > 1)}
+    matrix = numpy.zeros((len(vectors), max(len(columns), 1)),
+                         dtype=numpy.float32)
+    for index, vector in enumerate(vectors):
+        for term, weight in vector.items():
+            if term in columns:
+                matrix[index, columns[term]] = weight
+
+    rows = list(rows)
+    scores = matrix[rows] @ matrix.T  # len(rows) x len(vectors)
+    scores[numpy.arange(len(rows)), rows] = 0  # not related to itself
+    result = {}
+    for position, row in enumerate(rows):
+        row_scores = scores[position]
+        best = numpy.argsort(-row_scores, kind='stable')[:count]
+        result[row] = [(int(index), float(row_scores[index]))
+                       for index in best if row_scores[index] > 0]
+    return result
+
+
+def neighbours(vectors, rows, count):
+    if numpy is not None:
+        return neighbours_numpy(vectors, rows, count)
+    return neighbours_python(vectors, rows, count)
+
+
+def related_posts_query(post_ids):
+    """The published related posts of these posts, best first, as rows of
+    (post pk, *RELATED_FIELDS) - turn them into pairs with related_post_pair"""
+    return (RelatedPost.objects
+            .filter(post_id__in=post_ids, related__published=True)
+            .order_by('post_id', 'rank')
+            .values_list('post_id', *[f'related__{field}'
+                                      for field in RELATED_FIELDS]))
+
+
+def related_post_pair(row):
+    post_id, *values = row
+    return post_id, dict(zip(RELATED_FIELDS, values))
+
+
+def related_posts_of(post_ids):
+    """[(post pk, {RELATED_FIELDS})] - one query"""
+    return [related_post_pair(row) for row in related_posts_query(post_ids)]
+
+
+def published_posts():
+    return list(BlogPost.objects.filter(published=True).order_by('pk')
+                .values_list('pk', 'title', 'category', 'tags', 'content'))
+
+
+def _replace_rows(pks, found):
+    # found: {row index: [(index, score)]} -> RelatedPost rows of those posts
+    objs = [RelatedPost(post_id=pks[row], related_id=pks[index],
+                        score=round(score, 6), rank=rank)
+            for row, best in found.items()
+            for rank, (index, score) in enumerate(best)]
+    with transaction.atomic():
+        RelatedPost.objects.filter(
+            post_id__in=[pks[row] for row in found]).delete()
+        RelatedPost.objects.bulk_create(objs)
+
+
+def rebuild_related_posts():
+    """Recompute every published post. Returns the number of posts."""
+    pks, vectors = build_vectors(published_posts())
+    found = neighbours(vectors, range(len(pks)), related_count())
+    with transaction.atomic():
+        RelatedPost.objects.exclude(post_id__in=pks).delete()
+        _replace_rows(pks, found)
+    return len(pks)
+
+
+def update_related_posts(pk):
+    """Recompute the rows affected by post pk being saved or deleted"""
+    count = related_count()
+    pks, vectors = build_vectors(published_posts())
+    stored = {}  # post pk -> [(related pk, score)]
+    for post_id, related_id, score in RelatedPost.objects.values_list(
+            'post_id', 'related_id', 'score'):
+        stored.setdefault(post_id, []).append((related_id, score))
+
+    affected = {post_id for post_id, best in stored.items()
+                if pk in dict(best) or len(best) < count}
+    if pk in pks:
+        # Rows it now beats: its score against them (cosine is symmetric)
+        # is higher than their weakest stored neighbour
+        row = pks.index(pk)
+        affected.add(pk)
+        for index, score in neighbours(vectors, [row], len(pks))[row]:
+            best = stored.get(pks[index], [])
+            if len(best) < count or score > min(s for _, s in best):
+                affected.add(pks[index])
+    else:
+        RelatedPost.objects.filter(post_id=pk).delete()  # unpublished
+
+    position = {post_pk: index for index, post_pk in enumerate(pks)}
+    rows = [position[post_pk] for post_pk in affected if post_pk in position]
+    if rows:
+        _replace_rows(pks, neighbours(vectors, rows, count))
+    return len(rows)
+
+
+def update_in_thread(pk):
+    try:
+        update_related_posts(pk)
+    except Exception:
+        logger.exception("Updating the related posts of post %s failed", pk)
+    finally:
+        connection.close()  # each pool thread has its own DB connection
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # One worker: updates run one after another and never race
+        _executor = ThreadPoolExecutor(max_workers=1,
+                                       thread_name_prefix='related-posts')
+    return _executor
+
+
+def schedule_related_update(pk):
+    """Update the related posts after the current transaction commits"""
+    def submit():
+        if getattr(settings, 'RELATED_POSTS_ASYNC', True):
+            _get_executor().submit(update_in_thread, pk)
+        else:
+            update_related_posts(pk)
+
+    transaction.on_commit(submit)
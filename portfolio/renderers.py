@@ -0,0 +1,91 @@
+import json
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+# Faster JSON rendering.
+#
+# DRF's JSONRenderer runs json.dumps() (pure Python object walking plus a
+# str -> bytes encode at the end). orjson does the same in C and writes bytes
+# directly, typically 5-10x faster on big lists. orjson is pinned in
+# requirements.txt; where it isn't installed everything falls back to the
+# stdlib json module.
+#
+# The output is the same as DRF's: compact separators, UTF-8, and datetimes,
+# decimals, UUIDs, lazy strings etc. encoded by DRF's own JSONEncoder
+# (orjson hands those to it through `default`).
+#
+# Enabled in settings.py:
+# REST_FRAMEWORK = {'DEFAULT_RENDERER_CLASSES': [
+#     'portfolio.renderers.FastJSONRenderer', ...]}
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used instead
+    orjson = None
+
+_encoder = JSONEncoder()
+# U+2028/U+2029 are valid JSON but break JavaScript, DRF escapes them too
+_LINE_SEPARATORS = (('\u2028'.encode(), b'\\u2028'),
+                    ('\u2029'.encode(), b'\\u2029'))
+
+
+def dumps(data):
+    """Encode data to JSON bytes, the same way DRF's JSONRenderer would."""
+    if orjson is not None:
+        # PASSTHROUGH_DATETIME: let DRF format datetimes (ms precision, "Z")
+        ret = orjson.dumps(data, default=_encoder.default,
+                           option=orjson.OPT_PASSTHROUGH_DATETIME
+                           | orjson.OPT_NON_STR_KEYS)
+    else:
+        ret = json.dumps(data, cls=JSONEncoder, ensure_ascii=False,
+                         allow_nan=not api_settings.STRICT_JSON,
+                         separators=(',', ':')).encode()
+    for character, escaped in _LINE_SEPARATORS:
+        if character in ret:
+            ret = ret.replace(character, escaped)
+    return ret
+
+
+def _array_piece(chunk, first):
+    # One dumps() per chunk; strip its brackets and join the pieces with ","
+    encoded = dumps(chunk)[1:-1]
+    return encoded if first else b',' + encoded
+
+
+def stream_json_array(chunks):
+    """Yield a JSON array piece by piece from an iterable of lists of items,
+    so the full list never has to be in memory (see StreamingExportMixin)."""
+    yield b'['
+    first = True
+    for chunk in chunks:
+        if chunk:
+            yield _array_piece(chunk, first)
+            first = False
+    yield b']'
+
+
+async def astream_json_array(chunks):
+    """stream_json_array() for an async iterable (async_views.py)"""
+    yield b'['
+    first = True
+    async for chunk in chunks:
+        if chunk:
+            yield _array_piece(chunk, first)
+            first = False
+    yield b']'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that uses orjson when it is installed."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        # Indented output (?format=json with indent=4 in Accept) is rare,
+        # leave it to the stdlib renderer
+        if orjson is None or self.get_indent(accepted_media_type,
+                                             renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
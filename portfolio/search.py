@@ -0,0 +1,89 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q
+from .models import BlogPost
+
+# Full-text search over blog posts.
+#
+# The search index is computed when a post is saved (post_save receiver in
+# signals.py), so a search never has to scan post content:
+#   - PostgreSQL: BlogPost.search_vector (tsvector) with a GIN index
+#   - SQLite:     the portfolio_blogpost_fts FTS5 virtual table, rowid = post id
+# Both are created by migration 0005_blogpost_search.
+#
+# Title matches count most, then excerpt/tags, then content.
+
+FTS_TABLE = 'portfolio_blogpost_fts'
+# Upper bound on ranked ids fetched for one query (pages are cut from these)
+MAX_RESULTS = 500
+
+
+def search_vector():
+    return (SearchVector('title', weight='A')
+            + SearchVector('excerpt', weight='B')
+            + SearchVector('tags', weight='B')
+            + SearchVector('content', weight='C'))
+
+
+def update_search_index(post):
+    if connection.vendor == 'postgresql':
+        BlogPost.objects.filter(pk=post.pk).update(
+            search_vector=search_vector())
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, excerpt, tags, content)'
+                f' VALUES (%s, %s, %s, %s, %s)',
+                [post.pk, post.title, post.excerpt, post.tags, post.content])
+
+
+def remove_from_search_index(post_pk):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_pk])
+
+
+def _fts5_query(text):
+    # Quote every word so user input can't use (or break) FTS5 query syntax;
+    # quoted words separated by spaces must all match (AND)
+    words = text.split()
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def search_post_ids(text):
+    """Ids of published posts matching text, best match first."""
+    text = text.strip()
+    if not text:
+        return []
+
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(text, search_type='websearch')
+        return list(
+            BlogPost.objects
+            .filter(published=True, search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', '-created_at')
+            .values_list('pk', flat=True)[:MAX_RESULTS])
+
+    if connection.vendor == 'sqlite':
+        # bm25() is lower for better matches; the weights follow the column
+        # order title, excerpt, tags, content
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post.id FROM {FTS_TABLE} '
+                f'JOIN portfolio_blogpost post ON post.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s AND post.published '
+                f'ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 4.0, 1.0), '
+                f'post.created_at DESC LIMIT %s',
+                [_fts5_query(text), MAX_RESULTS])
+            return [row[0] for row in cursor.fetchall()]
+
+    # Other databases: no index, fall back to a plain substring search
+    return list(
+        BlogPost.objects
+        .filter(Q(title__icontains=text) | Q(excerpt__icontains=text),
+                published=True)
+        .values_list('pk', flat=True)[:MAX_RESULTS])
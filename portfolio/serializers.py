@@ -1,12 +1,25 @@
 from rest_framework import serializers
+from .images import srcset
+from .related import related_posts_of
+from .throttling import is_duplicate
 from .models import (Project, Skill, Contact, Comment,
-                     BlogPost, Service, SocialPost)
+                     BlogPost, Service, SocialPost, Tag)
 
 
 class ProjectSerializer(serializers.ModelSerializer):
+    # ["Django", "React"] from the normalized Technology rows. Views should
+    # prefetch_related('technology_list') so this adds no query per project.
+    technology_list = serializers.SlugRelatedField(
+        many=True, read_only=True, slug_field='name')
+    # {"webp": {"480": url, "960": url}, "jpeg": {...}} for <img srcset>
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Project
-        fields = '__all__'
+        exclude = ['image_variants']  # exposed as image_srcset instead
+
+    def get_image_srcset(self, obj):
+        return srcset(obj.image_variants, self.context.get('request'))
 
 
 class SkillSerializer(serializers.ModelSerializer):
@@ -20,6 +33,14 @@ class ContactSerializer(serializers.ModelSerializer):
         model = Contact
         fields = '__all__'
 
+    def validate(self, attrs):
+        # Same message sent again within DUPLICATE_POST_WINDOW (throttling.py)
+        if is_duplicate('contact', attrs['message']):
+            raise serializers.ValidationError(
+                {'message': 'This message has already been sent.'})
+        self.posted = ('contact', attrs['message'])  # for forget_post()
+        return attrs
+
 
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -27,53 +48,87 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ['id', 'post', 'name', 'email', 'comment', 'created_at']
         read_only_fields = ['created_at']
 
+    def validate(self, attrs):
+        # Same comment on the same post within DUPLICATE_POST_WINDOW
+        scope = f"comment_{attrs['post'].pk}"
+        if is_duplicate(scope, attrs['comment']):
+            raise serializers.ValidationError(
+                {'comment': 'This comment has already been posted.'})
+        self.posted = (scope, attrs['comment'])  # for forget_post()
+        return attrs
+
+
+class CommentModerationSerializer(serializers.Serializer):
+    """Body of POST /api/comments/moderate/"""
+    action = serializers.ChoiceField(choices=['approve', 'reject'])
+    ids = serializers.ListField(child=serializers.IntegerField(),
+                                allow_empty=False)
+
 
 class BlogPostListSerializer(serializers.ModelSerializer):
     """Serializer for blog list (without full content)"""
 # comments_count is not a real field in the BlogPost model.
 # We want to show how many approved comments each post has.
-# SerializerMethodField() tells DRF: "I'll calculate this value myself using a method".
-# Django rest framework will automatically look for a method called get_comments_count
-    comments_count = serializers.SerializerMethodField()
+# BlogPost keeps that number in the approved_comment_count column (updated
+# whenever a comment is saved, approved or deleted), so the serializer just
+# reads the column - no extra COUNT query per post.
+    comments_count = serializers.IntegerField(
+        source='approved_comment_count', read_only=True)
+    # prefetch_related('tag_list') in the view keeps this to one query
+    tag_list = serializers.SlugRelatedField(
+        many=True, read_only=True, slug_field='name')
+    featured_image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = BlogPost
         fields = [
             'id', 'title', 'slug', 'author', 'excerpt', 'featured_image',
-            'category', 'tags', 'views', 'reading_time', 'created_at',
-            'updated_at', 'featured', 'comments_count'
+            'featured_image_srcset', 'featured_image_width',
+            'featured_image_height', 'featured_image_color',
+            'featured_image_placeholder', 'category', 'tags', 'tag_list',
+            'views', 'reading_time', 'created_at', 'updated_at', 'featured',
+            'comments_count'
         ]  # notice - no 'comments' field as expnd above
 
-    # This method runs automatically for every blog post when the serializer is used.
-# obj → the current BlogPost object being serialized (e.g. one post from the queryset)
-# obj.comments → uses the reverse relationship from your Comment model
-# (because you have post = models.ForeignKey(BlogPost, related_name='comments', ...)
-# .filter(approved=True) → only count comments that are approved (nice safety!)
-# .count() → returns the number (e.g. 5)
-
-# So if a post has 7 approved comments → comments_count: 7 appears in the JSON.
-
-    def get_comments_count(self, obj):
-        return obj.comments.filter(approved=True).count()
+    def get_featured_image_srcset(self, obj):
+        return srcset(obj.featured_image_variants,
+                      self.context.get('request'))
 
 
 class BlogPostDetailSerializer(serializers.ModelSerializer):
     """Serializer for single blog post (with full content)"""
     comments = serializers.SerializerMethodField()
     # not a field in BlogPost model - django rest framework will look for get_comments method
+    tag_list = serializers.SlugRelatedField(
+        many=True, read_only=True, slug_field='name')
+    featured_image_srcset = serializers.SerializerMethodField()
+    # precomputed neighbours (related.py), read with one query
+    related_posts = serializers.SerializerMethodField()
 
     class Meta:
         model = BlogPost
         fields = [
             'id', 'title', 'slug', 'author', 'excerpt', 'content',
-            'featured_image', 'category', 'tags', 'views', 'reading_time',
-            'created_at', 'updated_at', 'comments'
+            # pre-rendered on save (content.py), ready to insert as-is
+            'content_html', 'toc', 'word_count',
+            'featured_image', 'featured_image_srcset', 'featured_image_width',
+            'featured_image_height', 'featured_image_color',
+            'featured_image_placeholder', 'category', 'tags', 'tag_list',
+            'views', 'reading_time', 'created_at', 'updated_at', 'comments',
+            'related_posts'
         ]
 
+    def get_featured_image_srcset(self, obj):
+        return srcset(obj.featured_image_variants,
+                      self.context.get('request'))
+
     def get_comments(self, obj):
         approved_comments = obj.comments.filter(approved=True)
         return CommentSerializer(approved_comments, many=True).data
 
+    def get_related_posts(self, obj):
+        return [post for _, post in related_posts_of([obj.pk])]
+
 
 class ServiceSerializer(serializers.ModelSerializer):
     features_list = serializers.SerializerMethodField()
@@ -116,3 +171,12 @@ class SocialPostSerializer(serializers.ModelSerializer):
             'image_url',
             'fetched_at'
         ]
+
+
+class TagCountSerializer(serializers.ModelSerializer):
+    # count is annotated by TagListView (published posts with this tag)
+    count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ['name', 'slug', 'count']
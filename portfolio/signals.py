@@ -0,0 +1,72 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import bump_version
+from .images import schedule_variants
+from .related import schedule_related_update
+from .search import remove_from_search_index, update_search_index
+from .models import (Project, Skill, BlogPost, Comment,
+                     Service, SocialPost, Tag)
+
+# Signal receivers are connected in PortfolioConfig.ready() (see apps.py)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    # Fires for comment.delete(), queryset .delete() and CASCADE deletes.
+    # When the whole post is being deleted there is no counter left to fix.
+    if isinstance(origin, BlogPost) or getattr(origin, 'model', None) is BlogPost:
+        return
+    if instance.approved:
+        BlogPost.objects.filter(
+            pk=instance.post_id).refresh_approved_comment_count()
+
+
+# Any admin edit of these models invalidates the cached API responses that
+# were built from them (see cache.py)
+CACHED_MODELS = [Project, Skill, Service, BlogPost, Comment, SocialPost,
+                 Tag]
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, **kwargs):
+    if sender in CACHED_MODELS:
+        bump_version(sender)
+
+
+# Keep the full-text search index (search.py) in step with the posts
+@receiver(post_save, sender=BlogPost)
+def blog_post_saved(sender, instance, **kwargs):
+    # Raw saves (loaddata) too: the instance holds every field, and fixtures
+    # load after the migrations, so nothing else would index those posts
+    update_search_index(instance)
+
+
+@receiver(post_delete, sender=BlogPost)
+def blog_post_deleted(sender, instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+# Resized copies of newly uploaded images (built after commit, see images.py)
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'image')
+
+
+@receiver(post_save, sender=BlogPost)
+def blog_post_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'featured_image')
+
+
+# Related posts of the posts this one is (or was) similar to (see related.py)
+@receiver(post_save, sender=BlogPost)
+def blog_post_related_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_related_update(instance.pk)
+
+
+@receiver(post_delete, sender=BlogPost)
+def blog_post_related_deleted(sender, instance, **kwargs):
+    schedule_related_update(instance.pk)
@@ -0,0 +1,206 @@
+import json
+import logging
+import math
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+from .cache import bump_version
+from .models import SocialPost
+
+# Social media ingestion (used by `manage.py ingest_social`).
+#
+# A "fetcher" pulls the latest posts of one platform and returns them as
+# dicts of SocialPost field values. Fetchers are configured per platform,
+# like CACHES:
+#
+# SOCIAL_FETCHERS = {
+#     'github': {'BACKEND': 'myproject.fetchers.GitHubFetcher',
+#                'OPTIONS': {'user': 'someone'}},
+#     'dev': {'BACKEND': 'portfolio.social.FileFetcher',
+#             'OPTIONS': {'path': '/data/social'}},
+# }
+#
+# The posts are written with one INSERT ... ON CONFLICT (url) DO UPDATE per
+# batch, so new posts are added and the likes/comments/shares of known ones
+# refreshed in the same statement. Posts whose values haven't changed (same
+# SocialPost.content_hash) are left out of the write completely.
+#
+# Engagement refresh (`ingest_social --refresh`): instead of re-fetching
+# everything, only posts whose next_refresh_at has passed are asked for,
+# newest first. The refresh interval doubles each time a post's age doubles:
+#   1h old -> every 5 minutes, 1 day -> ~1.5 hours, 1 week -> ~11 hours,
+#   older -> up to once every 7 days
+# so the work follows the posts that still get likes, not the table size.
+
+logger = logging.getLogger(__name__)
+
+# Fields a fetcher provides (url identifies the post)
+POST_FIELDS = SocialPost.HASHED_FIELDS
+DEFAULT_BATCH_SIZE = 500
+MIN_REFRESH_INTERVAL = timedelta(minutes=5)
+MAX_REFRESH_INTERVAL = timedelta(days=7)
+
+
+class Fetcher:
+    """Base class: return the latest posts of one platform from fetch()."""
+
+    def __init__(self, platform, **options):
+        self.platform = platform
+        self.options = options
+
+    def fetch(self):
+        """Iterable of dicts with url plus (some of) POST_FIELDS"""
+        raise NotImplementedError
+
+    def refresh(self, urls):
+        """Current values of these posts (same dicts as fetch()). Override
+        when the API can look posts up directly."""
+        urls = set(urls)
+        return [post for post in self.fetch() if post['url'] in urls]
+
+
+class FileFetcher(Fetcher):
+    """Reads <path>/<platform>.json, a JSON list of posts. Used by the tests
+    and handy for loading an export by hand."""
+
+    def fetch(self):
+        filename = os.path.join(self.options['path'], f'{self.platform}.json')
+        if not os.path.exists(filename):
+            return []
+        with open(filename, encoding='utf-8') as f:
+            return json.load(f)
+
+
+def get_fetchers(platforms=None, source_dir=None):
+    """{platform: fetcher} from SOCIAL_FETCHERS, or FileFetchers reading
+    source_dir for every platform when it is given."""
+    if source_dir:
+        config = {platform: {'BACKEND': 'portfolio.social.FileFetcher',
+                             'OPTIONS': {'path': source_dir}}
+                  for platform, _ in SocialPost.PLATFORM_CHOICES}
+    else:
+        config = getattr(settings, 'SOCIAL_FETCHERS', {})
+
+    fetchers = {}
+    for platform in platforms or config:
+        if platform not in config:
+            raise ImproperlyConfigured(
+                f"No fetcher configured for '{platform}' in SOCIAL_FETCHERS")
+        backend = import_string(config[platform]['BACKEND'])
+        fetchers[platform] = backend(platform,
+                                     **config[platform].get('OPTIONS', {}))
+    return fetchers
+
+
+def next_refresh(posted_at, now):
+    """When to refresh a post again: the interval doubles with its age"""
+    age_hours = max((now - posted_at).total_seconds() / 3600, 1)
+    interval = MIN_REFRESH_INTERVAL * 2 ** int(math.log2(age_hours))
+    return now + min(interval, MAX_REFRESH_INTERVAL)
+
+
+def clean_post(platform, raw):
+    """Fetched dict -> SocialPost field values (url, POST_FIELDS and the
+    content_hash of those)"""
+    posted_at = raw['posted_at']
+    if isinstance(posted_at, str):
+        posted_at = parse_datetime(posted_at)
+    if timezone.is_naive(posted_at):
+        posted_at = timezone.make_aware(posted_at)
+    post = {
+        'url': raw['url'],
+        'platform': platform,
+        'content': raw.get('content', ''),
+        'posted_at': posted_at,
+        'likes': int(raw.get('likes') or 0),
+        'comments': int(raw.get('comments') or 0),
+        'shares': int(raw.get('shares') or 0),
+        'image_url': raw.get('image_url') or '',
+    }
+    post['content_hash'] = SocialPost(**post).compute_content_hash()
+    return post
+
+
+def dedupe(posts):
+    # The same url can show up twice (e.g. a post fetched by two pages);
+    # the last one fetched wins
+    return list({post['url']: post for post in posts}.values())
+
+
+def changed_posts(posts):
+    """(new posts, posts whose content_hash differs from the stored row)"""
+    stored = {}
+    urls = [post['url'] for post in posts]
+    for start in range(0, len(urls), DEFAULT_BATCH_SIZE):
+        stored.update(SocialPost.objects.filter(
+            url__in=urls[start:start + DEFAULT_BATCH_SIZE]).values_list(
+            'url', 'content_hash'))
+
+    new, changed = [], []
+    for post in posts:
+        if post['url'] not in stored:
+            new.append(post)
+        elif stored[post['url']] != post['content_hash']:
+            changed.append(post)
+    return new, changed
+
+
+def upsert_posts(posts, now, batch_size=DEFAULT_BATCH_SIZE):
+    """INSERT ... ON CONFLICT (url) DO UPDATE, one statement per batch"""
+    for start in range(0, len(posts), batch_size):
+        SocialPost.objects.bulk_create(
+            [SocialPost(**post,
+                        next_refresh_at=next_refresh(post['posted_at'], now))
+             for post in posts[start:start + batch_size]],
+            update_conflicts=True,
+            unique_fields=['url'],
+            # fetched_at is auto_now: refreshed on the rows that changed
+            update_fields=POST_FIELDS + ['content_hash', 'next_refresh_at',
+                                         'fetched_at'],
+        )
+    if posts:
+        bump_version(SocialPost)  # bulk_create sends no post_save signals
+
+
+def due_posts(platforms, now, limit):
+    """Posts whose refresh time has come, newest first"""
+    return list(
+        SocialPost.objects
+        .filter(Q(next_refresh_at__isnull=True) | Q(next_refresh_at__lte=now),
+                platform__in=platforms)
+        .order_by('-posted_at')
+        .only('pk', 'url', 'platform', 'posted_at', 'content_hash')[:limit])
+
+
+def apply_refresh(due, fetched, now, batch_size=DEFAULT_BATCH_SIZE):
+    """Write the refreshed values of the posts that changed and reschedule
+    all of them. fetched is {url: clean_post()}. Returns (changed, unchanged).
+
+    Both writes are bulk_update()s, i.e. one UPDATE ... CASE WHEN per batch;
+    fetched_at only moves on the rows that really changed."""
+    changed, unchanged = [], []
+    for post in due:
+        post.next_refresh_at = next_refresh(post.posted_at, now)
+        values = fetched.get(post.url)
+        # A post the platform didn't return (deleted?) is just rescheduled
+        if values is None or values['content_hash'] == post.content_hash:
+            unchanged.append(post)
+            continue
+        for field in POST_FIELDS + ['content_hash']:
+            setattr(post, field, values[field])
+        post.fetched_at = now
+        changed.append(post)
+
+    SocialPost.objects.bulk_update(
+        changed, POST_FIELDS + ['content_hash', 'fetched_at',
+                                'next_refresh_at'], batch_size=batch_size)
+    SocialPost.objects.bulk_update(unchanged, ['next_refresh_at'],
+                                   batch_size=batch_size)
+    if changed:
+        bump_version(SocialPost)
+    return changed, unchanged
@@ -1,3 +1,1986 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from . import renderers
+from .cache import get_versions
+from .content import render_content
+from .database import (
+    set_statement_timeout, use_statement_timeout, warm_up_database)
+from .images import available_formats, build_variants
+from .metrics import registry
+from .fast_serializers import FastListSerializer, SocialPostFastSerializer
+from .query_budget import QueryBudgetExceeded
+from .related import rebuild_related_posts
+from .social import next_refresh
+from .models import (BlogPost, Comment, Contact, Project, RelatedPost, Service, Skill, SocialPost,
+                     Tag, Technology, split_names)
+from .serializers import BlogPostDetailSerializer, ProjectSerializer
+from .throttling import TokenBucketThrottle
+from .urls import urlpatterns
+from .async_urls import urlpatterns as async_urlpatterns
+from .views import BlogPostListView, SkillListView
+from .view_counter import view_counts
+from .write_queue import WriteBehindQueue, retry_delay
 
 # Create your tests here.
+
+
+def make_post(index, **kwargs):
+    defaults = {
+        'title': f'Post {index}',
+        'excerpt': 'Excerpt',
+        'content': 'Content',
+        'category': 'Django',
+        'tags': 'python,django',
+        'published': True,
+    }
+    defaults.update(kwargs)
+    return BlogPost.objects.create(**defaults)
+
+
+def make_comment(post, approved=True, **kwargs):
+    defaults = {
+        'post': post,
+        'name': 'Reader',
+        'email': 'reader@example.com',
+        'comment': 'Nice post',
+        'approved': approved,
+    }
+    defaults.update(kwargs)
+    return Comment.objects.create(**defaults)
+
+
+# Related posts are updated inline, not on a background thread, and a request
+# over its view's query budget fails the test (query_budget.py)
+@override_settings(RELATED_POSTS_ASYNC=False, QUERY_BUDGET_MODE='raise')
+class PortfolioTestCase(TestCase):
+    # The response cache lives outside the test database, so start every
+    # test with an empty one
+    def setUp(self):
+        cache.clear()
+
+
+class BlogPostListQueryTests(PortfolioTestCase):
+    url = reverse('blog-list')
+
+    def seed(self, count):
+        start = BlogPost.objects.count()
+        for i in range(start, start + count):
+            post = make_post(i)
+            make_comment(post, approved=True)
+            make_comment(post, approved=True)
+            make_comment(post, approved=False)
+
+    def test_comments_count_only_counts_approved(self):
+        self.seed(1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['comments_count'], 2)
+
+    def test_post_without_comments_has_zero_count(self):
+        make_post(1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['results'][0]['comments_count'], 0)
+
+    def test_category_filter_is_case_insensitive(self):
+        make_post(1, category='Django')
+        make_post(2, category='Python')
+        response = self.client.get(self.url, {'category': 'dJANGO'})
+        titles = [post['title'] for post in response.json()['results']]
+        self.assertEqual(titles, ['Post 1'])
+
+    def test_query_count_does_not_grow_with_posts(self):
+        # ETag aggregate + 1 query for the whole list + 1 prefetch for the
+        # tags, however many posts
+        self.seed(2)
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'page_size': 100})
+
+        self.seed(20)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'page_size': 100})
+        self.assertEqual(len(response.json()['results']), 22)
+
+
+class ApprovedCommentCountTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post = make_post(1)
+
+    def count(self, post=None):
+        post = post or self.post
+        post.refresh_from_db(fields=['approved_comment_count'])
+        return post.approved_comment_count
+
+    def test_create_approved_and_unapproved(self):
+        make_comment(self.post, approved=True)
+        make_comment(self.post, approved=False)
+        self.assertEqual(self.count(), 1)
+
+    def test_toggle_approved_on_save(self):
+        comment = make_comment(self.post, approved=False)
+        comment = Comment.objects.get(pk=comment.pk)
+        comment.approved = True
+        comment.save()
+        self.assertEqual(self.count(), 1)
+        comment.approved = False
+        comment.save()
+        self.assertEqual(self.count(), 0)
+
+    def test_move_comment_to_other_post(self):
+        other = make_post(2)
+        comment = make_comment(self.post, approved=True)
+        comment.post = other
+        comment.save()
+        self.assertEqual(self.count(), 0)
+        self.assertEqual(self.count(other), 1)
+
+    def test_delete_instance_and_queryset(self):
+        first = make_comment(self.post, approved=True)
+        make_comment(self.post, approved=True)
+        first.delete()
+        self.assertEqual(self.count(), 1)
+        Comment.objects.all().delete()
+        self.assertEqual(self.count(), 0)
+
+    def test_queryset_update(self):
+        make_comment(self.post, approved=False)
+        make_comment(self.post, approved=False)
+        Comment.objects.update(approved=True)
+        self.assertEqual(self.count(), 2)
+        Comment.objects.filter(approved=True).update(approved=False)
+        self.assertEqual(self.count(), 0)
+
+    def test_bulk_create(self):
+        Comment.objects.bulk_create([
+            Comment(post=self.post, name='a', email='a@example.com',
+                    comment='x', approved=True),
+            Comment(post=self.post, name='b', email='b@example.com',
+                    comment='y', approved=False),
+        ])
+        self.assertEqual(self.count(), 1)
+
+    def test_admin_list_editable(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.login(username='admin', password='pw')
+        comment = make_comment(self.post, approved=False)
+        response = self.client.post(
+            reverse('admin:portfolio_comment_changelist'), {
+                'form-TOTAL_FORMS': '1',
+                'form-INITIAL_FORMS': '1',
+                'form-0-id': str(comment.pk),
+                'form-0-approved': 'on',
+                '_save': 'Save',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.count(), 1)
+
+    def test_rebuild_command(self):
+        make_comment(self.post, approved=True)
+        BlogPost.objects.update(approved_comment_count=42)
+        call_command('rebuild_comment_counts', stdout=StringIO())
+        self.assertEqual(self.count(), 1)
+
+
+@override_settings(VIEW_COUNT_BUFFER={'FLUSH_THRESHOLD': 5,
+                                      'FLUSH_INTERVAL': 3600})
+class BufferedViewCountTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        view_counts.clear()
+        self.post = make_post(1, views=10)
+        self.url = reverse('blog-detail', args=[self.post.slug])
+
+    def tearDown(self):
+        view_counts.clear()
+
+    def stored_views(self):
+        self.post.refresh_from_db(fields=['views'])
+        return self.post.views
+
+    def test_response_includes_pending_views(self):
+        self.assertEqual(self.client.get(self.url).json()['views'], 11)
+        self.assertEqual(self.client.get(self.url).json()['views'], 12)
+        # nothing written yet, both hits are still buffered
+        self.assertEqual(self.stored_views(), 10)
+        self.assertEqual(view_counts.pending(self.post.pk), 2)
+
+    def test_detail_view_does_not_write(self):
+        # ETag aggregate + post + tags + its approved comments + related
+        # posts, no UPDATE
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+
+    def test_flush_on_threshold(self):
+        other = make_post(2)
+        for _ in range(3):
+            view_counts.increment(self.post.pk)
+        view_counts.increment(other.pk)
+        with self.assertNumQueries(1):
+            view_counts.increment(other.pk)
+        self.assertEqual(self.stored_views(), 13)
+        other.refresh_from_db()
+        self.assertEqual(other.views, 2)
+        self.assertEqual(view_counts.pending(self.post.pk), 0)
+
+    @override_settings(VIEW_COUNT_BUFFER={'FLUSH_THRESHOLD': 1000,
+                                          'FLUSH_INTERVAL': 0})
+    def test_flush_on_interval(self):
+        view_counts.increment(self.post.pk)
+        self.assertEqual(self.stored_views(), 11)
+
+    @override_settings(VIEW_COUNT_BUFFER={'FLUSH_THRESHOLD': 1,
+                                          'FLUSH_INTERVAL': 3600})
+    def test_failed_flush_does_not_fail_the_page(self):
+        with mock.patch.object(BlogPost.objects, 'filter',
+                               side_effect=DatabaseError('connection lost')):
+            with self.assertLogs('portfolio.view_counter', 'ERROR'):
+                self.assertEqual(view_counts.increment(self.post.pk), 1)
+        self.assertEqual(view_counts.pending(self.post.pk), 1)
+        with self.assertRaises(DatabaseError), mock.patch.object(
+                BlogPost.objects, 'filter',
+                side_effect=DatabaseError('connection lost')):
+            view_counts.flush()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.stored_views(), 12)
+
+    def test_manual_flush(self):
+        view_counts.increment(self.post.pk)
+        self.assertEqual(view_counts.flush(), 1)
+        self.assertEqual(self.stored_views(), 11)
+        self.assertEqual(view_counts.flush(), 0)
+
+
+class ResponseCacheTests(PortfolioTestCase):
+    def assertCached(self, url):
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_second_request_served_from_cache(self):
+        Skill.objects.create(name='Python', category='Backend')
+        url = reverse('skill-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.json(), second.json())
+
+    def test_query_params_are_normalized(self):
+        url = reverse('social-list')
+        self.client.get(url, {'platform': 'github', 'limit': '5'})
+        with self.assertNumQueries(0):
+            self.client.get(url + '?limit=5&platform=github')
+        with self.assertNumQueries(2):
+            self.client.get(url, {'platform': 'twitter', 'limit': '5'})
+
+    def test_save_and_delete_invalidate(self):
+        url = reverse('project-list')
+        self.assertEqual(self.client.get(url).json()['results'], [])
+        self.assertCached(url)
+        project = Project.objects.create(
+            title='Site', description='d', technologies='django')
+        self.assertEqual(len(self.client.get(url).json()['results']), 1)
+        self.assertCached(url)
+        project.delete()
+        self.assertEqual(self.client.get(url).json()['results'], [])
+        self.assertCached(url)
+
+    def test_comment_changes_invalidate_blog_list(self):
+        post = make_post(1)
+        url = reverse('blog-list')
+        first = self.client.get(url).json()['results'][0]
+        self.assertEqual(first['comments_count'], 0)
+        self.assertCached(url)
+        make_comment(post, approved=False)
+        Comment.objects.update(approved=True)
+        first = self.client.get(url).json()['results'][0]
+        self.assertEqual(first['comments_count'], 1)
+        self.assertCached(url)
+
+    def test_version_bumped_again_on_commit(self):
+        # A request between the save and the commit could cache the old rows
+        # under the version of the first bump, so the commit bumps again
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.update(approved=True)
+            Skill.objects.create(name='Python', category='Backend')
+            during = get_versions([Comment, Skill])
+        after = get_versions([Comment, Skill])
+        self.assertNotEqual(after[0], during[0])
+        self.assertNotEqual(after[1], during[1])
+
+    def test_categories_invalidated_by_blog_post(self):
+        url = reverse('blog-categories')
+        self.assertEqual(self.client.get(url).json(), [])
+        self.assertCached(url)
+        make_post(1, category='Python')
+        self.assertEqual(self.client.get(url).json(), ['Python'])
+        self.assertCached(url)
+
+    def test_unrelated_model_keeps_cache(self):
+        url = reverse('skill-list')
+        self.client.get(url)
+        SocialPost.objects.create(platform='github', content='c',
+                                  url='https://github.com/x',
+                                  posted_at=timezone.now())
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'portfolio-test-cache'),
+}})
+class FileResponseCacheTests(PortfolioTestCase):
+    def test_file_backend_caches_and_invalidates(self):
+        url = reverse('skill-list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        Skill.objects.create(name='Go', category='Backend')
+        self.assertEqual(len(self.client.get(url).json()), 1)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+
+class ConditionalGetTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        view_counts.clear()
+        self.post = make_post(1)
+        Project.objects.create(title='Site', description='d',
+                               technologies='django')
+
+    def tearDown(self):
+        view_counts.clear()
+
+    def assert_not_modified(self, url, serializer_class, **headers):
+        with mock.patch.object(serializer_class, 'to_representation') as rep:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        rep.assert_not_called()
+        return response
+
+    def test_list_endpoints_send_validators(self):
+        for name in ['project-list', 'skill-list', 'service-list',
+                     'blog-list', 'blog-categories', 'social-list']:
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('ETag', response, name)
+
+    def test_if_none_match_skips_serializer(self):
+        url = reverse('project-list')
+        etag = self.client.get(url)['ETag']
+        response = self.assert_not_modified(url, ProjectSerializer,
+                                            if_none_match=etag)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since_skips_serializer(self):
+        url = reverse('project-detail', args=[Project.objects.get().pk])
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assert_not_modified(url, ProjectSerializer,
+                                 if_modified_since=last_modified)
+
+    def test_blog_detail_304_still_counts_view(self):
+        url = reverse('blog-detail', args=[self.post.slug])
+        etag = self.client.get(url)['ETag']
+        self.assert_not_modified(url, BlogPostDetailSerializer,
+                                 if_none_match=etag)
+        self.assertEqual(view_counts.pending(self.post.pk), 2)
+
+    def test_edit_changes_etag(self):
+        url = reverse('blog-list')
+        etag = self.client.get(url)['ETag']
+        self.post.title = 'New title'
+        self.post.save()
+        response = self.client.get(url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_delete_changes_etag(self):
+        make_post(2)
+        url = reverse('blog-list')
+        etag = self.client.get(url)['ETag']
+        self.post.delete()
+        response = self.client.get(url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since_only_sees_deletes_and_counters(self):
+        # a client (or CDN) that only sends If-Modified-Since, dated after
+        # every updated_at
+        since = http_date(time.time() + 3600)
+        make_post(2)
+        url = reverse('blog-list')
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        self.post.delete()
+        response = self.client.get(url, headers={'if_modified_since': since})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+        post = BlogPost.objects.get()
+        make_comment(post, approved=False)
+        url = reverse('blog-detail', args=[post.slug])
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        Comment.objects.update(approved=True)
+        response = self.client.get(url, headers={'if_modified_since': since})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['comments']), 1)
+
+    def test_unknown_detail_is_404(self):
+        url = reverse('blog-detail', args=['missing'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class CursorPaginationTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        for i in range(25):
+            SocialPost.objects.create(
+                platform='github' if i % 2 else 'twitter', content=f'{i}',
+                url=f'https://example.com/{i}',
+                posted_at=now - timedelta(minutes=i // 2))
+
+    def collect(self, url, params=None):
+        seen = []
+        while url:
+            data = self.client.get(url, params).json()
+            params = None  # the next link already carries the query string
+            seen.extend(row['id'] for row in data['results'])
+            url = data['next']
+        return seen
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen = self.collect(reverse('social-list'), {'page_size': 4})
+        expected = list(SocialPost.objects.order_by(
+            '-posted_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_default_and_max_page_size(self):
+        url = reverse('social-list')
+        self.assertEqual(len(self.client.get(url).json()['results']), 20)
+        data = self.client.get(url, {'page_size': 1000}).json()
+        self.assertEqual(len(data['results']), 25)
+        self.assertIsNone(data['next'])
+
+    def test_deep_page_query_is_keyset(self):
+        url = reverse('social-list')
+        next_url = self.client.get(url, {'page_size': 10}).json()['next']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(next_url)
+        page_sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"posted_at" <', page_sql)
+        self.assertNotIn('OFFSET', page_sql)
+
+    def test_legacy_limit_returns_plain_list(self):
+        url = reverse('social-list')
+        data = self.client.get(url, {'limit': 3, 'platform': 'github'}).json()
+        self.assertEqual(len(data), 3)
+        self.assertTrue(all(row['platform'] == 'github' for row in data))
+        self.assertEqual(len(self.client.get(url, {'limit': 500}).json()), 25)
+
+    def test_invalid_limit_is_400(self):
+        url = reverse('social-list')
+        self.assertEqual(self.client.get(url, {'limit': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': '0'}).status_code, 400)
+
+
+class BlogSearchTests(PortfolioTestCase):
+    url = reverse('blog-search')
+
+    def search(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def titles(self, q):
+        return [post['title'] for post in self.search(q)['results']]
+
+    def test_ranks_title_match_above_content_match(self):
+        make_post(1, title='Notes', content='A long post about postgres')
+        make_post(2, title='Postgres tuning', content='Indexes')
+        self.assertEqual(self.titles('postgres'),
+                         ['Postgres tuning', 'Notes'])
+
+    def test_matches_excerpt_and_tags_and_skips_drafts(self):
+        make_post(1, excerpt='Caching with redis')
+        make_post(2, tags='redis,cache')
+        make_post(3, excerpt='redis draft', published=False)
+        self.assertEqual(sorted(self.titles('redis')), ['Post 1', 'Post 2'])
+
+    def test_index_follows_save_and_delete(self):
+        post = make_post(1, title='Old title')
+        self.assertEqual(self.titles('kubernetes'), [])
+        post.title = 'Kubernetes basics'
+        post.save()
+        self.assertEqual(self.titles('kubernetes'), ['Kubernetes basics'])
+        post.delete()
+        self.assertEqual(self.titles('kubernetes'), [])
+
+    def test_loaddata_indexes_posts(self):
+        post = make_post(1, title='Kubernetes basics')
+        fixture = os.path.join(tempfile.mkdtemp(), 'posts.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(fixture))
+        with open(fixture, 'w') as file:
+            file.write(serializers.serialize('json', [post]))
+        post.delete()
+        self.assertEqual(self.titles('kubernetes'), [])
+
+        call_command('loaddata', fixture, verbosity=0)
+        self.assertEqual(self.titles('kubernetes'), ['Kubernetes basics'])
+
+    def test_results_are_paginated(self):
+        for i in range(12):
+            make_post(i, content='django')
+        data = self.search('django', page_size=5)
+        self.assertEqual(data['count'], 12)
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNotNone(data['next'])
+
+    def test_query_syntax_is_escaped(self):
+        make_post(1, title='C++ "tips"')
+        self.assertEqual(self.search('"tips" OR (')['count'], 0)
+        self.assertEqual(self.titles('tips'), ['C++ "tips"'])
+        self.assertEqual(self.search('')['count'], 0)
+
+    def test_browsable_api(self):
+        make_post(1, title='ORM tricks')
+        response = self.client.get(self.url, {'q': 'orm'},
+                                   HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'ORM tricks')
+
+
+class TagTests(PortfolioTestCase):
+    def make_project(self, title, technologies):
+        return Project.objects.create(title=title, description='d',
+                                      technologies=technologies)
+
+    def test_tags_string_is_normalized_on_save(self):
+        post = make_post(1, tags='Python, django ,python,,')
+        self.assertEqual(sorted(post.tag_list.values_list('slug', flat=True)),
+                         ['django', 'python'])
+        make_post(2, tags='PYTHON')
+        self.assertEqual(Tag.objects.count(), 2)
+        post.tags = 'django'
+        post.save()
+        self.assertEqual(list(post.tag_list.values_list('slug', flat=True)),
+                         ['django'])
+
+    def test_tag_filter(self):
+        make_post(1, tags='python,django')
+        make_post(2, tags='react')
+        response = self.client.get(reverse('blog-list'), {'tag': 'Django'})
+        results = response.json()['results']
+        self.assertEqual([post['title'] for post in results], ['Post 1'])
+        self.assertEqual(results[0]['tag_list'], ['django', 'python'])
+
+    def test_tech_filter(self):
+        self.make_project('Shop', 'Django, React')
+        self.make_project('CLI', 'Rust')
+        response = self.client.get(reverse('project-list'), {'tech': 'react'})
+        results = response.json()['results']
+        self.assertEqual([project['title'] for project in results], ['Shop'])
+        self.assertEqual(results[0]['technology_list'], ['Django', 'React'])
+        self.assertEqual(Technology.objects.count(), 3)
+
+    def test_names_keep_their_symbols(self):
+        self.assertEqual(split_names('C, C++, C#, F#, 日本語, .NET, c '), {
+            'c': 'C', 'c++': 'C++', 'c#': 'C#', 'f#': 'F#', '日本語': '日本語',
+            '.net': '.NET'})
+        self.make_project('Kernel', 'C')
+        self.make_project('Engine', 'C++')
+        self.make_project('Game', 'C#')
+        self.assertEqual(sorted(Technology.objects.values_list(
+            'slug', flat=True)), ['c', 'c-plus-plus', 'c-sharp'])
+        for tech, title in [('c', 'Kernel'), ('C++', 'Engine'),
+                            ('c-plus-plus', 'Engine'), ('c#', 'Game'),
+                            ('c-sharp', 'Game')]:
+            response = self.client.get(reverse('project-list'),
+                                       {'tech': tech})
+            self.assertEqual([project['title'] for project
+                              in response.json()['results']], [title], tech)
+
+    def test_non_ascii_and_clashing_slugs(self):
+        post = make_post(1, tags='日本語, NET, .NET, !!!')
+        self.assertEqual(sorted(post.tag_list.values_list('name', 'slug')), [
+            ('!!!', 'tag'), ('.NET', 'net-2'), ('NET', 'net'),
+            ('日本語', '日本語')])
+        response = self.client.get(reverse('blog-list'), {'tag': '日本語'})
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_tag_counts_in_one_query(self):
+        make_post(1, tags='python,django')
+        make_post(2, tags='python')
+        make_post(3, tags='python,rust', published=False)
+        url = reverse('tag-list')
+        # just the GROUP BY query (the ETag comes from the cache versions)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.json(), [
+            {'name': 'python', 'slug': 'python', 'count': 2},
+            {'name': 'django', 'slug': 'django', 'count': 1},
+        ])
+
+    def test_project_list_query_count_is_constant(self):
+        for i in range(5):
+            self.make_project(f'P{i}', 'Django, React')
+        # ETag aggregate + projects + technologies prefetch
+        with self.assertNumQueries(3):
+            self.client.get(reverse('project-list'))
+
+
+def make_image_file(name='photo.png', size=(200, 100), mode='RGBA'):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 40, 40, 255)[:len(mode)]).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+class TempMediaTestCase(PortfolioTestCase):
+    # Uploads and generated variants go to a throwaway MEDIA_ROOT
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_project(self, **kwargs):
+        defaults = {'title': 'Site', 'description': 'd',
+                    'technologies': 'django'}
+        defaults.update(kwargs)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Project.objects.create(**defaults)
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False, IMAGE_VARIANT_WIDTHS=(40, 80))
+class ImageVariantTests(TempMediaTestCase):
+
+    def test_variants_generated_after_upload(self):
+        project = self.make_project(image=make_image_file())
+        project.refresh_from_db()
+        variants = project.image_variants
+        self.assertEqual(variants['source'], project.image.name)
+        for key in available_formats():
+            self.assertEqual(sorted(variants[key]), ['40', '80'])
+            name = variants[key]['40']
+            self.assertTrue(default_storage.exists(name))
+            with default_storage.open(name) as f:
+                self.assertEqual(Image.open(f).size, (40, 20))
+
+    def test_small_image_is_not_upscaled(self):
+        project = self.make_project(image=make_image_file(size=(30, 30)))
+        project.refresh_from_db()
+        self.assertEqual(list(project.image_variants['jpeg']), ['30'])
+
+    def test_serializer_exposes_srcset(self):
+        self.make_project(image=make_image_file())
+        data = self.client.get(reverse('project-list')).json()['results'][0]
+        self.assertNotIn('image_variants', data)
+        url = data['image_srcset']['webp']['40']
+        self.assertTrue(url.startswith('http://testserver/media/projects/'))
+        self.assertTrue(url.endswith('-40w.webp'))
+
+    def test_replacing_image_removes_old_variants(self):
+        project = self.make_project(image=make_image_file())
+        project.refresh_from_db()
+        old = project.image_variants['jpeg']['40']
+        project.image = make_image_file('other.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        project.refresh_from_db()
+        self.assertFalse(default_storage.exists(old))
+        self.assertIn('other', project.image_variants['jpeg']['40'])
+
+    def test_variants_change_the_validators(self):
+        # on_commit never runs here: the variants aren't built yet
+        project = Project.objects.create(title='Site', description='d',
+                                         technologies='django',
+                                         image=make_image_file())
+        list_url = reverse('project-list')
+        detail_url = reverse('project-detail', args=[project.pk])
+        list_etag = self.client.get(list_url)['ETag']
+        detail_etag = self.client.get(detail_url)['ETag']
+        build_variants('portfolio.Project', project.pk, 'image')
+
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('webp', response.json()['results'][0]['image_srcset'])
+        response = self.client.get(detail_url,
+                                   HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('webp', response.json()['image_srcset'])
+
+    def test_backfill_command(self):
+        project = self.make_project(image=make_image_file())
+        Project.objects.update(image_variants={})
+        call_command('generate_image_variants', workers=1, stdout=StringIO())
+        project.refresh_from_db()
+        self.assertIn('jpeg', project.image_variants)
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False, IMAGE_VARIANT_WIDTHS=(40,))
+class ImageMetadataTests(TempMediaTestCase):
+    def test_metadata_stored_on_upload(self):
+        project = self.make_project(
+            image=make_image_file(size=(120, 60), mode='RGB'))
+        project.refresh_from_db()
+        self.assertEqual((project.image_width, project.image_height),
+                         (120, 60))
+        self.assertEqual(project.image_color, '#c82828')
+        self.assertTrue(project.image_placeholder.startswith('data:image/'))
+        self.assertLess(len(project.image_placeholder), 1000)
+
+    def test_list_serializers_return_metadata_inline(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_post(1, featured_image=make_image_file(size=(90, 30)))
+        data = self.client.get(reverse('blog-list')).json()['results'][0]
+        self.assertEqual(data['featured_image_width'], 90)
+        self.assertEqual(data['featured_image_height'], 30)
+        self.assertEqual(data['featured_image_color'], '#c82828')
+        self.assertTrue(data['featured_image_placeholder'])
+
+    def test_removing_image_clears_metadata(self):
+        project = self.make_project(image=make_image_file())
+        project.refresh_from_db()
+        project.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        project.refresh_from_db()
+        self.assertIsNone(project.image_width)
+        self.assertEqual(project.image_placeholder, '')
+
+    def test_backfill_command_in_chunks(self):
+        for _ in range(3):
+            self.make_project(image=make_image_file())
+        Project.objects.update(image_width=None, image_height=None,
+                               image_color='', image_placeholder='')
+        out = StringIO()
+        # projects: 1 streamed SELECT + 2 bulk_updates, blog posts: 1 SELECT
+        with self.assertNumQueries(4):
+            call_command('backfill_image_metadata', chunk_size=2, stdout=out)
+        self.assertIn('filled metadata for 3 images', out.getvalue())
+        self.assertFalse(
+            Project.objects.filter(image_width__isnull=True).exists())
+
+    def test_backfill_changes_the_validators(self):
+        self.make_project(image=make_image_file())
+        Project.objects.update(image_width=None, image_height=None,
+                               image_color='', image_placeholder='')
+        url = reverse('project-list')
+        etag = self.client.get(url)['ETag']
+        call_command('backfill_image_metadata', stdout=StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['results'][0]['image_width'])
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False, IMAGE_VARIANT_WIDTHS=(40,))
+class FastListSerializerTests(TempMediaTestCase):
+    def seed(self):
+        now = timezone.now()
+        self.make_project(image=make_image_file(), live_url='https://a.dev',
+                          technologies='Django, React')
+        self.make_project(technologies='')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_post(1, featured_image=make_image_file(), tags='python, orm')
+        make_post(2, tags='')
+        Skill.objects.create(name='Python', category='Backend',
+                             proficiency=90)
+        Service.objects.create(title='API', description='d',
+                               features='Auth\n\n  Docs  \n')
+        SocialPost.objects.create(platform='github', content='c',
+                                  url='https://x.dev/1', posted_at=now)
+        # unknown platform: platform_display falls back to the raw value
+        SocialPost.objects.create(platform='old-platform', content='c',
+                                  url='https://x.dev/2', image_url='',
+                                  posted_at=now - timedelta(microseconds=1))
+
+    def test_same_json_as_drf_serializers(self):
+        self.seed()
+        urls = [reverse('project-list'), reverse('skill-list'),
+                reverse('blog-list'), reverse('service-list'),
+                reverse('social-list'), reverse('social-list') + '?limit=1',
+                reverse('project-list') + '?tech=react',
+                reverse('blog-list') + '?tag=orm']
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                fast = self.client.get(url)
+                cache.clear()
+                with override_settings(FAST_LIST_SERIALIZERS=False):
+                    slow = self.client.get(url)
+                self.assertEqual(fast.status_code, 200)
+                self.assertEqual(fast.content, slow.content)
+
+    def test_platform_display(self):
+        self.seed()
+        rows = SocialPost.objects.order_by('id').values(
+            *SocialPostFastSerializer().columns)
+        data = SocialPostFastSerializer().serialize(rows)
+        self.assertEqual([d['platform_display'] for d in data],
+                         ['GitHub', 'old-platform'])
+
+    def test_unknown_field_needs_computed(self):
+        class Broken(FastListSerializer):
+            serializer_class = SocialPostFastSerializer.serializer_class
+
+        with self.assertRaises(ImproperlyConfigured):
+            Broken()
+
+
+class FastJSONRendererTests(PortfolioTestCase):
+    data = {
+        'when': timezone.now().replace(microsecond=123456),
+        'price': Decimal('9.90'),
+        'text': 'caf\u00e9 \u2028 line',
+        'lazy': gettext_lazy('Lazy'),
+        'nested': [{'id': 1, 'ok': True, 'none': None, 'ratio': 0.1}],
+    }
+
+    def test_same_bytes_as_drf_renderer(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(renderers.FastJSONRenderer().render(self.data),
+                         expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.dumps(self.data), expected)
+
+    def test_stream_json_array(self):
+        chunks = [[{'a': 1}, {'a': 2}], [], [{'a': 3}]]
+        body = b''.join(renderers.stream_json_array(chunks))
+        self.assertEqual(json.loads(body), [{'a': 1}, {'a': 2}, {'a': 3}])
+        self.assertEqual(b''.join(renderers.stream_json_array([])), b'[]')
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class StreamingExportTests(PortfolioTestCase):
+    def test_social_export_streams_every_row(self):
+        now = timezone.now()
+        for i in range(5):
+            SocialPost.objects.create(
+                platform='github' if i % 2 else 'twitter', content='c',
+                url=f'https://x.dev/{i}', posted_at=now - timedelta(hours=i))
+        response = self.client.get(reverse('social-export'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        exported = json.loads(b''.join(response.streaming_content))
+        page = self.client.get(reverse('social-list')).json()['results']
+        self.assertEqual(exported, page)
+
+        response = self.client.get(reverse('social-export') + '?platform=github')
+        exported = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['platform'] for row in exported], ['github'] * 2)
+
+    def test_blog_export_skips_drafts(self):
+        for i in range(3):
+            make_post(i)
+        make_post(3, published=False)
+        response = self.client.get(reverse('blog-export'))
+        exported = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(exported), 3)
+        self.assertEqual(exported[0]['tag_list'], ['django', 'python'])
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False, IMAGE_VARIANT_WIDTHS=(40,))
+class AsyncViewTests(TempMediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(view_counts.clear)
+        now = timezone.now()
+        self.make_project(technologies='Django, React')
+        for i in range(3):
+            make_comment(make_post(i, tags='python, orm'), approved=i != 1)
+        for i in range(5):
+            SocialPost.objects.create(platform='github', content='c',
+                                      url=f'https://x.dev/{i}',
+                                      posted_at=now - timedelta(hours=i))
+
+    def get_async(self, url):
+        cache.clear()
+        return async_to_sync(self.async_client.get)(url)
+
+    def get_sync(self, path):
+        cache.clear()
+        return self.client.get(path)
+
+    def test_same_json_as_sync_views(self):
+        project = Project.objects.get()
+        post = BlogPost.objects.get(title='Post 0')
+        paths = ['projects/', f'projects/{project.pk}/', 'skills/',
+                 'blog/?tag=orm', 'services/', 'social/?limit=2']
+        for path in paths:
+            with self.subTest(path=path):
+                response = self.get_async(f'/api/async/{path}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(),
+                                 self.get_sync(f'/api/{path}').json())
+
+        # the detail view counts a view each time, like the sync one
+        data = self.get_async(f'/api/async/blog/{post.slug}/').json()
+        expected = self.get_sync(f'/api/blog/{post.slug}/').json()
+        self.assertEqual(data['views'] + 1, expected['views'])
+        data['views'] = expected['views']
+        self.assertEqual(data, expected)
+        self.assertEqual(len(data['comments']), 1)
+
+    def test_cursor_pages_match(self):
+        url = '/api/async/social/?page_size=2'
+        sync_url = '/api/social/?page_size=2'
+        while url:
+            data = self.get_async(url).json()
+            expected = self.get_sync(sync_url).json()
+            self.assertEqual(data['results'], expected['results'])
+            url = data['next'] and data['next'].replace('http://testserver', '')
+            sync_url = expected['next'] and expected['next'].replace(
+                'http://testserver', '')
+            self.assertEqual(url and url.replace('/async', ''), sync_url)
+
+    def test_errors(self):
+        response = self.get_async('/api/async/blog/missing/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(),
+                         self.get_sync('/api/blog/missing/').json())
+        response = self.get_async('/api/async/social/?limit=x')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(),
+                         self.get_sync('/api/social/?limit=x').json())
+
+    def test_export(self):
+        response = self.get_async('/api/async/social/export/')
+        body = async_to_sync(self._read)(response)
+        self.assertEqual(json.loads(body), json.loads(b''.join(
+            self.get_sync('/api/social/export/').streaming_content)))
+
+    def test_cache_calls_stay_off_the_event_loop(self):
+        blocking = []
+
+        def spy(method):
+            def call(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                    blocking.append(method.__name__)
+                except RuntimeError:
+                    pass  # in a worker thread (cache.aget() etc.)
+                return method(*args, **kwargs)
+            return call
+
+        cache.clear()
+        with mock.patch.multiple(cache, **{
+                name: spy(getattr(cache, name))
+                for name in ['get', 'get_many', 'add', 'set']}):
+            for _ in range(2):
+                response = async_to_sync(self.async_client.get)(
+                    '/api/async/skills/')
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(blocking, [])
+
+    async def _read(self, response):
+        return b''.join([piece async for piece in response.streaming_content])
+
+
+def seed_home_page():
+    now = timezone.now()
+    Project.objects.create(title='Site', description='d',
+                           technologies='Django')
+    Skill.objects.create(name='Python', category='Backend', proficiency=90)
+    Service.objects.create(title='API', description='d', features='Auth')
+    make_post(1, featured=True, category='Django')
+    make_post(2, category='Python')
+    for i in range(4):
+        SocialPost.objects.create(platform='github', content='c',
+                                  url=f'https://x.dev/{i}',
+                                  posted_at=now - timedelta(hours=i))
+
+
+def expected_home_page(client, social_limit):
+    return {
+        'projects': client.get(reverse('project-list')).json(),
+        'skills': client.get(reverse('skill-list')).json(),
+        'services': client.get(reverse('service-list')).json(),
+        'featured_posts': client.get(reverse('blog-list') + '?featured=1').json(),
+        'categories': client.get(reverse('blog-categories')).json(),
+        'social': client.get(
+            reverse('social-list') + f'?limit={social_limit}').json(),
+    }
+
+
+@override_settings(HOME_BUNDLE_WORKERS=1)
+class HomeBundleTests(PortfolioTestCase):
+    url = reverse('home')
+
+    def test_bundle_matches_the_separate_endpoints(self):
+        seed_home_page()
+        data = self.client.get(self.url + '?social_limit=3').json()
+        self.assertEqual(data, expected_home_page(self.client, 3))
+        self.assertEqual(len(data['social']), 3)
+        self.assertEqual(len(data['featured_posts']['results']), 1)
+
+    def test_cached_as_a_unit_and_invalidated_by_any_model(self):
+        seed_home_page()
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()['skills']), 1)
+        # a 304 for the bundle as a whole
+        response = self.client.get(self.url,
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        Skill.objects.create(name='SQL', category='Backend')
+        self.assertEqual(len(self.client.get(self.url).json()['skills']), 2)
+
+    def test_invalid_social_limit(self):
+        response = self.client.get(self.url + '?social_limit=0')
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_section_fails_the_bundle_and_is_not_cached(self):
+        seed_home_page()
+        broken = Response({'detail': 'Unavailable'}, status=503)
+        with mock.patch.object(SkillListView, 'list', return_value=broken):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('skills', response.json()['detail'])
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['skills']), 1)
+
+
+@override_settings(HOME_BUNDLE_WORKERS=3)
+@override_settings(RELATED_POSTS_ASYNC=False)
+class ConcurrentHomeBundleTests(TransactionTestCase):
+    # Sections run on other threads (own connections), so the data has to be
+    # committed - hence TransactionTestCase
+    def setUp(self):
+        cache.clear()
+
+    def test_sections_built_on_thread_pool(self):
+        seed_home_page()
+        data = self.client.get(reverse('home')).json()
+        cache.clear()
+        self.assertEqual(data, expected_home_page(self.client, 6))
+
+
+class SocialIngestTestCase(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir, ignore_errors=True)
+        self.write('github', [
+            {'url': 'https://github.com/a', 'content': 'Repo A',
+             'posted_at': '2026-01-02T10:00:00Z', 'likes': 5},
+            {'url': 'https://github.com/b', 'content': 'Repo B',
+             'posted_at': '2026-01-01T10:00:00Z', 'likes': 1},
+        ])
+        self.write('twitter', [
+            {'url': 'https://x.com/1', 'content': 'Hello',
+             'posted_at': '2026-01-03T10:00:00+00:00', 'likes': 7,
+             'shares': 2},
+            # same post twice in one fetch
+            {'url': 'https://x.com/1', 'content': 'Hello',
+             'posted_at': '2026-01-03T10:00:00+00:00', 'likes': 8,
+             'shares': 2},
+        ])
+
+    def write(self, platform, posts):
+        with open(os.path.join(self.source_dir, f'{platform}.json'), 'w') as f:
+            json.dump(posts, f)
+
+    def ingest(self, **options):
+        out = StringIO()
+        call_command('ingest_social', source_dir=self.source_dir,
+                     stdout=out, **options)
+        return out.getvalue()
+
+
+class SocialIngestTests(SocialIngestTestCase):
+    def test_new_posts_are_inserted_once(self):
+        output = self.ingest()
+        self.assertIn('3 posts from 5 platforms: 3 new, 0 updated', output)
+        self.assertEqual(SocialPost.objects.count(), 3)
+        tweet = SocialPost.objects.get(url='https://x.com/1')
+        self.assertEqual((tweet.platform, tweet.likes, tweet.shares),
+                         ('twitter', 8, 2))
+
+    def test_unchanged_rows_are_skipped(self):
+        self.ingest()
+        fetched_at = SocialPost.objects.get(url='https://github.com/a').fetched_at
+        output = self.ingest()
+        self.assertIn('0 new, 0 updated, 3 unchanged', output)
+        self.assertEqual(
+            SocialPost.objects.get(url='https://github.com/a').fetched_at,
+            fetched_at)
+
+    def test_changed_metrics_are_upserted_in_batches(self):
+        self.ingest()
+        self.write('github', [
+            {'url': 'https://github.com/a', 'content': 'Repo A',
+             'posted_at': '2026-01-02T10:00:00Z', 'likes': 50},
+            {'url': 'https://github.com/c', 'content': 'Repo C',
+             'posted_at': '2026-01-04T10:00:00Z'},
+            {'url': 'https://github.com/d', 'content': 'Repo D',
+             'posted_at': '2026-01-05T10:00:00Z'},
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            output = self.ingest(platforms=['github'], batch_size=2)
+        self.assertIn('3 posts from 1 platforms: 2 new, 1 updated', output)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)  # 3 rows, batches of 2
+        self.assertEqual(
+            SocialPost.objects.get(url='https://github.com/a').likes, 50)
+        self.assertEqual(SocialPost.objects.count(), 5)
+
+    def test_ingest_invalidates_cached_feed(self):
+        self.assertEqual(self.client.get(reverse('social-list')).json()[
+            'results'], [])
+        self.ingest()
+        self.assertEqual(
+            len(self.client.get(reverse('social-list')).json()['results']), 3)
+
+
+class SocialRefreshTests(SocialIngestTestCase):
+    def make_due(self):
+        SocialPost.objects.update(next_refresh_at=timezone.now())
+
+    def test_refresh_interval_doubles_with_age(self):
+        now = timezone.now()
+        self.assertEqual(next_refresh(now - timedelta(minutes=10), now) - now,
+                         timedelta(minutes=5))
+        self.assertEqual(next_refresh(now - timedelta(days=1), now) - now,
+                         timedelta(minutes=80))
+        self.assertEqual(next_refresh(now - timedelta(days=400), now) - now,
+                         timedelta(days=7))
+
+    def test_only_changed_rows_are_rewritten(self):
+        self.ingest()
+        self.make_due()
+        before = dict(SocialPost.objects.values_list('url', 'fetched_at'))
+        self.write('github', [
+            {'url': 'https://github.com/a', 'content': 'Repo A',
+             'posted_at': '2026-01-02T10:00:00Z', 'likes': 6},
+            {'url': 'https://github.com/b', 'content': 'Repo B',
+             'posted_at': '2026-01-01T10:00:00Z', 'likes': 1},
+        ])
+        output = self.ingest(refresh=True)
+        self.assertIn('3 posts due for a refresh: 1 changed, 2 unchanged',
+                      output)
+        after = dict(SocialPost.objects.values_list('url', 'fetched_at'))
+        self.assertGreater(after['https://github.com/a'],
+                           before['https://github.com/a'])
+        self.assertEqual(after['https://github.com/b'],
+                         before['https://github.com/b'])
+        self.assertEqual(
+            SocialPost.objects.get(url='https://github.com/a').likes, 6)
+        # everything was rescheduled, so nothing is due right away
+        self.assertIn('0 posts due', self.ingest(refresh=True))
+
+    def test_newest_posts_first(self):
+        self.ingest()
+        self.make_due()
+        self.ingest(refresh=True, limit=1)
+        refreshed = SocialPost.objects.filter(
+            next_refresh_at__gt=timezone.now())
+        self.assertEqual([post.url for post in refreshed], ['https://x.com/1'])
+
+    def test_save_keeps_content_hash_current(self):
+        self.ingest()
+        post = SocialPost.objects.get(url='https://github.com/a')
+        post.likes = 99
+        post.save(update_fields=['likes'])
+        post.refresh_from_db()
+        self.assertEqual(post.content_hash, post.compute_content_hash())
+
+
+class WriteBehindTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, journal_dir, ignore_errors=True)
+        self.journal = os.path.join(journal_dir, 'journal.sqlite3')
+        settings_override = override_settings(
+            WRITE_BEHIND={'JOURNAL': self.journal, 'WORKER': False})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.queue = self.new_queue()
+        patcher = mock.patch('portfolio.write_queue.write_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_queue(self):
+        write_queue = WriteBehindQueue(self.journal)
+        self.addCleanup(write_queue.close)
+        return write_queue
+
+    def post_contact(self, **kwargs):
+        data = {'name': 'Visitor', 'email': 'visitor@example.com',
+                'subject': 'Hello'}
+        data.update(kwargs)
+        # a different message each time, or the duplicate filter kicks in
+        data.setdefault('message', f"About {data['subject']}")
+        return self.client.post(reverse('contact-create'), data)
+
+    def test_contact_is_accepted_and_written_later(self):
+        response = self.post_contact()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['subject'], 'Hello')
+        self.assertFalse(Contact.objects.exists())
+        self.assertEqual(self.queue.pending(), 1)
+
+        self.assertEqual(self.queue.flush(), 1)
+        contact = Contact.objects.get()
+        self.assertEqual(contact.email, 'visitor@example.com')
+        self.assertIsNotNone(contact.created_at)
+        self.assertEqual(self.queue.pending(), 0)
+
+    def test_rows_keep_the_time_they_were_posted(self):
+        self.post_contact()
+        posted = timezone.now()
+        time.sleep(0.01)  # the worker writes it later
+        self.queue.flush()
+        self.assertLess(Contact.objects.get().created_at, posted)
+
+    def test_invalid_data_is_rejected_up_front(self):
+        response = self.post_contact(email='not an email')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.queue.pending(), 0)
+
+    def test_comments_are_written_in_one_batch(self):
+        post = make_post(1)
+        for index in range(3):
+            response = self.client.post(reverse('comment-create'), {
+                'post': post.pk, 'name': f'Reader {index}',
+                'email': 'reader@example.com', 'comment': f'Nice {index}'})
+            self.assertEqual(response.status_code, 202)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.queue.flush()
+        inserts = [query for query in queries
+                   if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(post.comments.filter(approved=False).count(), 3)
+
+    def test_queued_rows_survive_a_crash(self):
+        self.post_contact(subject='First')
+        self.post_contact(subject='Second')
+        # the process dies: the in-memory queue is gone, the journal isn't
+        self.queue.close()
+
+        self.assertEqual(self.new_queue().flush(), 2)
+        self.assertEqual(sorted(Contact.objects.values_list(
+            'subject', flat=True)), ['First', 'Second'])
+
+    def test_rows_of_a_running_process_are_left_alone(self):
+        self.post_contact()
+        self.queue.close()
+        with sqlite3.connect(self.journal) as journal:
+            journal.execute('UPDATE entries SET pid = ?', (os.getppid(),))
+
+        self.assertEqual(self.new_queue().flush(), 0)
+        self.assertFalse(Contact.objects.exists())
+
+    def test_full_queue_writes_inline(self):
+        with self.settings(WRITE_BEHIND={'JOURNAL': self.journal,
+                                         'MAX_QUEUE': 1, 'WORKER': False}):
+            self.assertEqual(
+                self.post_contact(subject='Queued').status_code, 202)
+            response = self.post_contact(subject='Inline')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(Contact.objects.values_list(
+            'subject', flat=True)), ['Inline'])
+        self.assertEqual(self.queue.pending(), 1)
+
+    def test_failed_enqueue_can_be_retried(self):
+        with mock.patch.object(self.queue, 'put',
+                               side_effect=sqlite3.OperationalError('full')):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.post_contact(message='Hello there')
+        self.assertEqual(self.post_contact(message='Hello there').status_code,
+                         202)
+
+    def test_worker_replays_without_new_rows(self):
+        self.post_contact()
+        self.queue.close()
+        write_queue = self.new_queue()
+        write_queue.start()
+
+        # nothing queued: the worker's wait times out and it replays anyway
+        self.assertEqual(write_queue._take(timeout=0.01), [])
+        self.assertTrue(write_queue._work([]))
+        self.assertEqual(Contact.objects.count(), 1)
+        self.assertEqual(write_queue.pending(), 0)
+
+    def test_failed_batch_is_retried(self):
+        post = make_post(1)
+        self.post_contact()
+        self.client.post(reverse('comment-create'), {
+            'post': post.pk, 'name': 'Reader', 'email': 'reader@example.com',
+            'comment': 'Nice'})
+        rows = self.queue._take()
+        with mock.patch.object(Comment.objects, 'bulk_create',
+                               side_effect=DatabaseError('connection lost')):
+            self.assertFalse(self.queue._work(rows))
+        self.assertEqual(self.queue.pending(), 1)
+
+        self.assertTrue(self.queue._work([]))
+        # the contact of the failed batch was already written: not again
+        self.assertEqual(Contact.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(self.queue.pending(), 0)
+
+    def test_retry_delay_doubles(self):
+        with self.settings(WRITE_BEHIND={'RETRY_DELAY': 5}):
+            self.assertEqual([retry_delay(failures) for failures in (1, 2, 3)],
+                             [5, 10, 20])
+            self.assertEqual(retry_delay(20), 300)
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {
+    'contact': '3/hour', 'comments': '3/hour'}})
+class ThrottleTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(TokenBucketThrottle, 'timer',
+                                    lambda throttle: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sent = 0
+
+    def post_contact(self, email='visitor@example.com', ip='10.0.0.1',
+                     message=None):
+        self.sent += 1
+        return self.client.post(reverse('contact-create'), {
+            'name': 'Visitor', 'email': email, 'subject': 'Hello',
+            'message': message or f'Message {self.sent}'},
+            REMOTE_ADDR=ip)
+
+    def test_burst_then_refill(self):
+        for _ in range(3):
+            self.assertEqual(self.post_contact().status_code, 201)
+        response = self.post_contact()
+        self.assertEqual(response.status_code, 429)
+        # one token comes back every 20 minutes
+        self.assertEqual(response['Retry-After'], '1200')
+
+        self.now += 1200
+        self.assertEqual(self.post_contact().status_code, 201)
+        self.assertEqual(self.post_contact().status_code, 429)
+        self.assertEqual(Contact.objects.count(), 4)
+
+    def test_ip_and_email_are_limited_separately(self):
+        for index in range(3):
+            self.post_contact(email=f'visitor{index}@example.com')
+        # new email, same IP
+        self.assertEqual(
+            self.post_contact(email='other@example.com').status_code, 429)
+        # same email from another IP
+        self.assertEqual(self.post_contact(email='visitor0@example.com',
+                                           ip='10.0.0.2').status_code, 201)
+        self.assertEqual(self.post_contact(email='Visitor0@example.com',
+                                           ip='10.0.0.3').status_code, 201)
+        self.assertEqual(self.post_contact(email='visitor0@example.com',
+                                           ip='10.0.0.4').status_code, 429)
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1,
+                                       'DEFAULT_THROTTLE_RATES': {
+                                           'contact': '3/hour'}})
+    def test_spoofed_forwarded_for_shares_the_bucket(self):
+        # the proxy appends the real client IP; the client made up the rest
+        statuses = [self.client.post(reverse('contact-create'), {
+            'name': 'Visitor', 'email': f'visitor{index}@example.com',
+            'subject': 'Hello', 'message': f'Message {index}'},
+            HTTP_X_FORWARDED_FOR=f'192.0.2.{index}, 10.0.0.1',
+            REMOTE_ADDR='10.1.1.1').status_code for index in range(4)]
+        self.assertEqual(statuses, [201, 201, 201, 429])
+
+    def test_comments_have_their_own_buckets(self):
+        post = make_post(1)
+        for _ in range(3):
+            self.post_contact()
+        response = self.client.post(reverse('comment-create'), {
+            'post': post.pk, 'name': 'Reader', 'email': 'visitor@example.com',
+            'comment': 'Nice'}, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 201)
+
+    def test_duplicate_message_is_rejected(self):
+        self.assertEqual(self.post_contact(message='Buy now').status_code,
+                         201)
+        response = self.post_contact(message='  BUY   now ', ip='10.0.0.2',
+                                     email='other@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('message', response.json())
+        self.assertEqual(Contact.objects.count(), 1)
+
+    def test_failed_insert_can_be_retried(self):
+        with mock.patch.object(Contact.objects, 'create',
+                               side_effect=DatabaseError('connection lost')):
+            with self.assertRaises(DatabaseError):
+                self.post_contact(message='Hello there')
+        self.assertEqual(self.post_contact(message='Hello there').status_code,
+                         201)
+        self.assertEqual(self.post_contact(message='Hello there').status_code,
+                         400)
+
+    def test_same_comment_on_another_post_is_fine(self):
+        first, second = make_post(1), make_post(2)
+        statuses = [self.client.post(reverse('comment-create'), {
+            'post': post.pk, 'name': 'Reader', 'email': 'reader@example.com',
+            'comment': 'Great read'}).status_code
+            for post in (first, second, first)]
+        self.assertEqual(statuses, [201, 201, 400])
+
+
+class CommentModerationTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post = make_post(1)
+        self.pending = [make_comment(self.post, approved=False,
+                                     comment=f'Comment {index}')
+                        for index in range(5)]
+        self.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'pw')
+
+    def moderate(self, action, comments):
+        return self.client.post(
+            reverse('comment-moderate'),
+            {'action': action, 'ids': [comment.pk for comment in comments]},
+            content_type='application/json')
+
+    def comment_count(self):
+        return self.client.get(reverse('blog-list')).json()[
+            'results'][0]['comments_count']
+
+    def test_staff_only(self):
+        self.assertEqual(self.moderate('approve', self.pending).status_code,
+                         403)
+        self.client.login(username='admin', password='pw')
+        self.assertEqual(self.moderate('delete', self.pending).status_code,
+                         400)
+
+    # tiny batches: more UPDATEs than the view's query budget is for
+    @override_settings(COMMENT_MODERATION_BATCH_SIZE=2,
+                       QUERY_BUDGET_MODE='off')
+    def test_one_update_per_batch(self):
+        self.client.login(username='admin', password='pw')
+        self.assertEqual(self.comment_count(), 0)  # now cached
+        with CaptureQueriesContext(connection) as queries:
+            response = self.moderate('approve', self.pending)
+        self.assertEqual(response.json(), {'action': 'approve', 'changed': 5})
+        updates = [query for query in queries
+                   if query['sql'].startswith('UPDATE "portfolio_comment"')]
+        self.assertEqual(len(updates), 3)
+        # counter and response cache both see the change
+        self.assertEqual(self.comment_count(), 5)
+
+        response = self.moderate('reject', self.pending[:2])
+        self.assertEqual(response.json()['changed'], 2)
+        self.assertEqual(self.comment_count(), 3)
+
+    def test_admin_actions(self):
+        self.client.login(username='admin', password='pw')
+        url = reverse('admin:portfolio_comment_changelist')
+        response = self.client.post(url, {
+            'action': 'approve_comments',
+            '_selected_action': [comment.pk for comment in self.pending[:3]],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.comment_count(), 3)
+
+        self.client.post(url, {
+            'action': 'reject_comments',
+            '_selected_action': [self.pending[0].pk],
+        })
+        self.assertEqual(self.comment_count(), 2)
+
+    def test_changelist_queries_dont_grow_with_rows(self):
+        self.client.login(username='admin', password='pw')
+        url = reverse('admin:portfolio_comment_changelist')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for index in range(10):
+            make_comment(make_post(index + 2), approved=False)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(few), len(many))
+
+
+class RenderedContentTests(PortfolioTestCase):
+    CONTENT = ("## Getting started\n\nInstall it with `pip`. See the "
+               "[docs](https://example.com/docs).\n\n"
+               "<script>alert(1)</script> [click](javascript:alert)\n\n"
+               "## Getting started\n\n- one\n- two\n")
+
+    def test_save_renders_content(self):
+        post = make_post(1, content=self.CONTENT + 'word ' * 450)
+        self.assertIn('<h2 id="getting-started">Getting started</h2>',
+                      post.content_html)
+        self.assertIn('<code>pip</code>', post.content_html)
+        self.assertIn('<a href="https://example.com/docs">docs</a>',
+                      post.content_html)
+        self.assertIn('&lt;script&gt;', post.content_html)
+        self.assertNotIn('javascript:', post.content_html)
+        self.assertEqual(post.toc, [
+            {'level': 2, 'text': 'Getting started', 'id': 'getting-started'},
+            {'level': 2, 'text': 'Getting started',
+             'id': 'getting-started-2'},
+        ])
+        self.assertEqual(post.word_count, 468)
+        self.assertEqual(post.reading_time, 3)
+
+    def test_emphasis_leaves_urls_alone(self):
+        self.assertEqual(
+            render_content('[x](https://ex.com/_foo_/bar)')['content_html'],
+            '<p><a href="https://ex.com/_foo_/bar">x</a></p>')
+        self.assertEqual(
+            render_content('**[a](http://x/**y**)**')['content_html'],
+            '<p><strong><a href="http://x/**y**">a</a></strong></p>')
+        self.assertEqual(
+            render_content('![a _x_ b](/img/_x_.png) and _y_')['content_html'],
+            '<p><img src="/img/_x_.png" alt="a _x_ b" loading="lazy"> '
+            'and <em>y</em></p>')
+        self.assertEqual(
+            render_content('[*docs*](https://ex.com/a_b_c)')['content_html'],
+            '<p><a href="https://ex.com/a_b_c"><em>docs</em></a></p>')
+
+    def test_update_fields(self):
+        post = make_post(1, content='One two')
+        post.content = 'One two three'
+        post.save(update_fields=['title'])
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 2)
+        post.content = 'One two three'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 3)
+        self.assertEqual(post.content_html, '<p>One two three</p>')
+
+    def test_detail_serves_html(self):
+        post = make_post(1, content=self.CONTENT)
+        for name in ('blog-detail', 'async-blog-detail'):
+            data = self.client.get(reverse(name, args=[post.slug])).json()
+            self.assertEqual(data['content_html'], post.content_html)
+            self.assertEqual(data['toc'][0]['id'], 'getting-started')
+            self.assertEqual(data['word_count'], post.word_count)
+        view_counts.clear()
+
+    def test_command_rerenders_outdated_posts(self):
+        posts = [make_post(index, content=f'# Post {index}')
+                 for index in range(3)]
+        BlogPost.objects.filter(pk__in=[posts[0].pk, posts[1].pk]).update(
+            content_html='', content_renderer_version=0)
+        out = StringIO()
+        call_command('render_blog_posts', workers=2, stdout=out)
+        self.assertIn('Rendering 2 posts', out.getvalue())
+        self.assertEqual(
+            BlogPost.objects.get(pk=posts[0].pk).content_html,
+            '<h1 id="post-0">Post 0</h1>')
+        self.assertFalse(BlogPost.objects.filter(content_html='').exists())
+
+
+@override_settings(RELATED_POSTS_COUNT=2)
+class RelatedPostsTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.django_a = make_post(
+            1, title='Django REST APIs', category='Django',
+            tags='django,rest',
+            content='Building a REST API with Django REST framework '
+                    'serializers and viewsets.')
+        self.django_b = make_post(
+            2, title='Django ORM tips', category='Django',
+            tags='django,orm',
+            content='Django ORM querysets, serializers and the REST '
+                    'framework.')
+        self.cooking = make_post(
+            3, title='Roast tomatoes', category='Food', tags='cooking',
+            content='Slow roasted tomatoes with garlic and basil.')
+        self.rebuild()
+
+    def rebuild(self):
+        out = StringIO()
+        call_command('build_related_posts', stdout=out)
+        return out.getvalue()
+
+    def related(self, post):
+        return list(RelatedPost.objects.filter(post=post).values_list(
+            'related_id', flat=True))
+
+    def test_rebuild(self):
+        self.assertIn('Related posts of 3 posts rebuilt', self.rebuild())
+        self.assertEqual(self.related(self.django_a)[0], self.django_b.pk)
+        self.assertEqual(self.related(self.django_b)[0], self.django_a.pk)
+        # nothing in common: not related at all
+        self.assertEqual(self.related(self.cooking), [])
+
+    def test_detail_serves_related_posts_in_one_query(self):
+        for name in ('blog-detail', 'async-blog-detail'):
+            url = reverse(name, args=[self.django_a.slug])
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).json()
+            self.assertEqual(len([
+                query for query in queries
+                if 'FROM "portfolio_relatedpost"' in query['sql']]), 1)
+            related = data['related_posts']
+            self.assertEqual(related[0]['slug'], self.django_b.slug)
+            self.assertEqual(set(related[0]), {
+                'id', 'title', 'slug', 'excerpt', 'category',
+                'reading_time', 'created_at'})
+        view_counts.clear()
+
+    @override_settings(RELATED_POSTS_COUNT=1)
+    def test_new_post_updates_affected_rows_only(self):
+        self.rebuild()
+        django_rows = list(RelatedPost.objects.filter(
+            post__category='Django').values_list('pk', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            pasta = make_post(4, title='Garlic pasta', category='Food',
+                              tags='cooking',
+                              content='Garlic pasta with roasted tomatoes.')
+        self.assertEqual(self.related(pasta), [self.cooking.pk])
+        self.assertEqual(self.related(self.cooking), [pasta.pk])
+        # the rows of the Django posts weren't rewritten
+        self.assertEqual(list(RelatedPost.objects.filter(
+            post__category='Django').values_list('pk', flat=True)),
+            django_rows)
+
+    def test_unpublish_and_delete(self):
+        self.django_b.published = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.django_b.save()
+        self.assertEqual(self.related(self.django_b), [])
+        self.assertNotIn(self.django_b.pk, self.related(self.django_a))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.django_a.delete()
+        self.assertFalse(RelatedPost.objects.exists())
+
+    def test_numpy_and_python_agree(self):
+        from . import related
+        if related.numpy is None:
+            self.skipTest('NumPy is not installed')
+        pks, vectors = related.build_vectors(related.published_posts())
+        rows = range(len(pks))
+        expected = related.neighbours_python(vectors, rows, 2)
+        for row, best in related.neighbours_numpy(vectors, rows, 2).items():
+            self.assertEqual([index for index, _ in best],
+                             [index for index, _ in expected[row]])
+            for (_, score), (_, other) in zip(best, expected[row]):
+                self.assertAlmostEqual(score, other, places=5)
+
+
+class PerformanceMetricsTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        make_post(1)
+
+    def timings(self, response):
+        timings = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            timings[name] = dict(param.split('=', 1) for param in params)
+        return timings
+
+    @override_settings(SERVER_TIMING_PUBLIC=True)
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog-list'))
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'serialize', 'render', 'total'})
+        self.assertEqual(timings['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreaterEqual(float(timings['total']['dur']),
+                                float(timings['render']['dur']))
+        # unrounded, the header only has 2 decimals of a millisecond
+        for phase in ('serialize', 'render', 'total'):
+            self.assertGreater(
+                registry.durations[('blog-list', phase)].sum, 0)
+
+    @override_settings(SERVER_TIMING_PUBLIC=True)
+    def test_async_views_are_measured(self):
+        response = self.client.get(reverse('async-blog-list'))
+        timings = self.timings(response)
+        self.assertNotEqual(timings['db']['desc'], '"0 queries"')
+        self.assertGreater(float(timings['serialize']['dur']), 0)
+
+    def test_server_timing_is_not_public(self):
+        for name in ('blog-list', 'async-blog-list'):
+            response = self.client.get(reverse(name))
+            self.assertNotIn('Server-Timing', response)
+            # the histograms are recorded all the same
+            self.assertEqual(sum(registry.queries[name].counts), 1)
+
+    def test_server_timing_for_staff_and_internal_ips(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.login(username='admin', password='pw')
+        for name in ('blog-list', 'async-blog-list'):
+            self.assertIn('Server-Timing', self.client.get(reverse(name)))
+        self.client.logout()
+        with override_settings(INTERNAL_IPS=['127.0.0.1']):
+            self.assertIn('Server-Timing',
+                          self.client.get(reverse('blog-list')))
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('blog-list'))
+        self.client.get(reverse('blog-list'))
+        User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.login(username='admin', password='pw')
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4')
+        text = response.content.decode()
+        self.assertIn('portfolio_requests_total{view="blog-list",'
+                      'status="200"} 2', text)
+        self.assertIn('portfolio_request_duration_seconds_count{'
+                      'view="blog-list",phase="render"} 2', text)
+        self.assertIn('portfolio_request_queries_bucket{view="blog-list",'
+                      'le="+Inf"} 2', text)
+
+
+def seed_every_endpoint(count):
+    """count more rows of everything the endpoints show"""
+    now = timezone.now()
+    start = BlogPost.objects.count()
+    for i in range(start, start + count):
+        Project.objects.create(title=f'Project {i}', description='d',
+                               technologies='Django, Python, React')
+        Skill.objects.create(name=f'Skill {i}', category='Backend')
+        Service.objects.create(title=f'Service {i}', description='d',
+                               features='Auth')
+        post = make_post(i, title=f'Django post {i}', featured=i % 2 == 0,
+                         tags='python,django,orm')
+        make_comment(post, approved=True)
+        make_comment(post, approved=False)
+        SocialPost.objects.create(platform='github', content='c',
+                                  url=f'https://x.dev/{i}',
+                                  posted_at=now - timedelta(hours=i))
+    rebuild_related_posts()
+
+
+@override_settings(HOME_BUNDLE_WORKERS=1)
+class QueryBudgetTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(view_counts.clear)
+        self.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'pw')
+
+    def endpoint_requests(self):
+        """(name, method, URL, data) of a request to every endpoint"""
+        project = Project.objects.first()
+        post = BlogPost.objects.first()
+        gets = [
+            ('project-list', reverse('project-list') + '?tech=django'),
+            ('project-detail', reverse('project-detail', args=[project.pk])),
+            ('skill-list', reverse('skill-list')),
+            ('blog-list', reverse('blog-list')
+             + '?page_size=100&category=django&tag=orm'),
+            ('blog-categories', reverse('blog-categories')),
+            ('blog-search', reverse('blog-search') + '?q=django'),
+            ('blog-export', reverse('blog-export')),
+            ('blog-detail', reverse('blog-detail', args=[post.slug])),
+            ('service-list', reverse('service-list')),
+            ('social-list', reverse('social-list') + '?limit=100'),
+            ('social-export', reverse('social-export')),
+            ('tag-list', reverse('tag-list')),
+            ('home', reverse('home')),
+            ('async-project-list', reverse('async-project-list')),
+            ('async-project-detail',
+             reverse('async-project-detail', args=[project.pk])),
+            ('async-skill-list', reverse('async-skill-list')),
+            ('async-blog-list', reverse('async-blog-list')),
+            ('async-blog-detail',
+             reverse('async-blog-detail', args=[post.slug])),
+            ('async-service-list', reverse('async-service-list')),
+            ('async-social-list', reverse('async-social-list')),
+        ]
+        requests = [(name, 'get', url, None) for name, url in gets]
+        number = Contact.objects.count()
+        requests += [
+            ('contact-create', 'post', reverse('contact-create'),
+             {'name': 'Visitor', 'email': f'visitor{number}@example.com',
+              'subject': 'Hello', 'message': f'Message number {number}'}),
+            ('comment-create', 'post', reverse('comment-create'),
+             {'post': post.pk, 'name': 'Reader',
+              'email': f'reader{number}@example.com',
+              'comment': f'Comment number {number}'}),
+            ('comment-moderate', 'post', reverse('comment-moderate'),
+             {'action': 'approve', 'ids': list(
+                 Comment.objects.values_list('pk', flat=True))}),
+            ('metrics', 'get', reverse('metrics'), None),
+        ]
+        return requests
+
+    def query_counts(self):
+        """{endpoint name: queries of one uncached request}"""
+        self.client.force_login(self.admin)
+        counts = {}
+        for name, method, url, data in self.endpoint_requests():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(
+                    url, data, content_type='application/json') \
+                    if method == 'post' else self.client.get(url)
+            self.assertLess(response.status_code, 300, name)
+            counts[name] = len(queries)
+        return counts
+
+    def test_every_endpoint_stays_within_its_budget_as_rows_grow(self):
+        # QUERY_BUDGET_MODE is 'raise' in the tests: a request over its
+        # budget fails with QueryBudgetExceeded
+        seed_every_endpoint(2)
+        few = self.query_counts()
+        seed_every_endpoint(25)
+        many = self.query_counts()
+        # ...and the number of queries doesn't depend on the number of rows
+        self.assertEqual(few, many)
+
+    def test_every_view_declares_a_budget(self):
+        for pattern in urlpatterns + async_urlpatterns:
+            view = pattern.callback.view_class
+            with self.subTest(view=view.__name__):
+                budget = getattr(view, 'query_budget', None) or getattr(
+                    getattr(view, 'view_class', None), 'query_budget', None)
+                self.assertIsInstance(budget, int)
+
+    def over_budget(self):
+        # the blog list runs 3 queries (ETag aggregate, posts, tags)
+        seed_every_endpoint(2)
+        return mock.patch.object(BlogPostListView, 'query_budget', 2)
+
+    def test_raise_reports_every_query_and_where_it_ran(self):
+        with self.over_budget(), \
+                self.assertRaises(QueryBudgetExceeded) as raised:
+            self.client.get(reverse('blog-list'))
+        message = str(raised.exception)
+        self.assertIn('GET /api/blog/ ran 3 queries, its budget is 2', message)
+        self.assertIn('3. SELECT', message)
+        self.assertIn('portfolio_tag', message)
+        self.assertIn('portfolio/fast_serializers.py', message)  # stacks
+        self.assertNotIn('site-packages', message)
+
+    def test_log_mode(self):
+        with self.over_budget(), self.settings(QUERY_BUDGET_MODE='log'), \
+                self.assertLogs('portfolio.query_budget', 'ERROR') as logs:
+            response = self.client.get(reverse('blog-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ran 3 queries', logs.output[0])
+
+    def test_sample_mode_only_checks_sampled_requests(self):
+        with self.over_budget(), self.settings(QUERY_BUDGET_MODE='sample',
+                                               QUERY_BUDGET_SAMPLE_RATE=0):
+            with self.assertNoLogs('portfolio.query_budget'):
+                self.client.get(reverse('blog-list'))
+            cache.clear()
+            with self.settings(QUERY_BUDGET_SAMPLE_RATE=1), \
+                    self.assertLogs('portfolio.query_budget',
+                                    'WARNING') as logs:
+                response = self.client.get(reverse('blog-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ran 3 queries', logs.output[0])
+
+    def test_default_mode_follows_debug(self):
+        with self.over_budget(), self.settings(QUERY_BUDGET_MODE=None,
+                                               DEBUG=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('blog-list'))
+
+
+class DatabaseWarmUpTests(PortfolioTestCase):
+    def test_runs_a_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            seconds = warm_up_database()
+        self.assertEqual([query['sql'] for query in queries], ['SELECT 1'])
+        self.assertGreaterEqual(seconds, 0)
+
+    @override_settings(DB_WARM_UP=False)
+    def test_can_be_switched_off(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(warm_up_database())
+
+    def test_opens_the_pool_and_returns_the_connection(self):
+        pool = mock.Mock(timeout=7)
+        wrapper = connections['default']
+        with mock.patch.object(wrapper, 'pool', pool, create=True), \
+                mock.patch.object(wrapper, 'close') as close:
+            warm_up_database()
+        pool.open.assert_called_once_with(wait=True, timeout=7)
+        close.assert_called_once_with()
+
+    def test_failure_is_logged(self):
+        wrapper = connections['default']
+        with mock.patch.object(wrapper, 'cursor',
+                               side_effect=RuntimeError('asleep')), \
+                self.assertLogs('portfolio.database', 'WARNING') as logs:
+            self.assertIsNone(warm_up_database())
+        self.assertIn('Database warm-up failed', logs.output[0])
+
+
+@override_settings(DB_STATEMENT_TIMEOUT=5000)
+class StatementTimeoutTests(PortfolioTestCase):
+    def postgres(self, host='ep-1.neon.tech', options=''):
+        return mock.MagicMock(vendor='postgresql', settings_dict={
+            'HOST': host, 'OPTIONS': {'options': options}})
+
+    def executed(self, wrapper):
+        return wrapper.cursor.return_value.__enter__.return_value.execute
+
+    def test_set_once_per_connection(self):
+        wrapper = self.postgres()
+        set_statement_timeout(None, wrapper)
+        set_statement_timeout(None, wrapper)  # back from the pool
+        self.executed(wrapper).assert_called_once_with(
+            "SELECT set_config('statement_timeout', %s, false)", ['5000'])
+        wrapper.connection = mock.Mock()  # a new connection
+        set_statement_timeout(None, wrapper)
+        self.assertEqual(self.executed(wrapper).call_count, 2)
+
+    def test_skipped(self):
+        wrappers = [
+            self.postgres(host='ep-1-pooler.neon.tech'),
+            self.postgres(options='-c statement_timeout=100'),
+            mock.MagicMock(vendor='sqlite', settings_dict={}),
+        ]
+        with self.settings(DB_STATEMENT_TIMEOUT=0):
+            wrappers.append(self.postgres())
+            set_statement_timeout(None, wrappers[-1])
+        for wrapper in wrappers[:-1]:
+            set_statement_timeout(None, wrapper)
+        for wrapper in wrappers:
+            wrapper.cursor.assert_not_called()
+
+    def test_only_the_web_entry_points_use_it(self):
+        # importing the settings (tests, manage.py) doesn't connect it
+        self.assertFalse(connection_created.disconnect(
+            dispatch_uid='portfolio_statement_timeout'))
+        use_statement_timeout()
+        self.assertTrue(connection_created.disconnect(
+            dispatch_uid='portfolio_statement_timeout'))
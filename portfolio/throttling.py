@@ -0,0 +1,129 @@
+import hashlib
+import re
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# Flood protection for the anonymous POST endpoints (/api/contact/,
+# /api/comments/).
+#
+# TokenBucketThrottle: every client gets a bucket of N tokens that refills
+# at N per period (the rate in DEFAULT_THROTTLE_RATES, e.g. '5/hour' = bursts
+# of up to 5, then one every 12 minutes). There is one bucket per IP address
+# and one per email address, and a POST needs a token from both - so a bot
+# can't get around the limit by rotating only one of the two. A bucket is two
+# numbers (tokens left, time of the last update) stored in the cache, so a
+# check is one get_many() and one set_many() however busy the client was
+# (DRF's own throttles keep a list of every request in the window).
+# The cache entry expires once the bucket would be full again: idle clients
+# disappear from the cache on their own.
+# The IP comes from DRF's get_ident(): with REST_FRAMEWORK['NUM_PROXIES'] set
+# it is the address our proxy saw, not whatever the client put in
+# X-Forwarded-For.
+#
+# is_duplicate(): the same message body (ignoring case and whitespace) is
+# only accepted once per DUPLICATE_POST_WINDOW seconds, so a resubmitted or
+# spammed message is rejected during validation, before any INSERT. The text
+# is remembered during validation too (one atomic cache.add()), so when the
+# INSERT then fails, WriteBehindCreateMixin calls forget_post() - otherwise
+# the visitor's retry would be rejected as a duplicate.
+#
+# Settings:
+# REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {'contact': ..., 'comments': ...}
+# REST_FRAMEWORK['NUM_PROXIES'] = 1  (proxies in front of the app)
+# DUPLICATE_POST_WINDOW = 600  (seconds, optional)
+
+DEFAULT_DUPLICATE_WINDOW = 600
+
+# The locmem cache is per process, so a lock is enough to make the
+# read-modify-write of a bucket atomic. With a shared cache two workers can
+# race on the same bucket, which at worst lets one extra request through.
+_lock = threading.Lock()
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Rate from DEFAULT_THROTTLE_RATES[view.throttle_scope]"""
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        # The rate depends on the view, so it is read in allow_request()
+        self.wait_seconds = None
+
+    def get_rate(self):
+        # Looked up on every request (not once at import like DRF's
+        # THROTTLE_RATES), so settings changes in tests take effect
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if self.scope not in api_settings.DEFAULT_THROTTLE_RATES:
+            raise ImproperlyConfigured(
+                f"No default throttle rate set for '{self.scope}' scope")
+        return rate
+
+    def get_idents(self, request):
+        idents = ['ip_' + _digest(self.get_ident(request))]
+        email = request.data.get('email') if hasattr(request.data, 'get') \
+            else None
+        if isinstance(email, str) and email.strip():
+            idents.append('email_' + _digest(email.strip().lower()))
+        return idents
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        refill = self.num_requests / self.duration  # tokens per second
+        keys = [self.cache_format % {'scope': self.scope, 'ident': ident}
+                for ident in self.get_idents(request)]
+        now = self.timer()
+        with _lock:
+            buckets = self.cache.get_many(keys)
+            tokens = {}
+            for key in keys:
+                left, updated = buckets.get(key, (self.num_requests, now))
+                tokens[key] = min(self.num_requests,
+                                  left + (now - updated) * refill)
+            allowed = all(left >= 1 for left in tokens.values())
+            if allowed:
+                tokens = {key: left - 1 for key, left in tokens.items()}
+            self.cache.set_many({key: (left, now)
+                                 for key, left in tokens.items()},
+                                self.duration)
+
+        if not allowed:
+            self.wait_seconds = max((1 - left) / refill
+                                    for left in tokens.values())
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+def _duplicate_key(scope, text):
+    normalized = re.sub(r'\s+', ' ', text).strip().lower()
+    return f'duplicate_{scope}_{_digest(normalized)}'
+
+
+def is_duplicate(scope, text):
+    """True when the same text was posted to this scope within the last
+    DUPLICATE_POST_WINDOW seconds (the first post is remembered)."""
+    window = getattr(settings, 'DUPLICATE_POST_WINDOW',
+                     DEFAULT_DUPLICATE_WINDOW)
+    # add() only stores the key when it isn't there yet
+    return not cache.add(_duplicate_key(scope, text), True, window)
+
+
+def forget_post(scope, text):
+    """Undo is_duplicate() for a post that could not be saved, so the
+    same text can be sent again."""
+    cache.delete(_duplicate_key(scope, text))
@@ -3,7 +3,9 @@ from django.urls import path
 from .views import (
     ProjectListView, ProjectDetailView, SkillListView, ContactCreateView,
     BlogPostListView, BlogPostDetailView, CommentCreateView,
-    ServiceListView, SocialPostListView, BlogCategoriesView
+    ServiceListView, SocialPostListView, BlogCategoriesView,
+    BlogPostSearchView, TagListView, BlogPostExportView, SocialPostExportView,
+    HomeView, CommentModerationView, MetricsView
 )
 
 urlpatterns = [
@@ -16,8 +18,17 @@ urlpatterns = [
     # New URLs
     path('blog/', BlogPostListView.as_view(), name='blog-list'),
     path('blog/categories/', BlogCategoriesView.as_view(), name='blog-categories'),
+    path('blog/search/', BlogPostSearchView.as_view(), name='blog-search'),
+    path('blog/export/', BlogPostExportView.as_view(), name='blog-export'),
     path('blog/<slug:slug>/', BlogPostDetailView.as_view(), name='blog-detail'),
     path('comments/', CommentCreateView.as_view(), name='comment-create'),
+    path('comments/moderate/', CommentModerationView.as_view(),
+         name='comment-moderate'),
     path('services/', ServiceListView.as_view(), name='service-list'),
     path('social/', SocialPostListView.as_view(), name='social-list'),
+    path('social/export/', SocialPostExportView.as_view(), name='social-export'),
+    path('tags/', TagListView.as_view(), name='tag-list'),
+    path('home/', HomeView.as_view(), name='home'),
+    # Prometheus scrape target (staff only), see metrics.py
+    path('_metrics', MetricsView.as_view(), name='metrics'),
 ]
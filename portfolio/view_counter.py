@@ -0,0 +1,108 @@
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
+from .models import BlogPost
+
+# Buffered blog post view counter.
+#
+# Instead of running UPDATE views = views + 1 (and a refresh_from_db) on every
+# page view, hits are added up in memory and written to BlogPost.views in one
+# batched UPDATE when either:
+#   - FLUSH_THRESHOLD hits are pending, or
+#   - FLUSH_INTERVAL seconds have passed since the last flush
+# Whatever is still pending is flushed when the worker shuts down gracefully
+# (atexit runs on gunicorn/uvicorn worker exit and on manage.py runserver).
+# A flush that fails during a page view is logged and the hits stay pending;
+# only flush() called directly raises.
+#
+# Settings (all optional):
+# VIEW_COUNT_BUFFER = {'FLUSH_THRESHOLD': 100, 'FLUSH_INTERVAL': 10}
+
+DEFAULTS = {
+    'FLUSH_THRESHOLD': 100,  # pending hits across all posts
+    'FLUSH_INTERVAL': 10,  # seconds
+}
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCountBuffer:
+    def __init__(self):
+        self._pending = {}  # post pk -> hits not yet written to the database
+        self._total = 0  # sum of self._pending.values()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _option(self, name):
+        options = getattr(settings, 'VIEW_COUNT_BUFFER', {})
+        return options.get(name, DEFAULTS[name])
+
+    def pending(self, pk):
+        """Hits recorded for this post that are not in the database yet."""
+        with self._lock:
+            return self._pending.get(pk, 0)
+
+    def increment(self, pk):
+        """Record one view and return the pending delta for the post
+        (including this view). Add it to the views value read from the
+        database to get the live count."""
+        with self._lock:
+            delta = self._pending.get(pk, 0) + 1
+            self._pending[pk] = delta
+            self._total += 1
+            due = (self._total >= self._option('FLUSH_THRESHOLD')
+                   or time.monotonic() - self._last_flush
+                   >= self._option('FLUSH_INTERVAL'))
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # The hits are pending again and go out with a later flush;
+                # a failed write must not fail the page view
+                logger.exception("Could not flush buffered blog post views")
+        return delta
+
+    def flush(self):
+        """Write all pending hits with a single UPDATE ... CASE WHEN statement.
+        Returns the number of posts updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._total = 0
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        delta = Case(
+            *[When(pk=pk, then=Value(hits)) for pk, hits in pending.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        try:
+            return BlogPost.objects.filter(pk__in=pending).update(
+                views=F('views') + delta)
+        except Exception:
+            # Put the hits back so the next flush retries them
+            with self._lock:
+                for pk, hits in pending.items():
+                    self._pending[pk] = self._pending.get(pk, 0) + hits
+                    self._total += hits
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._pending = {}
+            self._total = 0
+
+
+view_counts = ViewCountBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_counts.flush()
+    except Exception:
+        logger.exception("Could not flush buffered blog post views on exit")
@@ -1,107 +1,333 @@
-from django.db.models import F
-from rest_framework.generics import ListAPIView, RetrieveAPIView, CreateAPIView
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Lower
+from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import (ListAPIView, RetrieveAPIView,
+                                     CreateAPIView, GenericAPIView)
+from rest_framework.permissions import IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .models import (Project, Skill, Contact, BlogPost,
-                     Service, SocialPost, Comment)
+                     Service, SocialPost, Comment, Tag, Technology)
 from .serializers import (ProjectSerializer, SkillSerializer,
                           ContactSerializer, BlogPostListSerializer,
                           BlogPostDetailSerializer, ServiceSerializer,
-                          SocialPostSerializer, CommentSerializer)
+                          SocialPostSerializer, CommentSerializer,
+                          CommentModerationSerializer, TagCountSerializer)
+from .view_counter import view_counts
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .fast_serializers import (FastListMixin, StreamingExportMixin,
+                               ProjectFastSerializer,
+                               SkillFastSerializer, BlogPostListFastSerializer,
+                               ServiceFastSerializer, SocialPostFastSerializer)
+from .pagination import (LatestFirstCursorPagination,
+                         SocialPostCursorPagination, SearchPagination)
+from .search import search_post_ids
+from .home import build_home_bundle
+from .metrics import registry
+from .throttling import TokenBucketThrottle
+from .write_queue import WriteBehindCreateMixin
 
 # Create your views here.
 # Class based views
 
+# query_budget: the most SQL queries one uncached request to the view may run
+# (see query_budget.py). The numbers include the 2 queries (session + user)
+# of a logged-in visitor, and the tests check them with more and more rows.
 
-class ProjectListView(ListAPIView):
-    queryset = Project.objects.all()
+
+class ProjectListView(ConditionalGetMixin, CachedResponseMixin, FastListMixin,
+                      ListAPIView):
+    query_budget = 5
+    cache_models = [Project]
+    last_modified_field = 'updated_at'
     serializer_class = ProjectSerializer
+    # same JSON as ProjectSerializer, built from .values() (fast_serializers.py)
+    fast_serializer_class = ProjectFastSerializer
+    pagination_class = LatestFirstCursorPagination
+
+    def get_queryset(self):
+        # prefetch: 1 extra query for all technologies, not 1 per project
+        queryset = Project.objects.prefetch_related('technology_list')
+        tech = self.request.query_params.get('tech', None)
+
+        if tech:
+            # join through the M2M table on the technology's pk, looked
+            # up by name or slug in a subquery (models.py)
+            queryset = queryset.filter(
+                technology_list=Technology.lookup(tech))
+
+        return queryset
 
 
-class ProjectDetailView(RetrieveAPIView):
-    queryset = Project.objects.all()
+class ProjectDetailView(ConditionalGetMixin, RetrieveAPIView):
+    query_budget = 5
+    last_modified_field = 'updated_at'
+    queryset = Project.objects.prefetch_related('technology_list')
     serializer_class = ProjectSerializer
 
 
-class SkillListView(ListAPIView):
+class SkillListView(ConditionalGetMixin, CachedResponseMixin, FastListMixin,
+                    ListAPIView):
+    query_budget = 3
+    # Skill has no timestamp, so the ETag comes from the cache version
+    cache_models = [Skill]
     queryset = Skill.objects.all()
     serializer_class = SkillSerializer
+    fast_serializer_class = SkillFastSerializer
 
 
-class ContactCreateView(CreateAPIView):
+class ContactCreateView(WriteBehindCreateMixin, CreateAPIView):
+    query_budget = 3
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
-
-
-class BlogPostListView(ListAPIView):
+    # per IP and per email, see throttling.py
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'contact'
+
+
+class BlogPostListView(ConditionalGetMixin, CachedResponseMixin,
+                       FastListMixin, ListAPIView):
+    query_budget = 5
+    # Comment is listed because comments_count changes with comments
+    cache_models = [BlogPost, Comment]
+    # views and comment counts are updated without touching updated_at
+    last_modified_field = 'updated_at'
+    validator_aggregates = {
+        'views': Sum('views'),
+        'comments': Sum('approved_comment_count'),
+    }
     serializer_class = BlogPostListSerializer
+    fast_serializer_class = BlogPostListFastSerializer
+    pagination_class = LatestFirstCursorPagination
 
     def get_queryset(self):
-        queryset = BlogPost.objects.filter(published=True)
+        queryset = BlogPost.objects.filter(
+            published=True).prefetch_related('tag_list')
         category = self.request.query_params.get('category', None)
         featured = self.request.query_params.get('featured', None)
+        tag = self.request.query_params.get('tag', None)
 
         if category:
-            queryset = queryset.filter(category__iexact=category)
+            # Same as category__iexact, but written as LOWER(category) = ...
+            # so the database can use blogpost_category_lower_idx
+            queryset = queryset.alias(
+                category_lower=Lower('category')).filter(
+                category_lower=category.lower())
         if featured:
             queryset = queryset.filter(featured=True)
+        if tag:
+            queryset = queryset.filter(tag_list=Tag.lookup(tag))
 
         return queryset
 
 
-class BlogPostDetailView(RetrieveAPIView):
-    queryset = BlogPost.objects.filter(published=True)
+class BlogPostExportView(StreamingExportMixin, BlogPostListView):
+    """Every published post (same filters as the list) as one streamed
+    JSON array: /api/blog/export/"""
+    # the streamed body runs 1 query per EXPORT_CHUNK_SIZE rows on top
+    query_budget = 3
+    pagination_class = None
+    export_ordering = LatestFirstCursorPagination.ordering
+
+
+class BlogPostDetailView(ConditionalGetMixin, RetrieveAPIView):
+    query_budget = 7
+    queryset = BlogPost.objects.filter(
+        published=True).prefetch_related('tag_list')
     serializer_class = BlogPostDetailSerializer
     lookup_field = 'slug'
+    # views is left out of the ETag on purpose - it changes on every hit, so
+    # including it would mean no reader ever gets a 304
+    last_modified_field = 'updated_at'
+    validator_aggregates = {
+        'pk': Max('pk'),
+        'comments': Max('approved_comment_count'),
+        # related posts are rewritten as new rows (related.py)
+        'related': Max('related_links__id'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 304:
+            # A reader with a cached copy still counts as a view
+            view_counts.increment(self.validator_values['pk'])
+        return response
 
     def get_object(self):
         # calling method on RetrieveAPIView class
         obj = super().get_object()
 
-        # Increment views after object is successfully retrieved
-        # see expn below for F
-        BlogPost.objects.filter(pk=obj.pk).update(views=F('views') + 1)
-        obj.refresh_from_db()
+        # Count the view in the in-memory buffer (see view_counter.py) instead
+        # of an UPDATE + refresh_from_db per hit. The buffer writes views to
+        # the database in batches; the response shows the stored count plus
+        # the views that are still waiting to be written.
+        obj.views += view_counts.increment(obj.pk)
 
         return obj
 
 
-class CommentCreateView(CreateAPIView):
+class BlogPostSearchView(ListAPIView):
+    """Ranked full-text search: /api/blog/search/?q=django+orm"""
+    query_budget = 5
+    serializer_class = BlogPostListSerializer
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        # The browsable API (HTML) asks for it too, to build its forms
+        return BlogPost.objects.filter(
+            published=True).prefetch_related('tag_list')
+
+    def list(self, request, *args, **kwargs):
+        # search.py returns ranked ids from the search index; only the posts
+        # on the requested page are loaded
+        post_ids = search_post_ids(request.query_params.get('q', ''))
+        page = self.paginate_queryset(post_ids)
+        posts = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [posts[pk] for pk in page if pk in posts], many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class CommentCreateView(WriteBehindCreateMixin, CreateAPIView):
+    query_budget = 6
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
-
-
-class ServiceListView(ListAPIView):
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'comments'
+
+
+class MetricsView(APIView):
+    """Staff only: request timing histograms in Prometheus text format
+    (see metrics.py)"""
+    query_budget = 2
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.prometheus_text(),
+                            content_type='text/plain; version=0.0.4')
+
+
+class CommentModerationView(GenericAPIView):
+    """Staff only. POST {"action": "approve" | "reject", "ids": [1, 2, ...]}
+    sets approved on all those comments with one UPDATE per batch; the
+    comment counters and cached responses are updated as usual."""
+    # one UPDATE per COMMENT_MODERATION_BATCH_SIZE ids: more ids than
+    # that need more queries
+    query_budget = 8
+    permission_classes = [IsAdminUser]
+    serializer_class = CommentModerationSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        action = serializer.validated_data['action']
+        changed = Comment.objects.filter(
+            pk__in=serializer.validated_data['ids']).moderate(
+            approved=action == 'approve',
+            batch_size=getattr(settings, 'COMMENT_MODERATION_BATCH_SIZE', 500))
+        return Response({'action': action, 'changed': changed})
+
+
+class ServiceListView(ConditionalGetMixin, CachedResponseMixin, FastListMixin,
+                      ListAPIView):
+    query_budget = 3
+    # Service has no updated_at, so the ETag comes from the cache version
+    cache_models = [Service]
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
+    fast_serializer_class = ServiceFastSerializer
 
 
-class SocialPostListView(ListAPIView):
+class SocialPostListView(ConditionalGetMixin, CachedResponseMixin,
+                         FastListMixin, ListAPIView):
+    query_budget = 4
+    cache_models = [SocialPost]
+    last_modified_field = 'fetched_at'
     serializer_class = SocialPostSerializer
+    fast_serializer_class = SocialPostFastSerializer
+    # ?limit= is handled (and validated) by the paginator
+    pagination_class = SocialPostCursorPagination
 
     def get_queryset(self):
         queryset = SocialPost.objects.all()
         platform = self.request.query_params.get('platform', None)
-        limit = self.request.query_params.get('limit', None)
 
         if platform:
             queryset = queryset.filter(platform=platform)
-        if limit:
-            queryset = queryset[:int(limit)]
 
         return queryset
 
 
-class BlogCategoriesView(APIView):
+class SocialPostExportView(StreamingExportMixin, SocialPostListView):
+    """The whole social feed as one streamed JSON array: /api/social/export/"""
+    query_budget = 3
+    pagination_class = None
+    export_ordering = SocialPostCursorPagination.ordering
+
+
+class BlogCategoriesView(ConditionalGetMixin, CachedResponseMixin,
+                         ListAPIView):
     """Get list of all blog categories"""
+    query_budget = 4
+    cache_models = [BlogPost]
+    last_modified_field = 'updated_at'
 
-    def get(self, _request):
-        categories = BlogPost.objects.filter(
-            published=True).values_list('category', flat=True).distinct()
+    def get_queryset(self):
+        return BlogPost.objects.filter(published=True)
+
+    # list() instead of get() so the cache/ETag mixins' get() wraps it
+    def list(self, request, *args, **kwargs):
+        categories = self.get_queryset().values_list(
+            'category', flat=True).distinct()
         return Response(list(categories))
 
 
+class TagListView(ConditionalGetMixin, CachedResponseMixin, ListAPIView):
+    """Tags with the number of published posts using them, most used first"""
+    query_budget = 3
+    cache_models = [Tag, BlogPost]
+    serializer_class = TagCountSerializer
+
+    def get_queryset(self):
+        # One GROUP BY query over the tag <-> post join table
+        return (Tag.objects
+                .filter(posts__published=True)
+                .annotate(count=Count('posts'))
+                .order_by('-count', 'name'))
+
+
+class HomeView(ConditionalGetMixin, CachedResponseMixin, ListAPIView):
+    """Everything the landing page needs in one request (see home.py):
+    /api/home/?social_limit=6"""
+    # the sections run on other threads (HOME_BUNDLE_WORKERS > 1) and aren't
+    # counted then; this is the budget of building them inline
+    query_budget = 14
+    # Every model one of the sections is built from - an edit to any of them
+    # invalidates the cached bundle (and changes its version based ETag)
+    cache_models = [Project, Skill, Service, BlogPost, Comment, SocialPost,
+                    Tag]
+
+    # list() like BlogCategoriesView, so the cache/ETag mixins' get() wraps
+    # it and it only runs on a cache miss
+    def list(self, request, *args, **kwargs):
+        limit = request.query_params.get(
+            'social_limit', getattr(settings, 'HOME_SOCIAL_LIMIT', 6))
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError(
+                {'social_limit': 'Must be a positive integer.'})
+        return Response(build_home_bundle(request, limit))
+
+
 #  What is F('views') + 1?
+# (BlogPostDetailView used to do this on every hit; view_counter.py now does
+# the same F() update for a whole batch of buffered views at once)
 # F() is a very useful Django expression from django.db.models — it lets you do database-level atomic updates without race conditions.
 # Without F():
 # Pythonpost = BlogPost.objects.get(pk=obj.pk)
@@ -0,0 +1,353 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, IntegrityError, close_old_connections
+from rest_framework import status
+from rest_framework.response import Response
+from .throttling import forget_post
+
+# Write-behind for the public create endpoints (contact form, comments).
+#
+# Normally POST /api/contact/ runs its INSERT inside the request, so a slow
+# database connection keeps the visitor waiting. In write-behind mode the
+# view only validates the data, then:
+#   1. appends it to a local SQLite journal file (survives a crash),
+#   2. puts it on a bounded in-memory queue,
+#   3. answers 202 Accepted straight away.
+# A background thread takes rows off the queue and writes them with one
+# bulk_create() per batch, then removes them from the journal.
+#
+# When the process dies before a row was written, the row is still in the
+# journal: the next process that starts the queue writes it. wsgi.py starts
+# the queue when the worker boots, and the background thread wakes up every
+# RETRY_DELAY seconds, so that happens without waiting for the next POST. Rows are
+# deleted from the journal after the INSERT, so a crash between the two
+# can write a row twice (at-least-once, never lost).
+#
+# Several workers (e.g. gunicorn) can share one journal file: every row is
+# tagged with the process id, and a process only replays rows of processes
+# that are no longer running.
+#
+# When a batch fails (e.g. the database is down) the worker keeps the rows
+# and tries again after RETRY_DELAY seconds, then twice as long after every
+# failure, at most MAX_RETRY_DELAY. While it waits the queue fills up.
+#
+# When the queue is full the view falls back to a normal, synchronous
+# INSERT (201 Created) - the queue smooths out bursts, it never drops data.
+#
+# Settings (all optional):
+# WRITE_BEHIND = {
+#     'JOURNAL': '/var/lib/portfolio/write-behind.sqlite3',  # None: off
+#     'MAX_QUEUE': 1000,   # rows waiting in memory
+#     'BATCH_SIZE': 100,   # rows per bulk_create()
+#     'WORKER': True,      # False: only flush() writes (used by the tests)
+#     'RETRY_DELAY': 5,    # seconds between journal checks / before a retry
+# }
+
+DEFAULTS = {
+    'JOURNAL': None,
+    'MAX_QUEUE': 1000,
+    'BATCH_SIZE': 100,
+    'WORKER': True,
+    'RETRY_DELAY': 5,
+}
+
+MAX_RETRY_DELAY = 300  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+def _option(name):
+    options = getattr(settings, 'WRITE_BEHIND', {})
+    return options.get(name, DEFAULTS[name])
+
+
+def enabled():
+    return bool(_option('JOURNAL'))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)  # signal 0: only checks that the process exists
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, but belongs to another user
+    return True
+
+
+def retry_delay(failures):
+    """Seconds to wait after the given number of failed batches in a row"""
+    return min(_option('RETRY_DELAY') * 2 ** (failures - 1), MAX_RETRY_DELAY)
+
+
+def _values(instance):
+    # Concrete column values of an unsaved instance (post -> post_id),
+    # without the pk. That includes created_at (a default, not auto_now_add,
+    # on the queued models): the row keeps the time of the request however
+    # late the worker writes it
+    return {field.attname: getattr(instance, field.attname)
+            for field in instance._meta.concrete_fields
+            if not field.primary_key}
+
+
+class WriteBehindQueue:
+    def __init__(self, journal=None):
+        self._journal_path = journal  # None: read WRITE_BEHIND['JOURNAL']
+        self._journal = None  # sqlite3 connection, opened by _setup()
+        self._queue = None  # (journal id, model label, values) tuples
+        self._lock = threading.Lock()  # guards the journal connection
+        self._write_lock = threading.Lock()  # one writer at a time
+        self._replay_upto = 0  # journal ids <= this were left by a dead process
+        self._pending = []  # rows taken off the queue, not written yet
+        self._failed = False  # writing self._pending failed last time
+        self._worker = None
+        self._pid = None
+
+    def _setup(self):
+        # Called with self._lock held. Also runs again in a forked child
+        # (pid changed), which must not use the parent's connection.
+        if self._journal is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._journal = sqlite3.connect(
+            self._journal_path or _option('JOURNAL'),
+            check_same_thread=False, isolation_level=None)
+        # WAL with synchronous=NORMAL: a committed row survives the process
+        # crashing (not a power cut) without an fsync per message
+        self._journal.execute('PRAGMA journal_mode=WAL')
+        self._journal.execute('PRAGMA synchronous=NORMAL')
+        self._journal.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, pid INTEGER NOT NULL, '
+            'model TEXT NOT NULL, data TEXT NOT NULL)')
+        self._queue = queue.Queue(maxsize=_option('MAX_QUEUE'))
+        self._worker = None
+        self._pending = []
+        self._failed = False
+
+        # Take over the rows of processes that are gone
+        with self._journal:
+            self._journal.execute('BEGIN IMMEDIATE')
+            pids = [pid for (pid,) in self._journal.execute(
+                'SELECT DISTINCT pid FROM entries')]
+            dead = [pid for pid in pids
+                    if pid == self._pid or not _pid_alive(pid)]
+            self._journal.executemany('UPDATE entries SET pid = ? WHERE pid = ?',
+                                      [(self._pid, pid) for pid in dead])
+            (self._replay_upto,) = self._journal.execute(
+                'SELECT COALESCE(MAX(id), 0) FROM entries WHERE pid = ?',
+                (self._pid,)).fetchone()
+
+    def _start_worker(self):
+        if _option('WORKER') and self._worker is None:
+            self._worker = threading.Thread(
+                target=self._run, name='write-behind', daemon=True)
+            self._worker.start()
+
+    def start(self):
+        """Open the journal and start the worker now, so rows a dead
+        process left behind are written without waiting for a POST"""
+        with self._lock:
+            self._setup()
+            self._start_worker()
+
+    def put(self, instance):
+        """Queue an unsaved model instance for writing. Returns False (and
+        queues nothing) when the queue is full."""
+        data = json.dumps(_values(instance), cls=DjangoJSONEncoder)
+        label = instance._meta.label
+        with self._lock:
+            self._setup()
+            cursor = self._journal.execute(
+                'INSERT INTO entries (pid, model, data) VALUES (?, ?, ?)',
+                (self._pid, label, data))
+            try:
+                self._queue.put_nowait((cursor.lastrowid, label, data))
+            except queue.Full:
+                self._journal.execute('DELETE FROM entries WHERE id = ?',
+                                      (cursor.lastrowid,))
+                return False
+            self._start_worker()
+        return True
+
+    def pending(self):
+        """Rows in the journal of this process that are not written yet"""
+        with self._lock:
+            self._setup()
+            (count,) = self._journal.execute(
+                'SELECT COUNT(*) FROM entries WHERE pid = ?',
+                (self._pid,)).fetchone()
+        return count
+
+    def _replay(self):
+        # Rows a crashed process left behind, oldest first
+        written = 0
+        while self._replay_upto:
+            with self._lock:
+                rows = self._journal.execute(
+                    'SELECT id, model, data FROM entries WHERE pid = ? '
+                    'AND id <= ? ORDER BY id LIMIT ?',
+                    (self._pid, self._replay_upto,
+                     _option('BATCH_SIZE'))).fetchall()
+            if len(rows) < _option('BATCH_SIZE'):
+                self._replay_upto = 0
+            written += self._write(rows)
+        return written
+
+    def _write_pending(self):
+        # A batch that failed stays in self._pending and is written again.
+        # Leave out its rows that were written (another model of the batch)
+        if self._failed:
+            with self._lock:
+                ids = {entry_id for (entry_id,) in self._journal.execute(
+                    'SELECT id FROM entries WHERE pid = ?', (self._pid,))}
+            self._pending = [row for row in self._pending if row[0] in ids]
+            self._failed = False
+        try:
+            written = self._write(self._pending)
+        except Exception:
+            self._failed = True
+            raise
+        self._pending = []
+        return written
+
+    def _take(self, timeout=None):
+        # Up to BATCH_SIZE queued rows (waiting at most timeout seconds for
+        # the first one, not at all if None)
+        rows = []
+        try:
+            rows.append(self._queue.get(block=timeout is not None,
+                                        timeout=timeout))
+            while len(rows) < _option('BATCH_SIZE'):
+                rows.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return rows
+
+    def flush(self):
+        """Write everything that is queued now. Returns the number of rows
+        written."""
+        with self._lock:
+            self._setup()
+        with self._write_lock:
+            written = self._replay() + self._write_pending()
+            while rows := self._take():
+                self._pending.extend(rows)
+                written += self._write_pending()
+        return written
+
+    def _run(self):
+        failures = 0
+        while True:
+            if failures:
+                time.sleep(retry_delay(failures))
+                rows = []  # retry the failed batch first
+            else:
+                # Don't wait longer than RETRY_DELAY, so rows of a dead
+                # process are replayed even when no new rows come in
+                rows = self._take(timeout=_option('RETRY_DELAY'))
+            failures = 0 if self._work(rows) else failures + 1
+
+    def _work(self, rows):
+        # One round of the worker. Returns False when it failed: the rows
+        # stay in self._pending (and in the journal) for the next round.
+        try:
+            with self._write_lock:
+                self._pending.extend(rows)
+                self._replay()
+                self._write_pending()
+            return True
+        except Exception:
+            logger.exception("Write-behind batch of %d rows failed",
+                             len(self._pending))
+            return False
+        finally:
+            # Same as at the end of a request: reuse the connection
+            # unless it is broken or older than CONN_MAX_AGE
+            close_old_connections()
+
+    def _write(self, rows):
+        by_model = {}
+        for entry_id, label, data in rows:
+            by_model.setdefault(label, []).append((entry_id, data))
+
+        written = 0
+        for label, entries in by_model.items():
+            model = apps.get_model(label)
+            objs = [model(**json.loads(data)) for _, data in entries]
+            try:
+                model.objects.bulk_create(objs)
+                done = [entry_id for entry_id, _ in entries]
+            except IntegrityError:
+                # e.g. a comment on a post deleted in the meantime: write the
+                # rows one by one so one bad row doesn't hold up the rest
+                done = []
+                for obj, (entry_id, data) in zip(objs, entries):
+                    try:
+                        model.objects.bulk_create([obj])
+                    except IntegrityError:
+                        logger.error("Dropped write-behind %s row %s",
+                                     label, data)
+                    done.append(entry_id)
+            with self._lock:
+                self._journal.executemany('DELETE FROM entries WHERE id = ?',
+                                          [(entry_id,) for entry_id in done])
+            written += len(objs)
+        return written
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+            self._journal = None
+
+
+write_queue = WriteBehindQueue()
+
+
+@atexit.register
+def _flush_on_exit():
+    if write_queue._journal is None:
+        return  # never used in this process
+    try:
+        write_queue.flush()
+    except (DatabaseError, sqlite3.Error):
+        logger.exception("Could not flush the write-behind queue on exit; "
+                         "the rows stay in the journal")
+
+
+class WriteBehindCreateMixin:
+    """CreateAPIView mixin: in write-behind mode, validate and answer 202
+    Accepted, the row is written by the background queue."""
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            return self.save_or_queue(serializer)
+        except Exception:
+            # Validation remembered the text for the duplicate filter
+            # (throttling.py); it wasn't saved, so a retry must get through
+            if getattr(serializer, 'posted', None):
+                forget_post(*serializer.posted)
+            raise
+
+    def save_or_queue(self, serializer):
+        if enabled():
+            instance = serializer.Meta.model(**serializer.validated_data)
+            if write_queue.put(instance):
+                return Response(serializer.data,
+                                status=status.HTTP_202_ACCEPTED)
+            logger.warning("Write-behind queue full, writing inline")
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED,
+                        headers=self.get_success_headers(serializer.data))
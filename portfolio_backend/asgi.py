@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
 
 application = get_asgi_application()
+
+# Limit how long the queries of a request may run (see portfolio/database.py)
+from portfolio.database import use_statement_timeout  # noqa: E402
+
+use_statement_timeout()
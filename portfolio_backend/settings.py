@@ -73,6 +73,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total time covers the rest (Server-Timing header and
+    # /api/_metrics, see portfolio/metrics.py)
+    'portfolio.metrics.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # added this for static files
@@ -84,6 +87,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# The Server-Timing header shows how long our queries take: by default only
+# staff, INTERNAL_IPS and DEBUG get it. Set to 1 to send it to everyone.
+SERVER_TIMING_PUBLIC = os.environ.get("SERVER_TIMING_PUBLIC", "").lower() in (
+    "1", "true", "yes")
+
 
 ROOT_URLCONF = 'portfolio_backend.urls'
 
@@ -111,12 +119,103 @@ WSGI_APPLICATION = 'portfolio_backend.wsgi.application'
 # Database configuration
 
 # Now DATABASE_URL is available locally from .env, and on Render from env vars
+#
+# Two ways to keep connections to Postgres (Neon) open between requests:
+#   - default: every thread keeps its own connection for up to 300 seconds
+#   - DB_POOL=1: every worker process keeps a psycopg 3 connection pool
+#     (Django's OPTIONS['pool'], with psycopg[pool] from requirements.txt).
+#     DB_POOL_MIN_SIZE connections stay open, the pool grows up to
+#     DB_POOL_MAX_SIZE when requests overlap, and a request waits at most
+#     DB_POOL_TIMEOUT seconds for a free one. Connections idle for longer than
+#     DB_POOL_MAX_IDLE are closed (down to min_size) and every connection is
+#     replaced after DB_POOL_MAX_LIFETIME. Django hands the connection back
+#     to the pool at the end of each request, so conn_max_age must be 0.
+# Either way a connection is checked (one round trip) before it is reused,
+# so a connection Neon dropped while scaling to zero is replaced instead of
+# failing the request, and wsgi.py opens the connections when a worker
+# boots (portfolio/database.py) instead of on its first requests.
+DB_POOL = os.environ.get("DB_POOL", "").lower() in ("1", "true", "yes")
 DATABASES = {
     "default": dj_database_url.config(
         default=os.environ.get("DATABASE_URL"),
-        conn_max_age=300,       # good for Neon
+        conn_max_age=0 if DB_POOL else 300,       # 300: good for Neon
+        conn_health_checks=True,
     )
 }
+if DATABASES["default"].get("ENGINE") == "django.db.backends.postgresql":
+    db_options = DATABASES["default"].setdefault("OPTIONS", {})
+    # Seconds to wait for a (cold) server to accept a new connection
+    db_options.setdefault(
+        "connect_timeout", int(os.environ.get("DB_CONNECT_TIMEOUT", 10)))
+    # Postgres cancels any statement of a web request that runs longer than
+    # this (ms, 0 = no limit). Only wsgi.py and asgi.py apply it, so
+    # manage.py commands run without it (see portfolio/database.py).
+    DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 5000))
+    if DB_POOL:
+        db_options["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 4)),
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.environ.get("DB_POOL_MAX_IDLE", 600)),
+            "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", 1800)),
+        }
+
+# Open the database connections (or the pool's min_size) when a worker boots
+DB_WARM_UP = os.environ.get("DB_WARM_UP", "1").lower() in ("1", "true", "yes")
+
+# Cache
+# Used for the API response cache (portfolio/cache.py). locmem is per worker
+# process, so with several gunicorn workers an admin edit only invalidates the
+# worker that handled it - the others catch up after RESPONSE_CACHE_TIMEOUT.
+# Set CACHE_LOCATION to a directory to share one file-based cache between
+# all workers on the machine instead.
+CACHE_LOCATION = os.environ.get("CACHE_LOCATION")
+if CACHE_LOCATION:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 300))
+
+# FastJSONRenderer writes JSON with orjson when it is installed (stdlib json
+# otherwise) - see portfolio/renderers.py
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'portfolio.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Token buckets per IP and per email for the public POST endpoints:
+    # bursts of up to N, then N spread over the period (portfolio/throttling.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'contact': os.environ.get("CONTACT_THROTTLE_RATE", "5/hour"),
+        'comments': os.environ.get("COMMENT_THROTTLE_RATE", "10/hour"),
+    },
+    # Proxies in front of the app. Render has one, which adds the client's IP
+    # as the last entry of X-Forwarded-For; the throttles take the IP from
+    # there (entries before it come from the client and can be made up).
+    # Set NUM_PROXIES=0 when clients connect to the app directly.
+    'NUM_PROXIES': int(os.environ.get("NUM_PROXIES", 1)),
+}
+
+# Rows fetched per database round trip by the streamed /export/ endpoints
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# Set WRITE_BEHIND_JOURNAL to a local file path to answer contact/comment
+# POSTs with 202 and write them in batches in the background (the file keeps
+# queued messages across a crash) - see portfolio/write_queue.py
+WRITE_BEHIND = {
+    'JOURNAL': os.environ.get("WRITE_BEHIND_JOURNAL"),
+}
+
 # For serving CSS, JavaScript, images that are part of Django (like Django Admin styles)
 # You need this ONLY if you're using Django's admin panel or Django templates
 # Static files (CSS, JavaScript, Images)
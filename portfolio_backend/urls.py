@@ -22,6 +22,8 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('portfolio.urls')),
+    # async (ASGI) versions of the read endpoints, see portfolio/async_views.py
+    path('api/async/', include('portfolio.async_urls')),
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,19 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_backend.settings')
 
 application = get_wsgi_application()
+
+# Limit how long the queries of a request may run, then connect to the
+# database now, before the worker takes its first request
+# (see portfolio/database.py)
+from portfolio.database import (  # noqa: E402
+    use_statement_timeout, warm_up_database)
+
+use_statement_timeout()
+warm_up_database()
+
+# Write rows a previous worker left in the write-behind journal
+# (see portfolio/write_queue.py)
+from portfolio import write_queue  # noqa: E402
+
+if write_queue.enabled():
+    write_queue.write_queue.start()